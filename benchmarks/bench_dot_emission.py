@@ -0,0 +1,73 @@
+"""
+Benchmarks DOT source emission of the graphical flow diagram.
+
+Builds synthetic topologies of increasing size (up to 5k subnets and 50k
+firewall rules by default) and times build_flow_graph + to_dot_source. With the
+indexed node/edge model the time per rule should stay roughly constant as the
+topology grows, i.e. total time grows near-linearly. Graphviz itself is not
+needed, as no layout or rendering is performed.
+
+Usage:
+    python benchmarks/bench_dot_emission.py [--subnets 5000] [--rules 50000] [--steps 4]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.flow_diagram_generator import build_flow_graph, to_dot_source  # noqa: E402
+
+
+def build_topology(num_subnets, num_rules, seed=42):
+    rng = random.Random(seed)
+    subnets = [
+        {'name': f'subnet-{i}', 'cidr': f'10.{i // 256}.{i % 256}.0/24', 'purpose': 'Frontend' if i % 10 == 0 else 'Backend'}
+        for i in range(num_subnets)
+    ]
+    rules = [
+        {
+            'name': f'rule-{i}',
+            'ports': [rng.randrange(1, 65536)],
+            'protocol': 'TCP',
+            'source': 'Internet' if i % 20 == 0 else f'subnet-{rng.randrange(num_subnets)}',
+            'destination': f'subnet-{rng.randrange(num_subnets)}',
+        }
+        for i in range(num_rules)
+    ]
+    return {
+        'application': 'BenchApp',
+        'network': {
+            'name': 'bench-network',
+            'subnets': subnets,
+            'load_balancer': {'enabled': True, 'listeners': [{'port': 80, 'protocol': 'HTTP'}]},
+            'firewall': {'rules': rules},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOT source emission.")
+    parser.add_argument("--subnets", type=int, default=5000, help="Number of subnets at the largest size.")
+    parser.add_argument("--rules", type=int, default=50000, help="Number of firewall rules at the largest size.")
+    parser.add_argument("--steps", type=int, default=4, help="Number of sizes, each doubling the previous one.")
+    args = parser.parse_args()
+
+    print(f"{'subnets':>8} {'rules':>8} {'seconds':>9} {'us/rule':>9} {'DOT KiB':>9}")
+    for step in reversed(range(args.steps)):
+        scale = 2 ** step
+        num_subnets = max(1, args.subnets // scale)
+        num_rules = max(1, args.rules // scale)
+        topology = build_topology(num_subnets, num_rules)
+
+        start = time.perf_counter()
+        dot_source = to_dot_source(build_flow_graph(topology))
+        elapsed = time.perf_counter() - start
+
+        print(f"{num_subnets:>8} {num_rules:>8} {elapsed:>9.3f} {elapsed / num_rules * 1e6:>9.2f} {len(dot_source) / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
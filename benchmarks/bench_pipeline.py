@@ -0,0 +1,183 @@
+"""
+Benchmarks every pipeline stage on synthetic topologies from 10 to 100k rules.
+
+The topologies come from yaml_generator.generate_generic_yaml with a fixed
+seed, so runs on different versions measure identical inputs. The stages are:
+YAML load, validation, network model construction, the three provider
+generators, template serialization (the batch compiler's JSON/YAML
+serializers), streamed generation and writing of each template
+(template_stream), the textual flow diagram and DOT emission. Small sizes are
+repeated until --min-time has passed and the best time is kept.
+
+Results are written as JSON (--output). Passing an earlier result file with
+--compare prints the ratio per stage and exits non-zero if any stage got slower
+than --threshold.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 10,100,1000,10000,100000] [--output bench_results.json]
+    python benchmarks/bench_pipeline.py --compare baseline.json [--threshold 1.25]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from modules.batch_compiler import PROVIDER_OUTPUTS  # noqa: E402
+from modules.flow_diagram_generator import build_flow_graph, to_dot_source, write_textual_flow_diagram  # noqa: E402
+from modules.network_model import build_network_model  # noqa: E402
+from modules.providers import get_generator, get_stream_generator  # noqa: E402
+from modules.template_stream import write_template_stream  # noqa: E402
+from modules.yaml_generator import generate_generic_yaml  # noqa: E402
+from modules.yaml_parser import load_requirements, validate_yaml_structure  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+DEFAULT_OUTPUT = "bench_results.json"
+RESULTS_FORMAT_VERSION = 1
+
+
+def time_stage(func, min_time, max_repeat):
+    """Runs func until min_time has passed (at most max_repeat times) and returns (best seconds, runs, last result)."""
+    best = float('inf')
+    runs = 0
+    spent = 0.0
+    result = None
+    while runs < max_repeat and (runs == 0 or spent < min_time):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        runs += 1
+    return best, runs, result
+
+
+def subnets_for(num_rules):
+    return max(2, min(num_rules // 10, 10000))
+
+
+def benchmark_size(num_rules, workdir, min_time, max_repeat, seed):
+    """Times every stage for one topology size and returns {stage: {'seconds', 'runs'}}."""
+    requirements = generate_generic_yaml(num_subnets=subnets_for(num_rules), num_rules=num_rules, num_listeners=4, seed=seed)
+    yaml_path = os.path.join(workdir, f'requirements-{num_rules}.yaml')
+    with open(yaml_path, 'w') as f:
+        yaml.dump(requirements, f, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+
+    stages = {}
+
+    def record(stage, func):
+        seconds, runs, result = time_stage(func, min_time, max_repeat)
+        stages[stage] = {'seconds': seconds, 'runs': runs}
+        return result
+
+    loaded = record('yaml_load', lambda: load_requirements(yaml_path))
+    # validate_yaml_structure prints its violations; the synthetic topology has none
+    with contextlib.redirect_stdout(io.StringIO()):
+        record('validate', lambda: validate_yaml_structure(loaded))
+    model = record('network_model', lambda: build_network_model(loaded))
+    for filename, provider, serializer in PROVIDER_OUTPUTS:
+        generator = get_generator(provider)
+        template = record(f'generate_{provider}', lambda: generator(build_network_model(loaded)))
+        record(f'serialize_{filename}', lambda: serializer(template))
+        output_path = os.path.join(workdir, filename)
+        output_format = 'yaml' if filename.endswith('.yaml') else 'json'
+        record(f'stream_{filename}', lambda: write_template_stream(get_stream_generator(provider)(model), output_path, output_format))
+    record('textual_diagram', lambda: write_textual_flow_diagram(model, io.StringIO()))
+    record('dot_emission', lambda: to_dot_source(build_flow_graph(model)))
+    return {
+        'rules': num_rules,
+        'subnets': subnets_for(num_rules),
+        'yaml_bytes': os.path.getsize(yaml_path),
+        'stages': stages,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current, threshold):
+    """Prints current/baseline time ratios per size and stage and returns the regressions above threshold."""
+    baseline_sizes = {entry['rules']: entry['stages'] for entry in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    for entry in current['results']:
+        old_stages = baseline_sizes.get(entry['rules'])
+        if old_stages is None:
+            continue
+        for stage, timing in entry['stages'].items():
+            if stage not in old_stages:
+                continue
+            ratio = timing['seconds'] / max(old_stages[stage]['seconds'], 1e-9)
+            marker = ''
+            if ratio > threshold:
+                marker = '  <-- regression'
+                regressions.append((entry['rules'], stage, ratio))
+            print(f"  {entry['rules']:>7} rules  {stage:<22} {ratio:6.2f}x{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic topologies.")
+    parser.add_argument("--sizes", default=','.join(str(size) for size in DEFAULT_SIZES), help="Comma-separated firewall rule counts.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic topologies.")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds spent per stage (the best run is kept).")
+    parser.add_argument("--max-repeat", type=int, default=20, help="Maximum runs per stage.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="File the JSON results are written to.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier result file to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression with --compare.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'revision': _git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yaml_libyaml': hasattr(yaml, 'CSafeLoader'),
+        'seed': args.seed,
+        'results': [],
+    }
+
+    workdir = tempfile.mkdtemp(prefix='netflow-bench-')
+    try:
+        for num_rules in sizes:
+            entry = benchmark_size(num_rules, workdir, args.min_time, args.max_repeat, args.seed)
+            results['results'].append(entry)
+            print(f"{num_rules} rules, {entry['subnets']} subnets, {entry['yaml_bytes'] / 1024:.0f} KiB of YAML")
+            for stage, timing in entry['stages'].items():
+                print(f"  {stage:<22} {timing['seconds'] * 1000:10.2f} ms  {timing['seconds'] / num_rules * 1e6:8.2f} us/rule")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stages are more than {args.threshold:.2f}x slower than the baseline.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
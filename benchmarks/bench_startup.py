@@ -0,0 +1,80 @@
+"""
+Checks the startup time of the default text-only CLI path against a budget.
+
+Runs 'netflow_architect.py <requirements>' (which prints the textual flow) in
+fresh interpreters with '-X importtime', reports the wall time and the slowest
+imports, and fails if the median run exceeds the budget or if any module that
+should only be imported lazily (provider SDKs, graphviz, requests) was loaded.
+
+Usage:
+    python benchmarks/bench_startup.py [--budget-ms 250] [--repeat 7] [requirements.yaml]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 250
+# Top-level packages the text path must never import.
+LAZY_MODULES = ('boto3', 'botocore', 'requests', 'graphviz', 'cloud_deployer', 'multiprocessing')
+
+
+def run_text_path(requirements_file):
+    """Runs the text path once; returns (wall seconds, {module: cumulative microseconds})."""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.join(REPO_ROOT, 'netflow_architect.py'), requirements_file],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    elapsed = time.perf_counter() - start
+
+    imports = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if cumulative_us.strip().isdigit():
+            imports[name[1:].rstrip()] = int(cumulative_us)  # Nested imports keep their indentation
+    return elapsed, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='Maximum median wall time of the text path.')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to list.')
+    parser.add_argument('requirements', nargs='?', default='example_requirements.yaml')
+    args = parser.parse_args()
+
+    run_text_path(args.requirements)  # Warm up the OS file cache and the bytecode cache
+    timings = []
+    imports = {}
+    for _ in range(args.repeat):
+        elapsed, imports = run_text_path(args.requirements)
+        timings.append(elapsed)
+    median_ms = statistics.median(timings) * 1000
+
+    print(f"Text path wall time: median {median_ms:.1f}ms, min {min(timings) * 1000:.1f}ms "
+          f"over {args.repeat} runs (budget {args.budget_ms:.0f}ms)")
+    print("Slowest top-level imports (cumulative):")
+    top_level = {name: us for name, us in imports.items() if not name.startswith(' ')}
+    for name, us in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f}ms  {name}")
+
+    loaded = sorted({name.strip().split('.')[0] for name in imports} & set(LAZY_MODULES))
+    failed = False
+    if loaded:
+        print(f"FAIL: the text path imported {', '.join(loaded)}, which should only be imported lazily.")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: median startup {median_ms:.1f}ms exceeds the {args.budget_ms:.0f}ms budget.")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmarks requirements loading on a synthetic 10k-rule file.
+
+Compares the pure-Python yaml.safe_load baseline with yaml_parser.load_requirements
+in its cold (first load, fills the parse cache), warm (libyaml parse with the
+file in the OS page cache) and cached (parse cache hit) configurations, plus
+the same content loaded from JSON.
+
+Usage:
+    python benchmarks/bench_yaml_load.py [--rules 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.yaml_parser import load_requirements, SafeLoader  # noqa: E402
+
+
+def build_requirements(num_rules, num_subnets=100):
+    subnets = [
+        {'name': f'subnet-{i}', 'cidr': f'10.{i // 256}.{i % 256}.0/24', 'purpose': 'Frontend' if i % 2 == 0 else 'Backend'}
+        for i in range(num_subnets)
+    ]
+    rules = [
+        {
+            'name': f'rule-{i}',
+            'ports': [1024 + i % 5000, 2048 + i % 3000],
+            'protocol': 'TCP',
+            'source': 'Internet' if i % 10 == 0 else f'subnet-{i % num_subnets}',
+            'destination': f'subnet-{(i + 1) % num_subnets}',
+            'action': 'Allow',
+        }
+        for i in range(num_rules)
+    ]
+    return {
+        'application': 'BenchApp',
+        'region': 'eu-central-1',
+        'network': {
+            'name': 'bench-network',
+            'ip_address_space': '10.0.0.0/8',
+            'subnets': subnets,
+            'firewall': {'rules': rules},
+        },
+    }
+
+
+def time_call(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark requirements loading.")
+    parser.add_argument("--rules", type=int, default=10000, help="Number of firewall rules in the synthetic file.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement (best time is reported).")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='netflow-bench-')
+    try:
+        requirements = build_requirements(args.rules)
+        yaml_path = os.path.join(workdir, 'requirements.yaml')
+        json_path = os.path.join(workdir, 'requirements.json')
+        cache_dir = os.path.join(workdir, 'cache')
+        with open(yaml_path, 'w') as f:
+            yaml.dump(requirements, f)
+        with open(json_path, 'w') as f:
+            json.dump(requirements, f)
+
+        def pure_python():
+            with open(yaml_path) as f:
+                yaml.load(f, Loader=yaml.SafeLoader)
+
+        def cold():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            load_requirements(yaml_path, cache_dir=cache_dir)
+
+        results = [
+            ("yaml.safe_load (pure Python)", time_call(pure_python, args.repeat)),
+            (f"cold ({SafeLoader.__name__}, fills parse cache)", time_call(cold, args.repeat)),
+            (f"warm ({SafeLoader.__name__}, no parse cache)", time_call(lambda: load_requirements(yaml_path), args.repeat)),
+            ("cached (parse cache hit)", time_call(lambda: load_requirements(yaml_path, cache_dir=cache_dir), args.repeat)),
+            ("json input", time_call(lambda: load_requirements(json_path), args.repeat)),
+        ]
+
+        size_kb = os.path.getsize(yaml_path) / 1024
+        print(f"Requirements file: {args.rules} rules, {size_kb:.0f} KiB of YAML")
+        baseline = results[0][1]
+        for name, seconds in results:
+            print(f"  {name:<45} {seconds * 1000:9.1f} ms  ({baseline / seconds:6.1f}x)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Load-tests the generation server (netflow_architect.py --serve).
+
+Opens --concurrency keep-alive connections, sends --requests POSTs in total
+with one of --distinct synthetic requirements payloads each, and reports the
+p50/p99 latency and requests per second. Fewer distinct payloads than
+connections make identical requests overlap, which the server coalesces; the
+coalesced count is read from its /health endpoint.
+
+Usage:
+    python benchmarks/load_test_server.py --start [--requests 2000] [--concurrency 32] [--path /generate/aws]
+    python benchmarks/load_test_server.py --host 127.0.0.1 --port 8787
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_payload(variant, num_subnets, num_rules):
+    subnets = [
+        {'name': f'subnet-{i}', 'cidr': f'10.{i // 256}.{i % 256}.0/24', 'purpose': 'Frontend' if i % 10 == 0 else 'Backend'}
+        for i in range(num_subnets)
+    ]
+    rules = [
+        {'name': f'rule-{i}', 'ports': [1024 + (i + variant) % 5000], 'protocol': 'TCP',
+         'source': f'subnet-{i % num_subnets}', 'destination': f'subnet-{(i + 1) % num_subnets}', 'action': 'Allow'}
+        for i in range(num_rules)
+    ]
+    return json.dumps({
+        'application': f'LoadTestApp{variant}',
+        'network': {'name': f'load-test-{variant}', 'ip_address_space': '10.0.0.0/8', 'subnets': subnets,
+                    'firewall': {'rules': rules}},
+    }).encode()
+
+
+async def open_connection(args):
+    if args.socket:
+        return await asyncio.open_unix_connection(args.socket)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def send_request(reader, writer, method, path, body=b''):
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def worker(args, payloads, counter, latencies, errors):
+    reader, writer = await open_connection(args)
+    try:
+        while counter[0] < args.requests:
+            index = counter[0]
+            counter[0] += 1
+            start = time.perf_counter()
+            status, _body = await send_request(reader, writer, 'POST', args.path, payloads[index % len(payloads)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load_test(args):
+    payloads = [build_payload(variant, args.subnets, args.rules) for variant in range(args.distinct)]
+    counter, latencies, errors = [0], [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(args, payloads, counter, latencies, errors) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await open_connection(args)
+    _status, health = await send_request(reader, writer, 'GET', '/health')
+    writer.close()
+
+    latencies.sort()
+    print(f"Requests: {len(latencies)} to {args.path} ({args.concurrency} connections, {args.distinct} distinct payloads, "
+          f"{args.subnets} subnets / {args.rules} rules each)")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} requests/s over {elapsed:.2f}s")
+    print(f"Latency: p50 {statistics.median(latencies) * 1000:.1f}ms, "
+          f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f}ms, "
+          f"max {latencies[-1] * 1000:.1f}ms")
+    print(f"Errors: {len(errors)}")
+    print(f"Server stats: {json.loads(health)}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--socket', help='Connect to this Unix socket instead of --host/--port.')
+    parser.add_argument('--start', action='store_true', help='Start a server on a free port for the duration of the test.')
+    parser.add_argument('--path', default='/generate/aws', help='Endpoint to load, e.g. /generate/gcp or /diagram/dot.')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--distinct', type=int, default=8, help='Number of distinct payloads.')
+    parser.add_argument('--subnets', type=int, default=50)
+    parser.add_argument('--rules', type=int, default=200)
+    args = parser.parse_args()
+
+    server = None
+    if args.start:
+        args.port, args.socket = free_port(), None
+        server = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, 'netflow_architect.py'), '--serve',
+                                   '--host', args.host, '--port', str(args.port)],
+                                  cwd=REPO_ROOT, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                socket.create_connection((args.host, args.port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+    try:
+        asyncio.run(run_load_test(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,221 @@
 # cloud_deployer.py
 import boto3
+import hashlib
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from modules.deploy_settings import DEFAULT_API_CALLS_PER_SECOND, DEFAULT_FANOUT_WORKERS, DEFAULT_STACK_NAME
+from modules.profiling import profile_stage
+from modules.stack_splitter import (MAX_RESOURCES_PER_TEMPLATE, MAX_TEMPLATE_BODY_BYTES, needs_splitting,
+                                    set_child_template_urls, split_template, template_size)
+from modules.template_diff import diff_templates, print_template_diff
 
-def apply_aws_configuration(cloudformation_template, region=None):
-    """Applies the generated CloudFormation template to AWS."""
-    cf_client = boto3.client('cloudformation', region_name=region)
-    stack_name = "NetflowArchitectStack"  # Define a consistent stack name
+STACK_SUCCESS_STATUSES = {'CREATE_COMPLETE', 'UPDATE_COMPLETE', 'IMPORT_COMPLETE'}
+STACK_FAILURE_STATUSES = {
+    'CREATE_FAILED', 'ROLLBACK_COMPLETE', 'ROLLBACK_FAILED', 'DELETE_COMPLETE', 'DELETE_FAILED',
+    'UPDATE_ROLLBACK_COMPLETE', 'UPDATE_ROLLBACK_FAILED', 'UPDATE_FAILED', 'IMPORT_ROLLBACK_COMPLETE',
+    'IMPORT_ROLLBACK_FAILED',
+}
+DEFAULT_POLL_INTERVAL = 2.0
+MAX_POLL_INTERVAL = 30.0
+POLL_BACKOFF_FACTOR = 1.5
+DEFAULT_WAIT_TIMEOUT = 3600
+DEFAULT_API_BURST = 10
+CHANGE_SET_PREFIX = "netflow"
+# States in which a stack holds its resources and accepts updates; only these
+# can be "up to date". Failed creates, rollbacks and running operations cannot.
+STACK_STABLE_STATUSES = STACK_SUCCESS_STATUSES | {'UPDATE_ROLLBACK_COMPLETE'}
+# CloudFormation's StatusReason when a change set would not change anything
+NO_CHANGES_REASONS = ("didn't contain changes", "No updates are to be performed")
+ARTIFACT_PREFIX = "netflow-architect"
+DEFAULT_UPLOAD_WORKERS = 8
+
+def get_latest_stack_event_id(cf_client, stack_name):
+    """Returns the ID of the newest event of a stack, or None if it has no events (or does not exist)."""
+    try:
+        events = cf_client.describe_stack_events(StackName=stack_name).get('StackEvents', [])
+    except ClientError:
+        return None
+    return events[0]['EventId'] if events else None
+
+def fetch_new_stack_events(cf_client, stack_name, last_event_id):
+    """
+    Fetches the stack events newer than last_event_id, oldest first.
+
+    describe_stack_events returns the newest events first, so pages are only
+    requested until last_event_id shows up; older pages are never re-fetched.
+
+    Args:
+        cf_client: A boto3 CloudFormation client.
+        stack_name (str): The stack name or ID.
+        last_event_id (str): The newest event already seen, or None to fetch all events.
+
+    Returns:
+        list: The new events in chronological order.
+    """
+    new_events = []
+    kwargs = {'StackName': stack_name}
+    while True:
+        response = cf_client.describe_stack_events(**kwargs)
+        for event in response.get('StackEvents', []):
+            if event['EventId'] == last_event_id:
+                return list(reversed(new_events))
+            new_events.append(event)
+        next_token = response.get('NextToken')
+        if not next_token:
+            return list(reversed(new_events))
+        kwargs['NextToken'] = next_token
+
+def _is_stack_event(event, stack_name):
+    return event.get('ResourceType') == 'AWS::CloudFormation::Stack' and event.get('LogicalResourceId') == stack_name
+
+def wait_for_stack(cf_client, stack_name, last_event_id=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                   max_poll_interval=MAX_POLL_INTERVAL, timeout=DEFAULT_WAIT_TIMEOUT, sleep=time.sleep, label=None):
+    """
+    Tracks a stack operation to completion, streaming its events as they arrive.
+
+    Events are polled with adaptive backoff: the interval is reset to
+    poll_interval whenever new events arrive and grows by POLL_BACKOFF_FACTOR
+    (up to max_poll_interval) while nothing happens. For every resource the time
+    between its first *_IN_PROGRESS event and its *_COMPLETE / *_FAILED event is
+    recorded.
+
+    Args:
+        cf_client: A boto3 CloudFormation client (a moto client works for tests).
+        stack_name (str): The stack name.
+        last_event_id (str): The newest event from before the operation started;
+            only events after it are reported.
+        poll_interval (float): Initial and minimum polling interval in seconds.
+        max_poll_interval (float): Maximum polling interval in seconds.
+        timeout (float): Give up after this many seconds.
+        sleep (callable): Sleep function, replaceable in tests.
+        label (str): Prefix of every event line, e.g. 'profile/region' when
+            several targets are tracked at the same time (see deploy_to_targets).
+
+    Returns:
+        dict: 'status' (final stack status, or None on timeout), 'success',
+            'duration' in seconds and 'resource_timings', a list of
+            (logical ID, resource type, seconds, final status) sorted slowest first.
+    """
+    start = time.monotonic()
+    prefix = f"[{label}] " if label else ""
+    interval = poll_interval
+    started_at = {}
+    resource_timings = []
+    final_status = None
+
+    while final_status is None and time.monotonic() - start < timeout:
+        events = fetch_new_stack_events(cf_client, stack_name, last_event_id)
+        for event in events:
+            last_event_id = event['EventId']
+            logical_id = event.get('LogicalResourceId')
+            status = event.get('ResourceStatus', '')
+            reason = event.get('ResourceStatusReason', '')
+            print(f"  {prefix}{event['Timestamp']:%H:%M:%S} {logical_id} ({event.get('ResourceType')}): {status}{f' - {reason}' if reason else ''}")
+
+            if status.endswith('_IN_PROGRESS'):
+                started_at.setdefault(logical_id, event['Timestamp'])
+            elif (status.endswith('_COMPLETE') or status.endswith('_FAILED')) and logical_id in started_at:
+                seconds = (event['Timestamp'] - started_at.pop(logical_id)).total_seconds()
+                resource_timings.append((logical_id, event.get('ResourceType'), seconds, status))
+
+            if _is_stack_event(event, stack_name) and (status in STACK_SUCCESS_STATUSES or status in STACK_FAILURE_STATUSES):
+                final_status = status
+        if final_status is not None:
+            break
+
+        interval = poll_interval if events else min(interval * POLL_BACKOFF_FACTOR, max_poll_interval)
+        sleep(interval)
+
+    resource_timings.sort(key=lambda timing: timing[2], reverse=True)
+    return {
+        'status': final_status,
+        'success': final_status in STACK_SUCCESS_STATUSES,
+        'duration': time.monotonic() - start,
+        'resource_timings': resource_timings,
+    }
+
+def print_deploy_timings(result, top=10, label=None):
+    """Prints the outcome of wait_for_stack and the slowest resources, prefixed with label if given."""
+    prefix = f"[{label}] " if label else ""
+    if result['status'] is None:
+        print(f"{prefix}Timed out after {result['duration']:.0f}s waiting for the stack to finish.")
+    else:
+        print(f"{prefix}Stack finished with status {result['status']} after {result['duration']:.0f}s.")
+    if result['resource_timings']:
+        print(f"{prefix}Slowest resources:")
+        for logical_id, resource_type, seconds, status in result['resource_timings'][:top]:
+            print(f"  {prefix}{seconds:7.1f}s  {logical_id} ({resource_type}) {status}")
+
+def apply_aws_configuration(cloudformation_template, region=None, wait=False, cf_client=None, stack_name=DEFAULT_STACK_NAME,
+                            plan=False, confirm=None, artifact_bucket=None, s3_client=None, label=None):
+    """
+    Applies the generated CloudFormation template to AWS.
+
+    Args:
+        cloudformation_template (dict): The template to deploy.
+        region (str): The AWS region, or None for the environment configuration.
+        wait (bool): Track the stack to completion, streaming its events and
+            reporting per-resource timings, instead of returning right after
+            the create/update call.
+        cf_client: Optional CloudFormation client to use (e.g. a moto-backed one in tests).
+        stack_name (str): The name of the stack to create or update.
+        plan (bool): Diff against the deployed template and deploy through a
+            change set instead of calling create_stack/update_stack directly
+            (see plan_and_apply_aws_configuration).
+        confirm (callable): With plan, called after the change set is shown;
+            the change set is only executed if it returns True.
+        artifact_bucket (str): S3 bucket for templates too large to pass inline.
+            Required only for such templates (see prepare_template_source).
+        s3_client: Optional S3 client to upload them with.
+        label (str): With wait, prefix of the stack event lines (see wait_for_stack).
+
+    Returns:
+        bool: True if the operation was initiated (or, with wait, completed) successfully.
+    """
+    cf_client = cf_client or boto3.client('cloudformation', region_name=region)
+    try:
+        with profile_stage('prepare_template'):
+            cloudformation_template, template_source = prepare_template_source(
+                cloudformation_template, stack_name, artifact_bucket=artifact_bucket,
+                s3_client=s3_client or (boto3.client('s3', region_name=region) if artifact_bucket else None))
+    except (ValueError, ClientError) as e:
+        print(f"Error preparing the template of stack '{stack_name}': {e}")
+        return False
+    if plan:
+        return plan_and_apply_aws_configuration(cloudformation_template, cf_client, stack_name=stack_name, wait=wait, confirm=confirm,
+                                                template_source=template_source, label=label)
+    # Remember where the event history stands so only this operation's events are streamed
+    last_event_id = get_latest_stack_event_id(cf_client, stack_name) if wait else None
 
     try:
         print(f"Initiating CloudFormation stack creation for '{stack_name}' in region '{region if region else 'default'}'...")
-        response = cf_client.create_stack(
-            StackName=stack_name,
-            TemplateBody=json.dumps(cloudformation_template),
-            Capabilities=['CAPABILITY_IAM']  # If your template creates IAM roles
-            # Add other parameters as needed (e.g., Parameters)
-        )
+        with profile_stage('aws_create_stack'):
+            response = cf_client.create_stack(
+                StackName=stack_name,
+                Capabilities=['CAPABILITY_IAM'],  # If your template creates IAM roles
+                **template_source
+                # Add other parameters as needed (e.g., Parameters)
+            )
         print(f"CloudFormation stack '{stack_name}' creation initiated successfully.")
         print(f"Stack ID: {response['StackId']}")
-        return True
+        return _wait_if_requested(cf_client, stack_name, last_event_id, wait, label)
     except cf_client.exceptions.AlreadyExistsException:
         print(f"CloudFormation stack '{stack_name}' already exists. Attempting to update...")
         try:
-            response = cf_client.update_stack(
-                StackName=stack_name,
-                TemplateBody=json.dumps(cloudformation_template),
-                Capabilities=['CAPABILITY_IAM']  # If your template creates/updates IAM roles
-                # Add other parameters as needed
-            )
+            with profile_stage('aws_update_stack'):
+                response = cf_client.update_stack(
+                    StackName=stack_name,
+                    Capabilities=['CAPABILITY_IAM'],  # If your template creates/updates IAM roles
+                    **template_source
+                    # Add other parameters as needed
+                )
             print(f"CloudFormation stack '{stack_name}' update initiated successfully.")
             print(f"Stack ID: {response['StackId']}")
-            return True
+            return _wait_if_requested(cf_client, stack_name, last_event_id, wait, label)
         except ClientError as e:
             print(f"Error updating stack '{stack_name}': {e}")
             return False
@@ -45,4 +230,376 @@ def apply_aws_configuration(cloudformation_template, region=None):
         print(f"An unexpected error occurred during CloudFormation deployment: {e}")
         return False
 
+def _s3_url(s3_client, bucket, key):
+    region = getattr(getattr(s3_client, 'meta', None), 'region_name', None)
+    return f"https://{bucket}.s3.{region}.amazonaws.com/{key}" if region else f"https://{bucket}.s3.amazonaws.com/{key}"
+
+def upload_templates(s3_client, bucket, templates, prefix=ARTIFACT_PREFIX, max_workers=DEFAULT_UPLOAD_WORKERS):
+    """
+    Uploads templates to S3 concurrently and returns their URLs.
+
+    Keys are the SHA-256 of the template body, so an unchanged template keeps its
+    URL (CloudFormation then leaves its nested stack alone) and is not uploaded again.
+
+    Args:
+        s3_client: A boto3 S3 client (a moto client works for tests).
+        bucket (str): The artifact bucket, in the region of the stack.
+        templates (dict): Name -> template dict.
+        prefix (str): Key prefix inside the bucket.
+        max_workers (int): Maximum number of concurrent uploads.
+
+    Returns:
+        dict: Name -> template URL.
+    """
+    def upload(item):
+        name, template = item
+        body = json.dumps(template).encode()
+        key = f"{prefix}/{hashlib.sha256(body).hexdigest()}.json"
+        try:
+            s3_client.head_object(Bucket=bucket, Key=key)
+        except ClientError:
+            s3_client.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/json')
+        return name, _s3_url(s3_client, bucket, key)
+
+    if not templates:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(templates)))) as executor:
+        return dict(executor.map(upload, templates.items()))
+
+def prepare_template_source(cloudformation_template, stack_name, artifact_bucket=None, s3_client=None):
+    """
+    Decides how a template is passed to CloudFormation.
+
+    Templates within the inline limits are passed as TemplateBody. Larger ones
+    are uploaded to the artifact bucket and passed as TemplateURL, and templates
+    beyond the per-template size or resource limits are first split into nested
+    stacks (see modules.stack_splitter), whose child templates are uploaded in
+    parallel.
+
+    Args:
+        cloudformation_template (dict): The template to deploy.
+        stack_name (str): The stack name, used as the artifact key prefix.
+        artifact_bucket (str): The S3 bucket for uploaded templates.
+        s3_client: A boto3 S3 client; required when artifact_bucket is used.
+
+    Returns:
+        tuple: (template to deploy, dict with either 'TemplateBody' or 'TemplateURL').
+
+    Raises:
+        ValueError: If the template is too large and no artifact bucket is given,
+            or if it cannot be split.
+    """
+    body = json.dumps(cloudformation_template)
+    resource_count = len(cloudformation_template.get('Resources', {}))
+    if len(body.encode()) <= MAX_TEMPLATE_BODY_BYTES and resource_count <= MAX_RESOURCES_PER_TEMPLATE:
+        return cloudformation_template, {'TemplateBody': body}
+    if not artifact_bucket:
+        raise ValueError(f"The template has {resource_count} resources and {len(body.encode())} bytes, beyond the inline "
+                         f"limits of {MAX_RESOURCES_PER_TEMPLATE} resources and {MAX_TEMPLATE_BODY_BYTES} bytes; "
+                         "an artifact bucket is required to deploy it.")
+
+    prefix = f"{ARTIFACT_PREFIX}/{stack_name}"
+    if needs_splitting(cloudformation_template):
+        cloudformation_template, children = split_template(cloudformation_template)
+        print(f"Template split into {len(children)} nested stacks; uploading them to s3://{artifact_bucket}/{prefix}/...")
+        set_child_template_urls(cloudformation_template, upload_templates(s3_client, artifact_bucket, children, prefix))
+    if template_size(cloudformation_template) <= MAX_TEMPLATE_BODY_BYTES:
+        return cloudformation_template, {'TemplateBody': json.dumps(cloudformation_template)}
+    urls = upload_templates(s3_client, artifact_bucket, {stack_name: cloudformation_template}, prefix)
+    return cloudformation_template, {'TemplateURL': urls[stack_name]}
+
+def _wait_if_requested(cf_client, stack_name, last_event_id, wait, label=None):
+    if not wait:
+        return True
+    print(f"{f'[{label}] ' if label else ''}Waiting for stack '{stack_name}' to complete...")
+    with profile_stage('aws_wait_for_stack'):
+        result = wait_for_stack(cf_client, stack_name, last_event_id=last_event_id, label=label)
+    print_deploy_timings(result, label=label)
+    return result['success']
+
+def get_deployed_template(cf_client, stack_name):
+    """
+    Fetches the status and template of a deployed stack.
+
+    Returns:
+        tuple: (stack status, template dict), or (None, None) if the stack does not exist.
+    """
+    try:
+        stacks = cf_client.describe_stacks(StackName=stack_name).get('Stacks', [])
+    except ClientError as e:
+        if 'does not exist' in str(e):
+            return None, None
+        raise
+    if not stacks:
+        return None, None
+    status = stacks[0]['StackStatus']
+    if status == 'REVIEW_IN_PROGRESS':  # Created by a change set that was never executed
+        return status, None
+    template_body = cf_client.get_template(StackName=stack_name, TemplateStage='Original')['TemplateBody']
+    if isinstance(template_body, str):  # boto3 only decodes JSON bodies; ours always are
+        template_body = json.loads(template_body)
+    return status, template_body
+
+def wait_for_change_set(cf_client, stack_name, change_set_name, poll_interval=DEFAULT_POLL_INTERVAL,
+                        max_poll_interval=MAX_POLL_INTERVAL, timeout=DEFAULT_WAIT_TIMEOUT, sleep=time.sleep):
+    """
+    Waits until a change set has been computed and collects all of its changes.
+
+    Returns:
+        dict: 'status', 'reason' and 'changes' (the ResourceChange dicts of every page).
+    """
+    start = time.monotonic()
+    interval = poll_interval
+    while True:
+        response = cf_client.describe_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+        status = response.get('Status')
+        if status in ('CREATE_COMPLETE', 'FAILED') or time.monotonic() - start >= timeout:
+            break
+        sleep(interval)
+        interval = min(interval * POLL_BACKOFF_FACTOR, max_poll_interval)
+
+    changes = [change['ResourceChange'] for change in response.get('Changes', []) if 'ResourceChange' in change]
+    while response.get('NextToken'):
+        response = cf_client.describe_change_set(StackName=stack_name, ChangeSetName=change_set_name,
+                                                 NextToken=response['NextToken'])
+        changes.extend(change['ResourceChange'] for change in response.get('Changes', []) if 'ResourceChange' in change)
+    return {'status': status, 'reason': response.get('StatusReason', ''), 'changes': changes}
+
+def print_change_set(changes):
+    """Prints the resources a change set adds, modifies, replaces or removes."""
+    print(f"Change set ({len(changes)} resource changes):")
+    for change in changes:
+        action = change.get('Action')
+        replacement = change.get('Replacement')
+        if action == 'Modify' and replacement == 'True':
+            action = 'Replace'
+        elif action == 'Modify' and replacement == 'Conditional':
+            action = 'Modify (may replace)'
+        print(f"  {action:<20} {change.get('LogicalResourceId')} ({change.get('ResourceType')})")
+
+def plan_and_apply_aws_configuration(cloudformation_template, cf_client, stack_name=DEFAULT_STACK_NAME, wait=False, confirm=None,
+                                     template_source=None, label=None):
+    """
+    Deploys a template through a CloudFormation change set, skipping no-op updates.
+
+    The template is first compared with the deployed one using a structural
+    hash-per-resource diff (see modules.template_diff), so an unchanged template
+    costs two read calls and no update. Otherwise a change set is created and
+    its added, modified, replaced and removed resources are printed before it is
+    executed.
+
+    Args:
+        cloudformation_template (dict): The template to deploy.
+        cf_client: A boto3 CloudFormation client.
+        stack_name (str): The name of the stack to create or update.
+        wait (bool): Track the stack to completion after executing the change set.
+        confirm (callable): Called after the change set is shown; the change set
+            is only executed if it returns True. None executes it right away.
+        template_source (dict): TemplateBody or TemplateURL argument from
+            prepare_template_source(); defaults to the template inline.
+        label (str): With wait, prefix of the stack event lines (see wait_for_stack).
+
+    Returns:
+        bool: True if nothing had to change or the change set was executed
+            (and, with wait, completed) successfully. False for a stack that
+            is failed, rolled back or busy with another operation, because it
+            cannot be deployed to (or be up to date) in that state.
+    """
+    try:
+        with profile_stage('aws_get_deployed_template'):
+            status, deployed_template = get_deployed_template(cf_client, stack_name)
+        if status is not None and status != 'REVIEW_IN_PROGRESS' and status not in STACK_STABLE_STATUSES:
+            if status.endswith('_IN_PROGRESS'):
+                print(f"Stack '{stack_name}' has an operation in progress ({status}). Deploy again once it has finished.")
+            elif status == 'UPDATE_ROLLBACK_FAILED':
+                print(f"Stack '{stack_name}' is in state {status}. Continue the update rollback before deploying again.")
+            else:
+                print(f"Stack '{stack_name}' is in state {status} and cannot be updated. Delete it before deploying again.")
+            return False
+        exists = status in STACK_STABLE_STATUSES
+        if exists:
+            with profile_stage('template_diff'):
+                diff = diff_templates(deployed_template, cloudformation_template)
+            if not diff['changed']:
+                print(f"CloudFormation stack '{stack_name}' is up to date. Skipping deployment.")
+                return True
+            print(f"Template changes for stack '{stack_name}':")
+            print_template_diff(diff)
+
+        last_event_id = get_latest_stack_event_id(cf_client, stack_name) if wait else None
+        change_set_name = f"{CHANGE_SET_PREFIX}-{int(time.time() * 1000)}"
+        print(f"Creating change set '{change_set_name}' for stack '{stack_name}'...")
+        with profile_stage('aws_change_set'):
+            cf_client.create_change_set(
+                StackName=stack_name,
+                ChangeSetName=change_set_name,
+                Capabilities=['CAPABILITY_IAM'],  # If your template creates/updates IAM roles
+                ChangeSetType='UPDATE' if exists else 'CREATE',
+                **(template_source or {'TemplateBody': json.dumps(cloudformation_template)})
+            )
+            change_set = wait_for_change_set(cf_client, stack_name, change_set_name)
+        if change_set['status'] != 'CREATE_COMPLETE':
+            cf_client.delete_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+            if any(reason in change_set['reason'] for reason in NO_CHANGES_REASONS):
+                print(f"CloudFormation stack '{stack_name}' is up to date. Skipping deployment.")
+                return True
+            print(f"Error creating change set for stack '{stack_name}': {change_set['reason'] or change_set['status']}")
+            return False
+
+        print_change_set(change_set['changes'])
+        if confirm is not None and not confirm():
+            cf_client.delete_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+            print("Change set discarded.")
+            return False
+        with profile_stage('aws_execute_change_set'):
+            cf_client.execute_change_set(StackName=stack_name, ChangeSetName=change_set_name)
+        print(f"Change set '{change_set_name}' execution initiated successfully.")
+        return _wait_if_requested(cf_client, stack_name, last_event_id, wait, label)
+    except ClientError as e:
+        print(f"Error deploying stack '{stack_name}' through a change set: {e}")
+        return False
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter.
+
+    Tokens are refilled continuously at 'rate' per second up to 'capacity';
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate=DEFAULT_API_CALLS_PER_SECOND, capacity=DEFAULT_API_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+class RateLimitedClient:
+    """Wraps a boto3 client so every API call first takes a token from a TokenBucket."""
+
+    def __init__(self, client, bucket):
+        self._client = client
+        self._bucket = bucket
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute  # e.g. client.exceptions
+
+        def rate_limited_call(*args, **kwargs):
+            self._bucket.acquire()
+            return attribute(*args, **kwargs)
+        return rate_limited_call
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_aws_client(service, region=None, profile=None):
+    """
+    Returns a boto3 client for a service and region/profile, reusing it across calls.
+
+    Clients use botocore's adaptive retry mode, which backs off on throttling errors.
+    """
+    key = (service, region, profile)
+    with _clients_lock:  # boto3 sessions are not thread-safe; clients are
+        if key not in _clients:
+            session = boto3.Session(profile_name=profile) if profile else boto3.Session()
+            _clients[key] = session.client(service, region_name=region,
+                                           config=Config(retries={'mode': 'adaptive', 'max_attempts': 10}))
+        return _clients[key]
+
+def get_cloudformation_client(region=None, profile=None):
+    """Returns a CloudFormation client for a region/profile, reusing it across calls."""
+    return get_aws_client('cloudformation', region, profile)
+
+def target_label(target):
+    """Returns the 'profile/region' label of a deployment target."""
+    return f"{target.get('profile') or 'default'}/{target.get('region') or 'default'}"
+
+def deploy_to_targets(cloudformation_template, targets, stack_name=DEFAULT_STACK_NAME, wait=True,
+                      max_workers=DEFAULT_FANOUT_WORKERS, calls_per_second=DEFAULT_API_CALLS_PER_SECOND, plan=False,
+                      artifact_bucket=None):
+    """
+    Deploys the same template to many region/account targets concurrently.
+
+    Targets run in a bounded thread pool, so a rollout takes about as long as the
+    slowest target. Each (profile, region) pair gets its own token bucket,
+    because CloudFormation throttles per account and region, and clients are
+    reused per region. With wait, every stack event line is prefixed with the
+    target's 'profile/region' label, so the interleaved output of concurrent
+    targets stays traceable.
+
+    Args:
+        cloudformation_template (dict): The template to deploy.
+        targets (list): Dicts with a 'region' and optionally a 'profile' (AWS
+            named profile for the account) and 'stack_name' and
+            'artifact_bucket' overrides.
+        stack_name (str): Default stack name for targets without an override.
+        wait (bool): Track every stack to completion (see wait_for_stack).
+        max_workers (int): Maximum number of targets deployed at the same time.
+        calls_per_second (float): API call budget per account and region.
+        plan (bool): Deploy through change sets, skipping targets whose
+            deployed template is already up to date.
+        artifact_bucket (str): Default S3 bucket for oversized templates. Nested
+            stack templates must live in the stack's region, so multi-region
+            rollouts of large networks set it per target.
+
+    Returns:
+        list: One result dict per target, in the order of 'targets', with the
+            target, 'success', 'duration' in seconds and 'error'.
+    """
+    buckets = {}
+    for target in targets:
+        buckets.setdefault((target.get('profile'), target.get('region')), TokenBucket(calls_per_second))
+
+    def deploy(target):
+        start = time.monotonic()
+        result = {'target': target, 'success': False, 'duration': 0.0, 'error': None}
+        try:
+            with profile_stage('deploy_target'):
+                client = get_cloudformation_client(target.get('region'), target.get('profile'))
+                limited_client = RateLimitedClient(client, buckets[(target.get('profile'), target.get('region'))])
+                target_bucket = target.get('artifact_bucket', artifact_bucket)
+                s3_client = get_aws_client('s3', target.get('region'), target.get('profile')) if target_bucket else None
+                result['success'] = apply_aws_configuration(cloudformation_template, region=target.get('region'), wait=wait,
+                                                            cf_client=limited_client, stack_name=target.get('stack_name', stack_name),
+                                                            plan=plan, artifact_bucket=target_bucket, s3_client=s3_client,
+                                                            label=target_label(target))
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        result['duration'] = time.monotonic() - start
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as executor:
+        return list(executor.map(deploy, targets))
+
+def print_fanout_report(results, elapsed=None):
+    """Prints the consolidated result of deploy_to_targets."""
+    succeeded = sum(1 for r in results if r['success'])
+    print("\nDeployment Report:")
+    print(f"  Targets: {len(results)} ({succeeded} succeeded, {len(results) - succeeded} failed)")
+    if elapsed is not None:
+        print(f"  Wall time: {elapsed:.1f}s (sum of target times: {sum(r['duration'] for r in results):.1f}s)")
+    for r in results:
+        label = target_label(r['target'])
+        if r['success']:
+            outcome = "OK"
+        elif r['error']:
+            outcome = f"FAILED ({r['error']})"
+        else:
+            outcome = "FAILED"
+        print(f"  - {label}: {outcome} in {r['duration']:.1f}s")
+
 # You can add functions for Azure and GCP deployment here later
\ No newline at end of file
@@ -1,57 +1,51 @@
 import yaml
 
-def generate_aws_cloudformation(requirements):
-    """
-    Generates an AWS CloudFormation template based on the network requirements.
+from modules.network_model import ensure_network_model
+from modules.template_stream import LazyObject
 
-    Args:
-        requirements (dict): A dictionary containing the network requirements.
-
-    Returns:
-        dict: A dictionary representing the AWS CloudFormation template.
-    """
-    template = {
-        "AWSTemplateFormatVersion": "2010-09-09",
-        "Description": f"Network infrastructure for {requirements.get('application', 'YourApp')}",
-        "Resources": {}
-    }
+def _network_name(model):
+    return model.name or "your-network-name"
 
-    network = requirements.get("network", {})
-    vpc_config = network.get("ip_address_space", "10.0.0.0/16")
-    network_name = network.get("name", "your-network-name")
-    subnets_config = network.get("subnets", [])
-    load_balancer_config = network.get("load_balancer", {})
-    security_config = network.get("security", {})
-    firewall_rules = network.get("firewall", {}).get("rules", [])
-
-    # VPC
-    template["Resources"]["VPC"] = {
-        "Type": "AWS::EC2::VPC",
-        "Properties": {
-            "CidrBlock": vpc_config,
-            "EnableDnsSupport": True,
-            "EnableDnsHostnames": True,
-            "Tags": [{"Key": "Name", "Value": network_name}]
+def build_vpc_resources(model):
+    """Builds the VPC resource."""
+    return {
+        "VPC": {
+            "Type": "AWS::EC2::VPC",
+            "Properties": {
+                "CidrBlock": model.ip_address_space or "10.0.0.0/16",
+                "EnableDnsSupport": True,
+                "EnableDnsHostnames": True,
+                "Tags": [{"Key": "Name", "Value": _network_name(model)}]
+            }
         }
     }
 
-    # Subnets
-    for i, subnet in enumerate(subnets_config):
-        logical_resource_id = subnet["name"].replace("-", "").lower()
+def iter_subnet_resources(model):
+    """Yields (logical ID, resource) for one AWS::EC2::Subnet per subnet."""
+    for i, subnet in enumerate(model.subnets):
         az_selector = 0 if i == 0 else 1  # Simple AZ selection for two subnets
-        template["Resources"][logical_resource_id] = {
+        yield subnet.logical_id, {
             "Type": "AWS::EC2::Subnet",
             "Properties": {
                 "VpcId": {"Ref": "VPC"},
-                "CidrBlock": subnet["cidr"],
+                "CidrBlock": subnet.cidr,
                 "AvailabilityZone": {"Fn::Select": [az_selector, {"Fn::GetAZs": {"Ref": "AWS::Region"}}]},
-                "MapPublicIpOnLaunch": subnet.get("purpose", "").lower() == "frontend",
-                "Tags": [{"Key": "Name", "Value": subnet["name"]}]
+                "MapPublicIpOnLaunch": subnet.is_frontend,
+                "Tags": [{"Key": "Name", "Value": subnet.name if subnet.name is not None else subnet.compact_name}]
             }
         }
 
+def build_subnet_resources(model):
+    """Builds one AWS::EC2::Subnet per subnet."""
+    return dict(iter_subnet_resources(model))
+
+def build_gateway_resources(model):
+    """Builds the internet gateway, its VPC attachment and the application security group."""
+    network_name = _network_name(model)
+    resources = {}
+
     # Internet Gateway
-    template["Resources"]["InternetGateway"] = {
+    resources["InternetGateway"] = {
         "Type": "AWS::EC2::InternetGateway",
         "Properties": {
             "Tags": [{"Key": "Name", "Value": f"{network_name}-igw"}]
@@ -59,7 +53,7 @@ def generate_aws_cloudformation(requirements):
     }
 
     # VPC Gateway Attachment
-    template["Resources"]["VPCGatewayAttachment"] = {
+    resources["VPCGatewayAttachment"] = {
         "Type": "AWS::EC2::VPCGatewayAttachment",
         "Properties": {
             "VpcId": {"Ref": "VPC"},
@@ -68,7 +62,7 @@ def generate_aws_cloudformation(requirements):
     }
 
     # Application Security Group (even if LB is disabled, we might need it for instances)
-    template["Resources"]["ApplicationSecurityGroup"] = {
+    resources["ApplicationSecurityGroup"] = {
         "Type": "AWS::EC2::SecurityGroup",
         "Properties": {
             "GroupDescription": "Security group for application instances",
@@ -83,33 +77,46 @@ def generate_aws_cloudformation(requirements):
             "Tags": [{"Key": "Name", "Value": f"{network_name}-app-sg"}]
         }
     }
-
-    # Load Balancer (if enabled)
-    if load_balancer_config.get("enabled", False):
-        lb_name = f"{network_name}-lb".replace("-", "").lower()
-        template["Resources"][lb_name] = {
-            "Type": "AWS::ElasticLoadBalancingV2::LoadBalancer",
-            "Properties": {
-                "Scheme": "internet-facing",
-                "Subnets": [
-                    {"Ref": "frontendsubnet"}
-                ],
-                "SecurityGroups": [{"Ref": "ApplicationSecurityGroup"}],
-                "Tags": [{"Key": "Name", "Value": lb_name}]
-            }
+    return resources
+
+def build_load_balancer_resources(model):
+    """Builds the load balancer, its listeners and target group (nothing if it is disabled)."""
+    load_balancer = model.load_balancer
+    resources = {}
+    if not load_balancer.enabled:
+        return resources
+
+    lb_name = f"{_network_name(model)}-lb".replace("-", "").lower()
+    # Place the load balancer in the frontend subnets, resolved through the model's name index
+    frontend_refs = [{"Ref": s.logical_id} for s in model.subnets if s.is_frontend]
+    resources[lb_name] = {
+        "Type": "AWS::ElasticLoadBalancingV2::LoadBalancer",
+        "Properties": {
+            "Scheme": "internet-facing",
+            "Subnets": frontend_refs or [{"Ref": "frontendsubnet"}],
+            "SecurityGroups": [{"Ref": "ApplicationSecurityGroup"}],
+            "Tags": [{"Key": "Name", "Value": lb_name}]
         }
+    }
 
-        listeners = []
-        for listener_config in load_balancer_config.get("listeners", []):
-            listeners.append({
-                "Port": listener_config["port"],
-                "Protocol": listener_config["protocol"],
-                "DefaultActions": [{
-                    "Type": "forward",
-                    "TargetGroupArn": {"Ref": f"{lb_name}TargetGroup"}
-                }]
-            })
-        template["Resources"][f"{lb_name}Listener"] = {
+    default_actions = [{
+        "Type": "forward",
+        "TargetGroupArn": {"Ref": f"{lb_name}TargetGroup"}
+    }]
+    first_listener = load_balancer.listeners[0] if load_balancer.listeners else None
+    resources[f"{lb_name}Listener"] = {
+        "Type": "AWS::ElasticLoadBalancingV2::Listener",
+        "Properties": {
+            "LoadBalancerArn": {"Ref": lb_name},
+            "DefaultActions": default_actions,
+            "Port": first_listener.port if first_listener else None, # Default to first listener port/protocol
+            "Protocol": first_listener.protocol if first_listener else None
+        }
+    }
+    # Handle multiple listeners (simplified for now)
+    for i, listener in enumerate(load_balancer.listeners):
+        listener_resource_id = f"{lb_name}Listener{i+1}"
+        resources[listener_resource_id] = {
             "Type": "AWS::ElasticLoadBalancingV2::Listener",
             "Properties": {
                 "LoadBalancerArn": {"Ref": lb_name},
@@ -117,44 +124,85 @@ def generate_aws_cloudformation(requirements):
                     "Type": "forward",
                     "TargetGroupArn": {"Ref": f"{lb_name}TargetGroup"}
                 }],
-                "Port": load_balancer_config["listeners"][0]["port"], # Default to first listener port/protocol
-                "Protocol": load_balancer_config["listeners"][0]["protocol"]
+                "Port": listener.port,
+                "Protocol": listener.protocol
             }
         }
-        if listeners:
-            template["Resources"][f"{lb_name}Listener"]["Properties"]["DefaultActions"] = listeners[0]["DefaultActions"]
-            template["Resources"][f"{lb_name}Listener"]["Properties"]["Port"] = listeners[0]["Port"]
-            template["Resources"][f"{lb_name}Listener"]["Properties"]["Protocol"] = listeners[0]["Protocol"]
-            # Handle multiple listeners (simplified for now)
-            for i, listener_config in enumerate(listeners):
-                listener_resource_id = f"{lb_name}Listener{i+1}"
-                template["Resources"][listener_resource_id] = {
-                    "Type": "AWS::ElasticLoadBalancingV2::Listener",
-                    "Properties": {
-                        "LoadBalancerArn": {"Ref": lb_name},
-                        "DefaultActions": [{
-                            "Type": "forward",
-                            "TargetGroupArn": {"Ref": f"{lb_name}TargetGroup"}
-                        }],
-                        "Port": listener_config["port"],
-                        "Protocol": listener_config["protocol"]
-                    }
-                }
-
 
-        template["Resources"][f"{lb_name}TargetGroup"] = {
-            "Type": "AWS::ElasticLoadBalancingV2::TargetGroup",
-            "Properties": {
-                "Port": load_balancer_config.get("listeners", [{}])[0].get("port", 80),
-                "Protocol": load_balancer_config.get("listeners", [{}])[0].get("protocol", "HTTP").upper(),
-                "VpcId": {"Ref": "VPC"},
-                "HealthCheckPath": load_balancer_config.get("health_check_path", "/"),
-                "Tags": [{"Key": "Name", "Value": f"{lb_name}-tg"}]
-            }
+    resources[f"{lb_name}TargetGroup"] = {
+        "Type": "AWS::ElasticLoadBalancingV2::TargetGroup",
+        "Properties": {
+            "Port": (first_listener.port if first_listener else None) or 80,
+            "Protocol": ((first_listener.protocol if first_listener else None) or "HTTP").upper(),
+            "VpcId": {"Ref": "VPC"},
+            "HealthCheckPath": load_balancer.health_check_path or "/",
+            "Tags": [{"Key": "Name", "Value": f"{lb_name}-tg"}]
         }
+    }
+    return resources
+
+# (section name, builder, requirement sections it reads) in template order.
+# The watch mode only rebuilds the sections whose inputs changed.
+TEMPLATE_SECTIONS = (
+    ('vpc', build_vpc_resources, ('name', 'ip_address_space')),
+    ('subnets', build_subnet_resources, ('subnets',)),
+    ('gateway', build_gateway_resources, ('name',)),
+    ('load_balancer', build_load_balancer_resources, ('load_balancer', 'subnets', 'name')),
+)
+
+def _template_skeleton(model, resources):
+    return {
+        "AWSTemplateFormatVersion": "2010-09-09",
+        "Description": f"Network infrastructure for {model.application or 'YourApp'}",
+        "Resources": resources
+    }
 
+def assemble_template(model, fragments):
+    """Assembles the CloudFormation template from the builder outputs, in TEMPLATE_SECTIONS order."""
+    template = _template_skeleton(model, {})
+    for fragment in fragments:
+        template["Resources"].update(fragment)
     return template
 
+def iter_aws_resources(requirements):
+    """
+    Yields the (logical ID, resource) pairs of the CloudFormation template one at a time.
+
+    Subnets are built as they are consumed, so a caller writing them out
+    (see stream_aws_cloudformation) never holds all of them at once.
+    """
+    model = ensure_network_model(requirements)
+    for _section, builder, _inputs in TEMPLATE_SECTIONS:
+        if builder is build_subnet_resources:
+            yield from iter_subnet_resources(model)
+        else:
+            yield from builder(model).items()
+
+def stream_aws_cloudformation(requirements):
+    """
+    Returns the CloudFormation template with a lazy Resources section.
+
+    Written with template_stream.write_template_stream, the output is identical
+    to json.dump(generate_aws_cloudformation(requirements), indent=2).
+    """
+    model = ensure_network_model(requirements)
+    return LazyObject(_template_skeleton(model, LazyObject(iter_aws_resources(model))).items())
+
+def generate_aws_cloudformation(requirements):
+    """
+    Generates an AWS CloudFormation template based on the network requirements.
+
+    Args:
+        requirements (dict or NetworkModel): The network requirements, either as
+            the parsed dict or as a prebuilt NetworkModel shared with the other
+            generators.
+
+    Returns:
+        dict: A dictionary representing the AWS CloudFormation template.
+    """
+    model = ensure_network_model(requirements)
+    return assemble_template(model, [builder(model) for _section, builder, _inputs in TEMPLATE_SECTIONS])
+
 if __name__ == '__main__':
     # Example usage:
     requirements_data = {
@@ -1,197 +1,321 @@
 import json
 
-def generate_azure_arm_template(yaml_data):
-    """
-    Generates an Azure ARM template based on the network requirements
-    in the provided YAML data.
+from modules.network_model import ensure_network_model
+from modules.resource_graph import ResourceRegistry
+from modules.rule_compactor import format_port_range
+from modules.template_stream import LazyArray, LazyObject
 
-    Args:
-        yaml_data (dict): The parsed network requirements YAML data.
+def _vnet_name(model):
+    return (model.name or 'defaultVnet').replace('-', '')
 
-    Returns:
-        dict: A dictionary representing the Azure ARM template.
-    """
-    template = {
-        "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#",
-        "contentVersion": "1.0.0.0",
-        "parameters": {},
-        "variables": {},
-        "resources": [],
-        "outputs": {}
-    }
+def _location(model):
+    return model.region or 'eastus'  # Default Azure region
 
-    network_section = yaml_data.get('network', {})
-    location = yaml_data.get('region', 'eastus')  # Default Azure region
-
-    # -------------------- Virtual Network --------------------
-    vnet_name = network_section.get('name', 'defaultVnet').replace('-', '')
-    vnet_address_space = network_section.get('ip_address_space', '10.0.0.0/16')
-    template['resources'].append({
+def build_vnet_resources(model):
+    """Builds the virtual network."""
+    return [{
         "type": "Microsoft.Network/virtualNetworks",
         "apiVersion": "2020-11-01",
-        "name": vnet_name,
-        "location": location,
+        "name": _vnet_name(model),
+        "location": _location(model),
         "properties": {
             "addressSpace": {
-                "addressPrefixes": [vnet_address_space]
+                "addressPrefixes": [model.ip_address_space or '10.0.0.0/16']
             },
             "enableDnsSupport": True,
             "enableVmProtection": False,
             "subnets": []
         }
-    })
+    }]
 
-    # -------------------- Network Security Group --------------------
-    nsg_name = f'{vnet_name}-nsg'
-    template['resources'].append({
+FIRST_RULE_PRIORITY = 100
+# Azure allows at most 1000 security rules per NSG. Numbered from
+# FIRST_RULE_PRIORITY, they also stay below the highest priority, 4096.
+MAX_NSG_RULES = 1000
+
+def check_nsg_limits(model):
+    """
+    Raises ValueError if the NSG would get more security rules than Azure allows.
+
+    Every subnet is associated with the same NSG, so the rules cannot be
+    spread over several NSGs without changing which rules apply to which
+    subnet. Such a network is rejected instead of producing a template that
+    Azure refuses to deploy.
+    """
+    firewall_rules, _ = model.compacted_firewall_rules()
+    rule_count = sum(1 for rule in firewall_rules if rule['port_ranges'])
+    if rule_count > MAX_NSG_RULES:
+        raise ValueError(f"The firewall needs {rule_count} NSG security rules after compaction, "
+                         f"more than the {MAX_NSG_RULES} Azure allows per network security group.")
+
+def iter_security_rules(model):
+    """Yields one NSG security rule per compacted firewall rule."""
+    # Compact first so a rule with a long port list becomes one NSG rule with
+    # port ranges instead of one rule per port (NSGs have a rule quota).
+    firewall_rules, _ = model.compacted_firewall_rules()
+    rule_count = 0
+    for rule in firewall_rules:
+        port_ranges = [format_port_range(r) for r in rule['port_ranges']]
+        if not port_ranges:
+            continue
+        rule_name = rule['name'].replace('-', '')
+        security_rule = {
+            "name": f'{rule_name}-{port_ranges[0]}',
+            "properties": {
+                "priority": FIRST_RULE_PRIORITY + rule_count, # Basic priority, unique per rule
+                "direction": "Inbound",
+                "access": "Allow",
+                "protocol": rule['protocol'],
+                "sourcePortRange": "*",
+                # Subnet names resolve to their CIDR; 'Internet', '*' and CIDRs pass through
+                "sourceAddressPrefix": model.resolve_cidr(rule['source']),
+                "destinationAddressPrefix": model.resolve_cidr(rule['destination'])
+            }
+        }
+        if len(port_ranges) == 1:
+            security_rule['properties']['destinationPortRange'] = port_ranges[0]
+        else:
+            security_rule['properties']['destinationPortRanges'] = port_ranges
+        rule_count += 1
+        yield security_rule
+
+def _nsg_resource(model, security_rules):
+    return {
         "type": "Microsoft.Network/networkSecurityGroups",
         "apiVersion": "2020-11-01",
-        "name": nsg_name,
-        "location": location,
+        "name": f'{_vnet_name(model)}-nsg',
+        "location": _location(model),
         "properties": {
-            "securityRules": []
+            "securityRules": security_rules
         }
-    })
+    }
 
-    subnets = []
-    if isinstance(network_section, dict):
-        subnets = network_section.get('subnets', [])
+def build_nsg_resources(model):
+    """Builds the network security group with one security rule per compacted firewall rule."""
+    check_nsg_limits(model)
+    return [_nsg_resource(model, list(iter_security_rules(model)))]
 
-    # -------------------- Public IP Address (if needed for Load Balancer) --------------------
-    load_balancer_config = network_section.get('load_balancer', {})
-    if load_balancer_config.get('enabled'):
-        public_ip_name = f'{vnet_name}-pip'
-        template['resources'].append({
-            "type": "Microsoft.Network/publicIPAddresses",
-            "apiVersion": "2020-11-01",
-            "name": public_ip_name,
-            "location": location,
-            "properties": {
-                "publicIPAllocationMethod": "Static"  # Or "Dynamic"
-            }
-        })
+def build_load_balancer_resources(model):
+    """Builds the public IP address and load balancer (nothing if the load balancer is disabled)."""
+    load_balancer = model.load_balancer
+    if not load_balancer.enabled:
+        return []
+    vnet_name = _vnet_name(model)
+    location = _location(model)
 
-        # -------------------- Load Balancer --------------------
-        lb_name = f'{vnet_name}-lb'
-        frontend_ip_config_name = 'frontendIPConfig'
-        template['resources'].append({
-            "type": "Microsoft.Network/loadBalancers",
-            "apiVersion": "2020-11-01",
-            "name": lb_name,
-            "location": location,
-            "dependsOn": [
-                f"Microsoft.Network/publicIPAddresses/{public_ip_name}",
-                f"Microsoft.Network/virtualNetworks/{vnet_name}"
-            ],
-            "properties": {
-                "frontendIPConfigurations": [
-                    {
-                        "name": frontend_ip_config_name,
-                        "properties": {
-                            "publicIPAddress": {
-                                "id": f"[resourceId('Microsoft.Network/publicIPAddresses', '{public_ip_name}')]"
-                            }
+    # -------------------- Public IP Address --------------------
+    public_ip_name = f'{vnet_name}-pip'
+    public_ip = {
+        "type": "Microsoft.Network/publicIPAddresses",
+        "apiVersion": "2020-11-01",
+        "name": public_ip_name,
+        "location": location,
+        "properties": {
+            "publicIPAllocationMethod": "Static"  # Or "Dynamic"
+        }
+    }
+
+    # -------------------- Load Balancer --------------------
+    lb_name = f'{vnet_name}-lb'
+    frontend_ip_config_name = 'frontendIPConfig'
+    lb_resource = {
+        "type": "Microsoft.Network/loadBalancers",
+        "apiVersion": "2020-11-01",
+        "name": lb_name,
+        "location": location,
+        "properties": {
+            "frontendIPConfigurations": [
+                {
+                    "name": frontend_ip_config_name,
+                    "properties": {
+                        "publicIPAddress": {
+                            "id": f"[resourceId('Microsoft.Network/publicIPAddresses', '{public_ip_name}')]"
                         }
                     }
-                ],
-                "backendAddressPools": [],
-                "loadBalancingRules": [],
-                "probes": []
-            }
-        })
-
-        # -------------------- Load Balancing Rules --------------------
-        listeners = load_balancer_config.get('listeners', [])
-        for i, listener in enumerate(listeners):
-            listener_port = listener.get('port', 80)
-            listener_protocol = listener.get('protocol', 'TCP').upper()
-            lb_rule_name = f'LBRule{listener_port}'
-            template['resources'][3]['properties']['loadBalancingRules'].append({
-                "name": f'{lb_rule_name}',
-                "properties": {
-                    "frontendIPConfiguration": {
-                        "id": f"[resourceId('Microsoft.Network/loadBalancers/{lb_name}/frontendIPConfigurations', '{frontend_ip_config_name}')]"
-                    },
-                    "frontendPort": listener_port,
-                    "backendPort": listener_port,
-                    "protocol": listener_protocol,
-                    "enableFloatingIP": False,
-                    "idleTimeoutInMinutes": 4,
-                    "backendAddressPool": {
-                        "id": f"[resourceId('Microsoft.Network/loadBalancers/{lb_name}/backendAddressPools', 'backendPool')]"
-                    },
-                    "enableTcpReset": False
                 }
-            })
-
-        # -------------------- Backend Address Pool --------------------
-        template['resources'][3]['properties']['backendAddressPools'].append({
-            "name": "backendPool",
-            "properties": {}
-        })
+            ],
+            "backendAddressPools": [],
+            "loadBalancingRules": [],
+            "probes": []
+        }
+    }
 
-        # -------------------- Probe --------------------
-        health_check_path = load_balancer_config.get('health_check_path', '/')
-        probe_name = 'httpProbe'
-        template['resources'][3]['properties']['probes'].append({
-            "name": probe_name,
+    # -------------------- Load Balancing Rules --------------------
+    for i, listener in enumerate(load_balancer.listeners):
+        listener_port = listener.port or 80
+        listener_protocol = (listener.protocol or 'TCP').upper()
+        lb_rule_name = f'LBRule{listener_port}'
+        lb_resource['properties']['loadBalancingRules'].append({
+            "name": f'{lb_rule_name}',
             "properties": {
-                "protocol": "Http",
-                "port": 80,  # Default probe port
-                "path": health_check_path,
-                "intervalInSeconds": 15,
-                "numberOfProbes": 2
+                "frontendIPConfiguration": {
+                    "id": f"[resourceId('Microsoft.Network/loadBalancers/{lb_name}/frontendIPConfigurations', '{frontend_ip_config_name}')]"
+                },
+                "frontendPort": listener_port,
+                "backendPort": listener_port,
+                "protocol": listener_protocol,
+                "enableFloatingIP": False,
+                "idleTimeoutInMinutes": 4,
+                "backendAddressPool": {
+                    "id": f"[resourceId('Microsoft.Network/loadBalancers/{lb_name}/backendAddressPools', 'backendPool')]"
+                },
+                "enableTcpReset": False
             }
         })
 
-    # -------------------- Security Rules --------------------
-    firewall_rules = network_section.get('firewall', {}).get('rules', [])
-    nsg_index = 1 # NSG is now the second resource (index 1)
-    for rule in firewall_rules:
-        rule_name = rule.get('name', 'defaultRule').replace('-', '')
-        ports = rule.get('ports', [])
-        protocol = rule.get('protocol', 'TCP').upper()
-        source = rule.get('source', '*')  # Azure uses '*' for any
-        destination = rule.get('destination', '*') # Needs more specific mapping later
-        priority = 100 + len(template['resources'][nsg_index]['properties']['securityRules']) # Basic priority
-
-        for port in ports:
-            template['resources'][nsg_index]['properties']['securityRules'].append({
-                "name": f'{rule_name}-{port}',
-                "properties": {
-                    "priority": priority,
-                    "direction": "Inbound",
-                    "access": "Allow",
-                    "protocol": protocol,
-                    "sourcePortRange": "*",
-                    "destinationPortRange": str(port),
-                    "sourceAddressPrefix": source,
-                    "destinationAddressPrefix": destination
-                }
-            })
+    # -------------------- Backend Address Pool --------------------
+    lb_resource['properties']['backendAddressPools'].append({
+        "name": "backendPool",
+        "properties": {}
+    })
+
+    # -------------------- Probe --------------------
+    health_check_path = load_balancer.health_check_path or '/'
+    probe_name = 'httpProbe'
+    lb_resource['properties']['probes'].append({
+        "name": probe_name,
+        "properties": {
+            "protocol": "Http",
+            "port": 80,  # Default probe port
+            "path": health_check_path,
+            "intervalInSeconds": 15,
+            "numberOfProbes": 2
+        }
+    })
+    return [public_ip, lb_resource]
 
-    # -------------------- Subnet Association with NSG --------------------
-    for subnet_config in subnets: # <--- Line 170 where the error occurred
-        subnet_name = subnet_config.get('name', 'defaultSubnet').replace('-', '')
-        template['resources'].append({
+def iter_subnet_resources(model):
+    """Yields one subnet resource per subnet, each associated with the NSG."""
+    vnet_name = _vnet_name(model)
+    nsg_name = f'{vnet_name}-nsg'
+    location = _location(model)
+    for subnet in model.subnets:
+        subnet_name = subnet.compact_name
+        yield {
             "type": "Microsoft.Network/virtualNetworks/subnets",
             "apiVersion": "2020-11-01",
             "name": f"{vnet_name}/{subnet_name}",
             "location": location,
-            "dependsOn": [
-                f"Microsoft.Network/virtualNetworks/{vnet_name}",
-                f"Microsoft.Network/networkSecurityGroups/{nsg_name}"
-            ],
             "properties": {
-                "addressPrefix": subnet_config.get('cidr'),
+                "addressPrefix": subnet.cidr,
                 "networkSecurityGroup": {
                     "id": f"[resourceId('Microsoft.Network/networkSecurityGroups', '{nsg_name}')]"
                 }
             }
-        })
+        }
 
+def build_subnet_resources(model):
+    """Builds one subnet per subnet, each associated with the NSG."""
+    return list(iter_subnet_resources(model))
+
+# (section name, builder, requirement sections it reads) in template order.
+# The watch mode only rebuilds the sections whose inputs changed.
+TEMPLATE_SECTIONS = (
+    ('vnet', build_vnet_resources, ('name', 'ip_address_space', 'region')),
+    ('nsg', build_nsg_resources, ('name', 'region', 'firewall', 'subnets')),
+    ('load_balancer', build_load_balancer_resources, ('load_balancer', 'name', 'region')),
+    ('subnets', build_subnet_resources, ('subnets', 'name', 'region')),
+)
+
+def _template_skeleton(resources):
+    return {
+        "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#",
+        "contentVersion": "1.0.0.0",
+        "parameters": {},
+        "variables": {},
+        "resources": resources,
+        "outputs": {}
+    }
+
+def assemble_template(model, fragments):
+    """
+    Assembles the ARM template from the builder outputs, in TEMPLATE_SECTIONS order.
+
+    The builders write no dependsOn; each resource gets the minimal dependsOn
+    of its dependencies in the template (see resource_graph.ResourceRegistry).
+    """
+    registry = ResourceRegistry()
+    template = _template_skeleton([])
+    for (_section, builder, _inputs), fragment in zip(TEMPLATE_SECTIONS, fragments):
+        # Security rules hold only CIDRs and ports, so the (large) NSG is not searched for references
+        references = () if builder is build_nsg_resources else None
+        template['resources'].extend(registry.add(resource, references=references) for resource in fragment)
     return template
 
+def iter_azure_resources(yaml_data, registry=None):
+    """
+    Yields the ('<type>/<name>', resource) pairs of the ARM template one at a time.
+
+    Subnets are built as they are consumed, and the NSG comes as a LazyObject
+    whose securityRules are a LazyArray built while it is written, so even a
+    100k-rule NSG is never held in memory at once. Use
+    template_stream.materialize() to turn a resource into plain dicts.
+
+    Args:
+        yaml_data (dict or NetworkModel): The network requirements or model.
+        registry (ResourceRegistry): Registry the resources are added to (a
+            new one by default); afterwards it describes the dependency graph.
+
+    Raises:
+        ValueError: If the NSG would exceed Azure's rule limit (see check_nsg_limits).
+    """
+    model = ensure_network_model(yaml_data)
+    check_nsg_limits(model)
+    if registry is None:
+        registry = ResourceRegistry()
+    for _section, builder, _inputs in TEMPLATE_SECTIONS:
+        if builder is build_nsg_resources:
+            # The NSG references no other resource, and its rules must not be consumed here
+            nsg = _nsg_resource(model, LazyArray(iter_security_rules(model)))
+            nsg_id = f"{nsg['type']}/{nsg['name']}"
+            registry.add_key(nsg_id)
+            nsg['properties'] = LazyObject(nsg['properties'].items())
+            yield nsg_id, LazyObject(nsg.items())
+            continue
+        resources = iter_subnet_resources(model) if builder is build_subnet_resources else builder(model)
+        for resource in resources:
+            yield f"{resource['type']}/{resource['name']}", registry.add(resource)
+
+def azure_dependency_graph(yaml_data):
+    """
+    Builds the deployment dependency graph of the ARM template without keeping the template.
+
+    Returns:
+        ResourceRegistry: The registry; stats() has the edge counts and the critical path.
+    """
+    registry = ResourceRegistry()
+    for _resource in iter_azure_resources(yaml_data, registry):
+        pass
+    return registry
+
+def stream_azure_arm_template(yaml_data):
+    """
+    Returns the ARM template with a lazy resources list.
+
+    Written with template_stream.write_template_stream, the output is identical
+    to json.dump(generate_azure_arm_template(yaml_data), indent=2).
+    """
+    model = ensure_network_model(yaml_data)
+    return LazyObject(_template_skeleton(LazyArray(resource for _id, resource in iter_azure_resources(model))).items())
+
+def generate_azure_arm_template(yaml_data):
+    """
+    Generates an Azure ARM template based on the network requirements
+    in the provided YAML data.
+
+    Args:
+        yaml_data (dict or NetworkModel): The parsed network requirements YAML
+            data, or a prebuilt NetworkModel shared with the other generators.
+
+    Returns:
+        dict: A dictionary representing the Azure ARM template.
+
+    Raises:
+        ValueError: If the NSG would exceed Azure's rule limit (see check_nsg_limits).
+    """
+    model = ensure_network_model(yaml_data)
+    return assemble_template(model, [builder(model) for _section, builder, _inputs in TEMPLATE_SECTIONS])
+
 if __name__ == '__main__':
     # Example usage for testing
     example_requirements = {
@@ -0,0 +1,321 @@
+import glob
+import json
+import os
+import tempfile
+import time
+from functools import partial
+
+import yaml
+
+from modules.yaml_parser import read_yaml_file, validate_yaml_structure
+from modules.providers import get_generator, get_stream_generator
+from modules.template_cache import TemplateCache, DEFAULT_CACHE_MAX_BYTES
+from modules.network_model import build_network_model
+from modules.output_settings import DEFAULT_BATCH_OUTPUT_DIR, OUTPUT_CLOUDFORMATION_FILE
+from modules.template_stream import write_template_stream
+
+REQUIREMENTS_EXTENSIONS = ('.yaml', '.yml', '.json')
+# Below this many firewall rules, generating every provider in-process is
+# faster than starting worker processes for them.
+PARALLEL_PROVIDERS_MIN_RULES = 2000
+
+# (output filename, provider, serializer) for every provider written per application
+PROVIDER_OUTPUTS = (
+    ('aws.json', 'aws', lambda template: json.dumps(template, indent=2)),
+    ('azure.json', 'azure', lambda template: json.dumps(template, indent=2)),
+    ('gcp.yaml', 'gcp', lambda template: yaml.dump(template, indent=2)),
+)
+# Files this tool writes itself; discovery never mistakes them for requirements
+GENERATED_OUTPUT_FILES = frozenset([OUTPUT_CLOUDFORMATION_FILE] + [filename for filename, _provider, _serializer in PROVIDER_OUTPUTS])
+
+_template_caches = {}
+
+
+def _get_template_cache(cache_dir, max_bytes):
+    # One cache instance per worker process, so the directory size is only scanned once.
+    key = (cache_dir, max_bytes)
+    if key not in _template_caches:
+        _template_caches[key] = TemplateCache(cache_dir, max_bytes)
+    return _template_caches[key]
+
+
+def write_output_atomically(path, content):
+    """Writes a file through a temporary file and a rename, so readers never see a partial template."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as outfile:
+            outfile.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _is_inside(path, directories):
+    path = os.path.normcase(os.path.abspath(path))
+    return any(path == directory or path.startswith(directory + os.sep) for directory in directories)
+
+
+def discover_requirements_files(source, exclude_dirs=()):
+    """
+    Resolves a directory or glob pattern into a sorted list of requirements files.
+
+    Generated templates are never picked up: files under exclude_dirs (the
+    output and cache directories), hidden directories during a directory walk,
+    and files named like an output (GENERATED_OUTPUT_FILES) are skipped, so
+    'run_batch(".")' does not read back its own aws.json or output.json.
+
+    Args:
+        source (str): A directory (searched recursively for *.yaml / *.yml /
+            *.json files) or a glob pattern such as 'apps/**/network.yaml' or 'apps/*.json'.
+        exclude_dirs (iterable): Directories whose files are never returned.
+
+    Returns:
+        list: The sorted list of matching file paths.
+    """
+    excluded = [os.path.normcase(os.path.abspath(directory)) for directory in exclude_dirs if directory]
+    if os.path.isdir(source):
+        matches = []
+        for root, dirs, files in os.walk(source):
+            dirs[:] = [name for name in dirs if not name.startswith('.') and not _is_inside(os.path.join(root, name), excluded)]
+            for name in files:
+                if name.endswith(REQUIREMENTS_EXTENSIONS):
+                    matches.append(os.path.join(root, name))
+    else:
+        matches = [path for path in glob.glob(source, recursive=True) if os.path.isfile(path)]
+    return sorted(path for path in matches
+                  if os.path.basename(path) not in GENERATED_OUTPUT_FILES and not _is_inside(path, excluded))
+
+
+def source_root(source):
+    """Returns the directory a batch source is rooted at: the directory itself, or the non-glob prefix of a pattern."""
+    if os.path.isdir(source):
+        return source
+    parts = []
+    for part in source.replace(os.sep, '/').split('/'):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    else:
+        parts = parts[:-1]  # A plain file path: its directory
+    return '/'.join(parts) or '.'
+
+
+def application_names(files, root):
+    """
+    Returns the output directory name of every requirements file.
+
+    The name is the file's path relative to root without its extension, so
+    'apps/shop/network.yaml' under 'apps' becomes 'shop/network' and files
+    with the same stem in different directories do not overwrite each other.
+    """
+    return [os.path.splitext(os.path.relpath(path, root))[0] for path in files]
+
+
+def compile_requirements_file(filepath, output_dir=DEFAULT_BATCH_OUTPUT_DIR, cache_dir=None,
+                              cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, app_name=None):
+    """
+    Parses, validates and generates all provider templates for one requirements file.
+
+    The templates are written to '<output_dir>/<app_name>/' as aws.json,
+    azure.json and gcp.yaml. This function runs inside the worker processes,
+    so it never raises: failures are reported in the returned result.
+
+    Args:
+        filepath (str): Path to the requirements YAML file.
+        output_dir (str): Root directory for the per-application outputs.
+        cache_dir (str): Optional cache directory. When set, unchanged files skip
+            parsing, and templates whose requirements did not change are copied
+            from the cache instead of being generated and serialized again.
+        cache_max_bytes (int): Size budget of the template cache.
+        app_name (str): Output directory name (see application_names); defaults to the file stem.
+
+    Returns:
+        dict: The file path, success flag, error message, written outputs,
+            cache hits/misses and the time spent on the file in seconds.
+    """
+    start = time.perf_counter()
+    result = {'file': filepath, 'ok': False, 'error': None, 'outputs': [], 'seconds': 0.0,
+              'cache_hits': 0, 'cache_misses': 0}
+    try:
+        yaml_data = read_yaml_file(filepath, cache_dir=cache_dir)
+        if yaml_data is None:
+            result['error'] = "could not read requirements file"
+        elif not validate_yaml_structure(yaml_data):
+            result['error'] = "invalid requirements structure"
+        else:
+            app_dir = os.path.join(output_dir, app_name or os.path.splitext(os.path.basename(filepath))[0])
+            os.makedirs(app_dir, exist_ok=True)
+
+            cache = _get_template_cache(cache_dir, cache_max_bytes) if cache_dir else None
+            # Normalize once and share the model between the three generators
+            model = build_network_model(yaml_data)
+            for filename, provider, serializer in PROVIDER_OUTPUTS:
+                generator = get_generator(provider)
+                if cache is not None:
+                    hits = cache.hits
+                    content = cache.get_or_generate(yaml_data, generator, serializer, model=model)
+                    if cache.hits > hits:
+                        result['cache_hits'] += 1
+                    else:
+                        result['cache_misses'] += 1
+                else:
+                    content = serializer(generator(model))
+                output_path = os.path.join(app_dir, filename)
+                write_output_atomically(output_path, content)
+                result['outputs'].append(output_path)
+            result['ok'] = True
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _compile_job(job, **kwargs):
+    filepath, app_name = job
+    return compile_requirements_file(filepath, app_name=app_name, **kwargs)
+
+
+def run_batch(source, output_dir=DEFAULT_BATCH_OUTPUT_DIR, workers=None, cache_dir=None,
+              cache_max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """
+    Compiles every requirements file matched by 'source' in a process pool.
+
+    Args:
+        source (str): A directory or glob pattern (see discover_requirements_files).
+        output_dir (str): Root directory for the per-application outputs.
+        workers (int): Number of worker processes; defaults to the CPU count.
+        cache_dir (str): Optional template cache directory (see template_cache).
+        cache_max_bytes (int): Size budget of the template cache.
+
+    Returns:
+        list: One result dict per file, in the order the files were discovered.
+    """
+    from concurrent.futures import ProcessPoolExecutor  # Pulls in multiprocessing; only needed here
+
+    files = discover_requirements_files(source, exclude_dirs=(output_dir, cache_dir))
+    if not files:
+        print(f"No requirements files found for '{source}'.")
+        return []
+
+    names = application_names(files, source_root(source))
+    # Files that would share an output directory (e.g. app.yaml and app.json) fail instead of overwriting each other
+    owners = {}
+    for path, name in zip(files, names):
+        owners.setdefault(os.path.normcase(name), []).append(path)
+    colliding = {path: paths for paths in owners.values() if len(paths) > 1 for path in paths}
+
+    workers = workers or os.cpu_count() or 1
+    # Hand the files out in chunks so thousands of small jobs don't pay one IPC round trip each.
+    chunksize = max(1, len(files) // (workers * 4))
+    start = time.perf_counter()
+    compile_job = partial(_compile_job, output_dir=output_dir, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+    jobs = [(path, name) for path, name in zip(files, names) if path not in colliding]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        compiled = {result['file']: result for result in executor.map(compile_job, jobs, chunksize=chunksize)}
+    elapsed = time.perf_counter() - start
+    results = []
+    for path, name in zip(files, names):
+        if path in colliding:
+            others = ', '.join(other for other in colliding[path] if other != path)
+            results.append({'file': path, 'ok': False, 'outputs': [], 'seconds': 0.0, 'cache_hits': 0, 'cache_misses': 0,
+                            'error': f"output directory '{os.path.join(output_dir, name)}' is also used by {others}"})
+        else:
+            results.append(compiled[path])
+
+    print_batch_summary(results, elapsed, workers)
+    return results
+
+
+def generate_provider_output(requirements, provider, output_path, compact=False, json_backend='json'):
+    """
+    Generates, serializes and atomically writes the template of one provider.
+
+    The template is streamed to disk resource by resource (see
+    template_stream), so memory stays flat however many rules the network has.
+    Runs inside the worker processes of generate_providers, so it never raises.
+
+    Returns:
+        dict: The provider, output path, success flag, error message and seconds spent.
+    """
+    start = time.perf_counter()
+    result = {'provider': provider, 'output': output_path, 'ok': False, 'error': None, 'seconds': 0.0}
+    try:
+        output_format = 'yaml' if output_path.endswith(('.yaml', '.yml')) else 'json'
+        write_template_stream(get_stream_generator(provider)(requirements), output_path, output_format,
+                              compact=compact, json_backend=json_backend)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def generate_providers(requirements, providers, app_dir, workers=None, compact=False, json_backend='json'):
+    """
+    Generates the templates of several providers from one parsed requirements dict.
+
+    Each provider's generation and serialization runs in its own worker
+    process, so the whole run takes about as long as the slowest provider.
+    Small networks (under PARALLEL_PROVIDERS_MIN_RULES firewall rules) are
+    generated in-process, where starting the workers would cost more than it
+    saves. Every template is written atomically as aws.json, azure.json or
+    gcp.yaml in app_dir.
+
+    Args:
+        requirements (dict): The parsed and validated requirements.
+        providers (tuple): The providers to generate for (see providers.parse_provider_list).
+        app_dir (str): Directory the templates are written to.
+        workers (int): Maximum number of worker processes (default: one per provider).
+        compact (bool): Write compact JSON / flow-style YAML entries.
+        json_backend (str): 'json', 'orjson' or 'auto' (see template_stream.get_json_dumps).
+
+    Returns:
+        list: One result dict per provider (see generate_provider_output), in 'providers' order.
+    """
+    os.makedirs(app_dir, exist_ok=True)
+    filenames = {provider: filename for filename, provider, _serializer in PROVIDER_OUTPUTS}
+    output_paths = [os.path.join(app_dir, filenames[provider]) for provider in providers]
+    network = requirements.get('network') or {}
+    num_rules = len((network.get('firewall') or {}).get('rules') or []) if isinstance(network, dict) else 0
+    workers = min(workers or len(providers), len(providers))
+    if workers <= 1 or num_rules < PARALLEL_PROVIDERS_MIN_RULES:
+        # One shared model for all providers instead of one per worker
+        model = build_network_model(requirements)
+        return [generate_provider_output(model, provider, path, compact, json_backend) for provider, path in zip(providers, output_paths)]
+
+    from concurrent.futures import ProcessPoolExecutor  # Pulls in multiprocessing; only needed here
+
+    generate_output = partial(generate_provider_output, compact=compact, json_backend=json_backend)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(generate_output, [requirements] * len(providers), providers, output_paths))
+
+
+def print_batch_summary(results, elapsed, workers, slowest=5):
+    """Prints throughput, failures and the slowest files of a batch run."""
+    failures = [r for r in results if not r['ok']]
+    throughput = len(results) / elapsed if elapsed > 0 else 0.0
+    print("\nBatch Summary:")
+    print(f"  Files processed: {len(results)} ({len(results) - len(failures)} succeeded, {len(failures)} failed)")
+    print(f"  Workers: {workers}")
+    print(f"  Wall time: {elapsed:.2f}s ({throughput:.1f} files/s)")
+    cache_hits = sum(r.get('cache_hits', 0) for r in results)
+    cache_misses = sum(r.get('cache_misses', 0) for r in results)
+    if cache_hits or cache_misses:
+        print(f"  Template cache: {cache_hits} hits, {cache_misses} misses")
+    if results:
+        timings = sorted(r['seconds'] for r in results)
+        print(f"  Per-file time: min {timings[0] * 1000:.1f}ms, "
+              f"median {timings[len(timings) // 2] * 1000:.1f}ms, max {timings[-1] * 1000:.1f}ms")
+        print("  Slowest files:")
+        for r in sorted(results, key=lambda r: r['seconds'], reverse=True)[:slowest]:
+            print(f"    - {r['file']}: {r['seconds'] * 1000:.1f}ms")
+    if failures:
+        print("  Failures:")
+        for r in failures:
+            print(f"    - {r['file']}: {r['error']}")
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    run_batch('.', output_dir=DEFAULT_BATCH_OUTPUT_DIR, workers=2)
@@ -0,0 +1,130 @@
+import bisect
+import ipaddress
+
+
+def _parse_interval(cidr):
+    """
+    Parses a CIDR string into (version, first address, last address).
+
+    Plain dotted-quad IPv4 CIDRs, by far the most common case, are parsed
+    directly; everything else goes through ipaddress.ip_network.
+
+    Returns:
+        tuple: ((version, start, end), None), or (None, error message).
+    """
+    text = str(cidr)
+    address, _, prefix = text.partition('/')
+    octets = address.split('.')
+    if len(octets) == 4 and prefix.isdigit() and all(o.isdigit() and len(o) <= 3 and (len(o) == 1 or o[0] != '0') for o in octets):
+        value = 0
+        for octet in octets:
+            value = (value << 8) | int(octet)
+        prefix_length = int(prefix)
+        host_mask = (1 << (32 - prefix_length)) - 1 if prefix_length <= 32 else 0
+        if all(int(o) <= 255 for o in octets) and prefix_length <= 32 and not value & host_mask:
+            return (4, value, value | host_mask), None
+    try:
+        network = ipaddress.ip_network(text)
+    except ValueError as e:
+        return None, str(e)
+    return (network.version, int(network.network_address), int(network.broadcast_address)), None
+
+
+def _merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def validate_network_cidrs(network):
+    """
+    Checks the subnet CIDRs of a network section for errors.
+
+    Every subnet CIDR must be valid, must lie inside ip_address_space (a CIDR or
+    a list of CIDRs) and must not overlap any other subnet. The CIDRs are turned
+    into integer (first address, last address) intervals and sorted once, so
+    containment is a binary search per subnet and overlaps are found in a single
+    sweep: O(n log n) overall. Every violation is collected instead of stopping
+    at the first one; subnet entries that are not mappings are reported as such.
+
+    Args:
+        network (dict): The 'network' section of the parsed requirements.
+
+    Returns:
+        list: Human-readable violation messages; empty if the CIDRs are valid.
+    """
+    violations = []
+
+    address_spaces = network.get('ip_address_space')
+    if address_spaces is None:
+        address_spaces = []
+    elif not isinstance(address_spaces, list):
+        address_spaces = [address_spaces]
+    space_intervals = {4: [], 6: []}
+    for cidr in address_spaces:
+        interval, error = _parse_interval(cidr)
+        if interval is None:
+            violations.append(f"ip_address_space '{cidr}' is not a valid CIDR: {error}")
+            continue
+        version, start, end = interval
+        space_intervals[version].append((start, end))
+    space_intervals = {version: _merge_intervals(intervals) for version, intervals in space_intervals.items()}
+    space_starts = {version: [start for start, _end in intervals] for version, intervals in space_intervals.items()}
+    check_containment = bool(address_spaces) and not any(v.startswith('ip_address_space') for v in violations)
+
+    subnets = network.get('subnets')
+    subnet_intervals = []
+    for index, subnet in enumerate(subnets if isinstance(subnets, list) else []):
+        if not isinstance(subnet, dict):
+            violations.append(f"Subnet #{index} is not a mapping: {subnet!r}")
+            continue
+        name = subnet.get('name', f'subnet #{index}')
+        cidr = subnet.get('cidr')
+        if cidr is None:
+            violations.append(f"Subnet '{name}' has no CIDR.")
+            continue
+        interval, error = _parse_interval(cidr)
+        if interval is None:
+            violations.append(f"Subnet '{name}' CIDR '{cidr}' is not valid: {error}")
+            continue
+        version, start, end = interval
+        subnet_intervals.append((version, start, -end, index, name, cidr))
+
+        if check_containment:
+            intervals = space_intervals[version]
+            position = bisect.bisect_right(space_starts[version], start) - 1
+            if position < 0 or intervals[position][1] < end:
+                violations.append(f"Subnet '{name}' CIDR '{cidr}' is outside ip_address_space {address_spaces}.")
+
+    # Sweep the subnets in address order, remembering the one that reaches furthest.
+    # The index breaks ties between identical CIDRs, so names (of any type) are never compared.
+    subnet_intervals.sort()
+    furthest = None
+    for version, start, negative_end, _index, name, cidr in subnet_intervals:
+        end = -negative_end
+        if furthest is not None and furthest[0] == version and start <= furthest[1]:
+            violations.append(f"Subnet '{name}' CIDR '{cidr}' overlaps subnet '{furthest[2]}' ({furthest[3]}).")
+        if furthest is None or furthest[0] != version or end > furthest[1]:
+            furthest = (version, end, name, cidr)
+
+    return violations
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    example_network = {
+        'ip_address_space': '10.0.0.0/16',
+        'subnets': [
+            {'name': 'frontend-subnet', 'cidr': '10.0.1.0/24'},
+            {'name': 'backend-subnet', 'cidr': '10.0.1.128/25'},
+            {'name': 'outside-subnet', 'cidr': '10.1.0.0/24'},
+            {'name': 'broken-subnet', 'cidr': '10.0.300.0/24'},
+        ]
+    }
+    for violation in validate_network_cidrs(example_network):
+        print(violation)
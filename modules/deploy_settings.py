@@ -0,0 +1,7 @@
+# Deployment defaults shared by cloud_deployer and the CLI. They live apart from
+# cloud_deployer so the CLI can build its argument parser without importing boto3.
+DEFAULT_STACK_NAME = "NetflowArchitectStack"
+DEFAULT_FANOUT_WORKERS = 8
+# CloudFormation throttles control plane calls per account and region; stay
+# well below that when many targets are polled concurrently.
+DEFAULT_API_CALLS_PER_SECOND = 5.0
@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import os
+import platform
+import re
+import shutil
+import subprocess
+import tempfile
+
+from modules.profiling import profile_stage
+from modules.output_settings import DEFAULT_CACHE_DIR
+
+DIAGRAM_FORMATS = ('svg', 'png', 'pdf')
+DEFAULT_DIAGRAM_FORMATS = ('png',)
+GRAPHVIZ_COMMAND = 'dot'
+# Renderings are kept in '<cache dir>/diagrams/<hash>.<format>'; the oldest are
+# deleted once there are more than this many.
+DIAGRAM_CACHE_SUBDIR = 'diagrams'
+DIAGRAM_CACHE_MAX_ENTRIES = 64
+
+_IMAGE_ATTRIBUTE = re.compile(r'image="((?:[^"\\]|\\.)*)"')
+
+
+def parse_format_list(value):
+    """
+    Parses a comma-separated list of diagram formats (svg, png, pdf).
+
+    Returns:
+        tuple: The formats in the given order, without duplicates.
+
+    Raises:
+        ValueError: If a format is unknown or the list is empty.
+    """
+    formats = tuple(dict.fromkeys(part.strip().lower() for part in value.split(',') if part.strip()))
+    unknown = [fmt for fmt in formats if fmt not in DIAGRAM_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown diagram format '{', '.join(unknown)}'. Expected a comma-separated list of: {', '.join(DIAGRAM_FORMATS)}.")
+    return formats
+
+
+def diagram_paths(output_path, formats):
+    """
+    Returns {format: path} for the renderings of one diagram.
+
+    A known format extension on output_path is replaced, so 'network_flow.png'
+    with formats ('svg', 'png') gives network_flow.svg and network_flow.png.
+    """
+    base, ext = os.path.splitext(output_path)
+    if ext[1:].lower() not in DIAGRAM_FORMATS:
+        base = output_path
+    return {fmt: f"{base}.{fmt}" for fmt in formats}
+
+
+def diagram_hash(dot_source):
+    """
+    Returns the cache key of a DOT source.
+
+    The icon files the source references with image="..." are hashed too, so
+    replacing an icon invalidates the cached renderings.
+    """
+    digest = hashlib.sha256(dot_source.encode())
+    for image_path in sorted(set(_IMAGE_ATTRIBUTE.findall(dot_source))):
+        digest.update(f"\0{image_path}\0".encode())
+        try:
+            with open(image_path.replace('\\"', '"'), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b'missing')
+    return digest.hexdigest()
+
+
+def _temporary_path(path):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.' + os.path.basename(path), suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+
+async def _render_format(dot_source, output_format, path):
+    tmp_path = _temporary_path(path)
+    try:
+        process = await asyncio.create_subprocess_exec(GRAPHVIZ_COMMAND, f'-T{output_format}', '-o', tmp_path,
+                                                       stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL,
+                                                       stderr=asyncio.subprocess.PIPE)
+        _, stderr = await process.communicate(dot_source.encode())
+        if process.returncode != 0:
+            raise RuntimeError(f"Graphviz failed to render {output_format}: {stderr.decode(errors='replace').strip()}")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+async def _render_formats(dot_source, paths):
+    # Let every render finish (and clean up) before reporting the first failure
+    results = await asyncio.gather(*(_render_format(dot_source, fmt, path) for fmt, path in paths.items()),
+                                   return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def render_formats(dot_source, paths):
+    """
+    Renders DOT source to several formats at once, one Graphviz process per format.
+
+    Each file is written to a temporary file and renamed into place. Must not
+    be called from a running event loop.
+
+    Args:
+        dot_source (str): The DOT source.
+        paths (dict): {format: output path}.
+
+    Raises:
+        OSError: If Graphviz (the 'dot' command) is not installed.
+        RuntimeError: If Graphviz rejects the source.
+    """
+    asyncio.run(_render_formats(dot_source, paths))
+
+
+def _copy_atomically(source, destination):
+    tmp_path = _temporary_path(destination)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _same_file(path, other):
+    try:
+        if os.path.getsize(path) != os.path.getsize(other):
+            return False
+        with open(path, 'rb') as f, open(other, 'rb') as g:
+            return f.read() == g.read()
+    except OSError:
+        return False
+
+
+def _prune_cache(diagram_dir, max_entries):
+    entries = []
+    for name in os.listdir(diagram_dir):
+        if name.startswith('.'):
+            continue
+        path = os.path.join(diagram_dir, name)
+        try:
+            entries.append((os.stat(path).st_mtime, path))
+        except OSError:
+            continue
+    for _mtime, path in sorted(entries)[:max(0, len(entries) - max_entries)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def render_diagram(dot_source, output_path, formats=DEFAULT_DIAGRAM_FORMATS, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Renders DOT source to the requested formats, reusing cached renderings.
+
+    Renderings are cached by diagram_hash(dot_source). Only the formats missing
+    from the cache are rendered, concurrently, and the output files are then
+    copied from the cache (or left alone if they are already identical). An
+    unchanged diagram therefore costs no Graphviz run at all.
+
+    Args:
+        dot_source (str): The DOT source.
+        output_path (str): Path of the diagram; its extension is replaced by each format's.
+        formats (tuple): Formats to write (see DIAGRAM_FORMATS).
+        cache_dir (str): Cache root directory, or None to always render.
+
+    Returns:
+        tuple: ({format: output path}, list of the formats that were rendered).
+    """
+    paths = diagram_paths(output_path, formats)
+    for path in paths.values():
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if cache_dir is None:
+        with profile_stage('graphviz_render'):
+            render_formats(dot_source, paths)
+        return paths, list(paths)
+
+    diagram_dir = os.path.join(cache_dir, DIAGRAM_CACHE_SUBDIR)
+    key = diagram_hash(dot_source)
+    cached = {fmt: os.path.join(diagram_dir, f"{key}.{fmt}") for fmt in paths}
+    missing = {fmt: path for fmt, path in cached.items() if not os.path.exists(path)}
+    if missing:
+        os.makedirs(diagram_dir, exist_ok=True)
+        with profile_stage('graphviz_render'):
+            render_formats(dot_source, missing)
+        _prune_cache(diagram_dir, max(DIAGRAM_CACHE_MAX_ENTRIES, len(cached)))
+    for fmt, path in paths.items():
+        try:
+            os.utime(cached[fmt])  # Most recently used entries survive pruning
+        except OSError:
+            pass
+        if not _same_file(cached[fmt], path):
+            _copy_atomically(cached[fmt], path)
+    return paths, list(missing)
+
+
+def open_in_viewer(path):
+    """Opens a file in the system viewer without waiting for the viewer to exit."""
+    if platform.system() == "Windows":
+        os.startfile(path)
+        return
+    command = "open" if platform.system() == "Darwin" else "xdg-open"  # macOS, else Linux and other Unix-like
+    subprocess.Popen([command, path], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    example_dot = 'digraph G {\n  internet -> frontend [label="TCP 443"];\n}\n'
+    print(diagram_paths('network_flow.png', parse_format_list('svg,png,pdf')))
+    print(render_diagram(example_dot, 'example_flow.svg', formats=('svg', 'png')))
@@ -1,42 +1,174 @@
-from graphviz import Digraph
-import subprocess
-import platform
+import itertools
 import os  # Import the os module for path manipulation
+import re
 
-def generate_textual_flow_diagram(yaml_data):
-    """Generates a textual representation of the network flow."""
-    flow = "Network Flow:\n"
-    network = yaml_data.get('network', {})
-    subnets = network.get('subnets', [])
-    firewall_rules = network.get('firewall', {}).get('rules', [])
-    load_balancer = network.get('load_balancer', {})
-
-    if network.get('name'):
-        flow += f"  Network: {network['name']}\n"
-    if subnets:
-        flow += "  Subnets:\n"
-        for subnet in subnets:
-            flow += f"    - {subnet.get('name', 'Unnamed')} ({subnet.get('cidr', 'No CIDR')})\n"
-    if load_balancer.get('enabled'):
-        flow += f"  Load Balancer ({load_balancer.get('type', 'Generic')}):\n"
-        for listener in load_balancer.get('listeners', []):
-            flow += f"    - Listener on Port {listener.get('port', '?')} ({listener.get('protocol', 'Unknown')})\n"
-    if firewall_rules:
-        flow += "  Firewall Rules:\n"
+from modules.network_model import ensure_network_model
+from modules.profiling import profile_stage
+from modules.output_settings import DEFAULT_CACHE_DIR
+
+def _or_default(value, default):
+    """Returns value, or default if it is missing (None) from the requirements."""
+    return default if value is None else value
+
+def iter_textual_flow_lines(yaml_data, limit=None, offset=0, group_by_pair=False):
+    """
+    Lazily yields the lines of the textual network flow.
+
+    Args:
+        yaml_data (dict or NetworkModel): The parsed network requirements.
+        limit (int): Optional maximum number of firewall rules (or rule groups
+            with group_by_pair) to show.
+        offset (int): Number of firewall rules (or rule groups) to skip, for paging.
+        group_by_pair (bool): Group the firewall rules by source/destination pair.
+
+    Yields:
+        str: One line of output, including the trailing newline.
+    """
+    model = ensure_network_model(yaml_data)
+    firewall_rules = model.firewall_rules
+    load_balancer = model.load_balancer
+
+    yield "Network Flow:\n"
+    if model.name:
+        yield f"  Network: {model.name}\n"
+    if model.subnets:
+        yield "  Subnets:\n"
+        for subnet in model.subnets:
+            yield f"    - {_or_default(subnet.name, 'Unnamed')} ({_or_default(subnet.cidr, 'No CIDR')})\n"
+    if load_balancer.enabled:
+        yield f"  Load Balancer ({_or_default(load_balancer.type, 'Generic')}):\n"
+        for listener in load_balancer.listeners:
+            yield f"    - Listener on Port {_or_default(listener.port, '?')} ({_or_default(listener.protocol, 'Unknown')})\n"
+    if not firewall_rules:
+        return
+
+    end = None if limit is None else offset + limit
+    if group_by_pair:
+        groups = {}
         for rule in firewall_rules:
-            flow += f"    - Allow {rule.get('protocol', 'Any')} from {rule.get('source', 'Any')} to {rule.get('destination', 'Any')} on ports {rule.get('ports', 'Any')}\n"
-    return flow
+            groups.setdefault((_or_default(rule.source, 'Any'), _or_default(rule.destination, 'Any')), []).append(rule)
+        yield "  Firewall Rules (grouped by source/destination):\n"
+        for (source, destination), rules in itertools.islice(groups.items(), offset, end):
+            yield f"    - {source} -> {destination} ({len(rules)} rules):\n"
+            for rule in rules:
+                yield f"        Allow {_or_default(rule.protocol, 'Any')} on ports {_or_default(rule.ports, 'Any')}\n"
+        total, unit = len(groups), "rule groups"
+    else:
+        yield "  Firewall Rules:\n"
+        for rule in itertools.islice(firewall_rules, offset, end):
+            yield f"    - Allow {_or_default(rule.protocol, 'Any')} from {_or_default(rule.source, 'Any')} to {_or_default(rule.destination, 'Any')} on ports {_or_default(rule.ports, 'Any')}\n"
+        total, unit = len(firewall_rules), "rules"
+    if end is not None and end < total:
+        yield f"    ... {total - end} more {unit} (next offset: {end})\n"
+
+def write_textual_flow_diagram(yaml_data, out, limit=None, offset=0, group_by_pair=False):
+    """
+    Writes the textual network flow line by line to a file-like object.
+
+    Args:
+        yaml_data (dict or NetworkModel): The parsed network requirements.
+        out: A writable text file-like object, e.g. sys.stdout.
+        limit, offset, group_by_pair: See iter_textual_flow_lines.
+    """
+    for line in iter_textual_flow_lines(yaml_data, limit=limit, offset=offset, group_by_pair=group_by_pair):
+        out.write(line)
+
+def generate_textual_flow_diagram(yaml_data, limit=None, offset=0, group_by_pair=False):
+    """Generates a textual representation of the network flow."""
+    return ''.join(iter_textual_flow_lines(yaml_data, limit=limit, offset=offset, group_by_pair=group_by_pair))
+
+class FlowGraph:
+    """
+    An indexed node/edge model of the network flow.
+
+    Nodes are kept in a dict keyed by node ID (insertion ordered), so membership
+    checks are O(1) and exact, and edges are kept in a list in the order they
+    were added. Nodes can optionally be placed in clusters, which are emitted
+    as DOT 'cluster' subgraphs.
+    """
+
+    def __init__(self, comment='Network Flow'):
+        self.comment = comment
+        self.nodes = {}
+        self.edges = []
+        self.clusters = {}
+        self.node_clusters = {}
+
+    def add_node(self, node_id, **attrs):
+        """Adds a node unless a node with the same ID already exists."""
+        if node_id not in self.nodes:
+            self.nodes[node_id] = attrs
+
+    def add_edge(self, source_id, destination_id, **attrs):
+        self.edges.append((source_id, destination_id, attrs))
+
+    def add_cluster(self, cluster_id, **attrs):
+        """Adds a cluster unless a cluster with the same ID already exists."""
+        if cluster_id not in self.clusters:
+            self.clusters[cluster_id] = attrs
 
-def generate_graphical_flow_diagram(yaml_data, output_path="network_flow.png"):
-    """Generates a graphical representation of the network flow using Graphviz with icons."""
-    dot = Digraph(comment='Network Flow', format='png')
-    network = yaml_data.get('network', {})
-    subnets = network.get('subnets', [])
-    firewall_rules = network.get('firewall', {}).get('rules', [])
-    load_balancer = network.get('load_balancer', {})
+    def add_cluster_node(self, cluster_id, node_id, **attrs):
+        """Adds a node inside an existing cluster."""
+        if node_id not in self.nodes:
+            self.nodes[node_id] = attrs
+            self.node_clusters[node_id] = cluster_id
+
+def _dot_quote(value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'"{value}"'
+
+def _dot_attrs(attrs):
+    if not attrs:
+        return ''
+    return ' [' + ' '.join(f'{key}={_dot_quote(value)}' for key, value in attrs.items()) + ']'
+
+def to_dot_source(graph):
+    """
+    Emits the DOT source of a FlowGraph in a single pass over its nodes and edges.
+
+    Args:
+        graph (FlowGraph): The graph to emit.
+
+    Returns:
+        str: The DOT source.
+    """
+    lines = [f'// {graph.comment}', 'digraph {']
+    cluster_lines = {cluster_id: [] for cluster_id in graph.clusters}
+    for node_id, attrs in graph.nodes.items():
+        cluster_id = graph.node_clusters.get(node_id)
+        if cluster_id is None:
+            lines.append(f'\t{_dot_quote(node_id)}{_dot_attrs(attrs)}')
+        else:
+            cluster_lines[cluster_id].append(f'\t\t{_dot_quote(node_id)}{_dot_attrs(attrs)}')
+    for cluster_id, attrs in graph.clusters.items():
+        lines.append(f'\tsubgraph {_dot_quote(cluster_id)} {{')
+        lines.extend(f'\t\t{key}={_dot_quote(value)}' for key, value in attrs.items())
+        lines.extend(cluster_lines[cluster_id])
+        lines.append('\t}')
+    lines.extend(f'\t{_dot_quote(source)} -> {_dot_quote(destination)}{_dot_attrs(attrs)}'
+                 for source, destination, attrs in graph.edges)
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+def build_flow_graph(yaml_data, icons_dir='icons'):
+    """
+    Builds the indexed node/edge model of the network flow from the requirements.
+
+    Subnets are indexed by node ID once up front, so resolving the source and
+    destination of every firewall rule is a dict lookup.
+
+    Args:
+        yaml_data (dict or NetworkModel): The parsed network requirements.
+        icons_dir (str): Directory containing the node icons.
+
+    Returns:
+        FlowGraph: The graph of the network flow.
+    """
+    model = ensure_network_model(yaml_data)
+    graph = FlowGraph()
+    load_balancer = model.load_balancer
 
     # Define icon paths
-    icons_dir = 'icons'
     network_icon = os.path.join(icons_dir, 'network.png')
     subnet_icon = os.path.join(icons_dir, 'subnet.png')
     load_balancer_icon = os.path.join(icons_dir, 'load_balancer.png')
@@ -44,75 +176,361 @@ def generate_graphical_flow_diagram(yaml_data, output_path="network_flow.png"):
     internet_icon = os.path.join(icons_dir, 'internet.png')
 
     # Add Network Node with Icon
-    network_name = network.get('name', 'Network')
-    dot.node('network', shape='none', image=network_icon, labelloc='b', label=network_name, fixedsize='true', width='1.5', height='1.5')
+    network_name = _or_default(model.name, 'Network')
+    graph.add_node('network', shape='none', image=network_icon, labelloc='b', label=network_name, fixedsize='true', width='1.5', height='1.5')
 
     # Add Subnet Nodes with Icons
-    for subnet in subnets:
-        subnet_name = subnet.get('name', 'Subnet')
-        subnet_id = subnet_name.replace('-', '_')
-        dot.node(subnet_id, shape='none', image=subnet_icon, labelloc='b', label=subnet_name, fixedsize='true', width='1.0', height='1.0')
-        dot.edge('network', subnet_id, style='dashed')
+    subnets_by_id = {}
+    frontend_subnet_ids = []
+    for subnet in model.subnets:
+        subnet_name = _or_default(subnet.name, 'Subnet')
+        subnet_id = subnet.node_id
+        subnets_by_id.setdefault(subnet_id, subnet_name)
+        if subnet.is_frontend:
+            frontend_subnet_ids.append(subnet_id)
+        graph.add_node(subnet_id, shape='none', image=subnet_icon, labelloc='b', label=subnet_name, fixedsize='true', width='1.0', height='1.0')
+        graph.add_edge('network', subnet_id, style='dashed')
 
     # Add Load Balancer Node with Icon and Listeners
-    if load_balancer.get('enabled'):
-        lb_name = load_balancer.get('type', 'LB')
+    if load_balancer.enabled:
+        lb_name = _or_default(load_balancer.type, 'LB')
         lb_id = 'load_balancer'
-        dot.node(lb_id, shape='none', image=load_balancer_icon, labelloc='b', label=f"{lb_name} LB", fixedsize='true', width='1.5', height='1.5')
-        dot.edge('network', lb_id)
-        for i, listener in enumerate(load_balancer.get('listeners', [])):
-            port = listener.get('port', '?')
-            protocol = listener.get('protocol', 'Unknown')
+        graph.add_node(lb_id, shape='none', image=load_balancer_icon, labelloc='b', label=f"{lb_name} LB", fixedsize='true', width='1.5', height='1.5')
+        graph.add_edge('network', lb_id)
+        for i, listener in enumerate(load_balancer.listeners):
+            port = _or_default(listener.port, '?')
+            protocol = _or_default(listener.protocol, 'Unknown')
             listener_label = f"Listener\n{protocol}:{port}"
             listener_id = f'listener_{i}'
-            dot.node(listener_id, listener_label, shape='box', style='rounded') # Using a box with text for listeners
-            dot.edge(lb_id, listener_id)
-            for subnet in subnets:
-                if subnet.get('purpose', '').lower() == 'frontend':
-                    dot.edge(listener_id, subnet.get('name', '').replace('-', '_')) # Basic Frontend to LB connection
+            graph.add_node(listener_id, label=listener_label, shape='box', style='rounded') # Using a box with text for listeners
+            graph.add_edge(lb_id, listener_id)
+            for subnet_id in frontend_subnet_ids:
+                graph.add_edge(listener_id, subnet_id) # Basic Frontend to LB connection
 
     # Add Firewall Rules with Icons (using edges with labels for flow)
-    if firewall_rules:
-        for rule in firewall_rules:
-            source = rule.get('source', 'Internet').replace('-', '_')
-            destination = rule.get('destination', 'Target').replace('-', '_')
-            ports = rule.get('ports', 'Any')
-            protocol = rule.get('protocol', 'Any')
-            label = f"Allow {protocol}:{ports}"
-
-            # Source Node with Icon
-            source_node = 'internet' if 'internet' in source.lower() else source
-            if source_node not in dot.body:
-                source_label = source.replace('_', ' ').title()
-                source_icon_path = internet_icon if 'internet' in source.lower() else firewall_icon
-                dot.node(source_node, shape='none', image=source_icon_path, labelloc='b', label=source_label, fixedsize='true', width='1.0', height='1.0')
-
-            # Destination Node with Icon
-            dest_node = destination
-            if dest_node not in dot.body:
-                dest_subnet = next((s for s in subnets if s.get('name', '').replace('-', '_') == dest_node), None)
-                dest_node_label = dest_subnet['name'] if dest_subnet else dest_node.replace('_', ' ').title()
-                dest_node_icon_path = subnet_icon if dest_subnet else firewall_icon # Assuming non-subnet destinations might be firewalls
-                dot.node(dest_node, shape='none', image=dest_node_icon_path, labelloc='b', label=dest_node_label, fixedsize='true', width='1.0', height='1.0')
-
-            dot.edge(source_node, dest_node, label=label, arrowhead='vee')
+    for rule in model.firewall_rules:
+        source = _or_default(rule.source, 'Internet').replace('-', '_')
+        destination = _or_default(rule.destination, 'Target').replace('-', '_')
+        ports = _or_default(rule.ports, 'Any')
+        protocol = _or_default(rule.protocol, 'Any')
+        label = f"Allow {protocol}:{ports}"
+
+        # Source Node with Icon
+        is_internet = 'internet' in source.lower()
+        source_node = 'internet' if is_internet else source
+        if source_node not in graph.nodes:
+            source_label = source.replace('_', ' ').title()
+            source_icon_path = internet_icon if is_internet else firewall_icon
+            graph.add_node(source_node, shape='none', image=source_icon_path, labelloc='b', label=source_label, fixedsize='true', width='1.0', height='1.0')
+
+        # Destination Node with Icon
+        dest_node = destination
+        if dest_node not in graph.nodes:
+            dest_subnet = subnets_by_id.get(dest_node)
+            dest_node_label = dest_subnet if dest_subnet else dest_node.replace('_', ' ').title()
+            dest_node_icon_path = subnet_icon if dest_subnet else firewall_icon # Assuming non-subnet destinations might be firewalls
+            graph.add_node(dest_node, shape='none', image=dest_node_icon_path, labelloc='b', label=dest_node_label, fixedsize='true', width='1.0', height='1.0')
+
+        graph.add_edge(source_node, dest_node, label=label, arrowhead='vee')
+
+    return graph
+
+def _format_ports(ports):
+    """Formats a set of integer ports as a compact list of ports and ranges, e.g. '80,443,8000-8080'."""
+    ranges = []
+    for port in sorted(ports):
+        if ranges and port == ranges[-1][1] + 1:
+            ranges[-1][1] = port
+        else:
+            ranges.append([port, port])
+    return ','.join(str(start) if start == end else f'{start}-{end}' for start, end in ranges)
+
+def _cluster_id(purpose):
+    # Only word characters, so the ID is a valid DOT name and a safe file name part for drill-down diagrams
+    return 'cluster_' + (re.sub(r'\W', '_', str(purpose).lower()) or 'unassigned')
 
+def build_clustered_flow_graph(yaml_data, max_nodes=None, focus_cluster=None, icons_dir='icons'):
+    """
+    Builds a level-of-detail flow graph that stays readable and fast to lay out on large networks.
+
+    Subnets are grouped into clusters by their 'purpose'. Firewall rules between
+    the same pair of nodes are collapsed into one edge whose label lists the
+    aggregated ports per protocol and the number of rules. When max_nodes is set
+    and the graph would have more nodes, the largest clusters are collapsed into
+    a single summary node each until the graph fits.
+
+    Args:
+        yaml_data (dict or NetworkModel): The parsed network requirements.
+        max_nodes (int): Optional cap on the number of rendered nodes.
+        focus_cluster (str): Optional cluster ID (see cluster_ids). When set,
+            only that cluster is expanded, every other cluster is collapsed and
+            only the rules touching the focused cluster are drawn. This is used
+            for the per-cluster drill-down diagrams. With max_nodes, a focused
+            cluster too large for the cap is drawn as contiguous groups of
+            subnets, one summary node per group.
+        icons_dir (str): Directory containing the node icons.
+
+    Returns:
+        FlowGraph: The clustered graph of the network flow.
+    """
+    model = ensure_network_model(yaml_data)
+    graph = FlowGraph(comment='Network Flow (clustered)')
+    firewall_rules = model.firewall_rules
+    load_balancer = model.load_balancer
+
+    network_icon = os.path.join(icons_dir, 'network.png')
+    subnet_icon = os.path.join(icons_dir, 'subnet.png')
+    load_balancer_icon = os.path.join(icons_dir, 'load_balancer.png')
+    firewall_icon = os.path.join(icons_dir, 'firewall.png')
+    internet_icon = os.path.join(icons_dir, 'internet.png')
+
+    # Group subnets by purpose
+    clusters = {}
+    cluster_labels = {}
+    subnet_clusters = {}
+    for subnet in model.subnets:
+        purpose = str(_or_default(subnet.purpose, '')) or 'Unassigned'
+        cluster_id = _cluster_id(purpose)
+        subnet_id = subnet.node_id
+        if subnet_id in subnet_clusters:
+            continue
+        clusters.setdefault(cluster_id, []).append(subnet)
+        cluster_labels.setdefault(cluster_id, purpose)
+        subnet_clusters[subnet_id] = cluster_id
+
+    def in_focus(source, destination):
+        return focus_cluster is None or focus_cluster in (subnet_clusters.get(source.replace('-', '_')),
+                                                          subnet_clusters.get(destination.replace('-', '_')))
+
+    # Endpoints drawn outside the clusters: 'internet' and any non-subnet source or destination
+    external_nodes = {}
+    for rule in firewall_rules:
+        source, destination = _or_default(rule.source, 'Internet'), _or_default(rule.destination, 'Target')
+        if not in_focus(source, destination):
+            continue
+        for endpoint in (source, destination):
+            endpoint_id = endpoint.replace('-', '_')
+            if 'internet' in endpoint_id.lower():
+                external_nodes.setdefault('internet', endpoint)
+            elif endpoint_id not in subnet_clusters:
+                external_nodes.setdefault(endpoint_id, endpoint)
+    other_externals = len(external_nodes) - ('internet' in external_nodes)
+    listeners = load_balancer.listeners if load_balancer.enabled else []
+
+    # Level of detail: every node counts against max_nodes. The largest
+    # clusters are collapsed first; if that is not enough, the non-internet
+    # endpoints, the listeners and finally the collapsed clusters are each
+    # merged into one summary node.
+    collapsed = {cluster_id for cluster_id in clusters if cluster_id != focus_cluster} if focus_cluster is not None else set()
+    merged = set()
+    subnet_groups = {}
+    merge_external = merge_listeners = False
+
+    def node_count(include_focus=True):
+        count = 1 + len(external_nodes) - (other_externals - 1 if merge_external and other_externals else 0)
+        if load_balancer.enabled:
+            count += 1 + (min(1, len(listeners)) if merge_listeners else len(listeners))
+        count += len(collapsed - merged) + (1 if merged else 0)
+        for cluster_id, cluster_subnets in clusters.items():
+            if cluster_id not in collapsed and (include_focus or cluster_id != focus_cluster):
+                count += len(cluster_subnets)
+        return count
+
+    if max_nodes is not None:
+        if focus_cluster is None:
+            for cluster_id in sorted(clusters, key=lambda c: len(clusters[c]), reverse=True):
+                if node_count() <= max_nodes:
+                    break
+                collapsed.add(cluster_id)
+        # The focused cluster can shrink to one group node, so it counts as one here
+        focus_nodes = 1 if focus_cluster in clusters else 0
+        if node_count(include_focus=False) + focus_nodes > max_nodes and other_externals > 1:
+            merge_external = True
+        if node_count(include_focus=False) + focus_nodes > max_nodes and len(listeners) > 1:
+            merge_listeners = True
+        excess = node_count(include_focus=False) + focus_nodes - max_nodes
+        if excess > 0 and len(collapsed) > 1:
+            # Merging k collapsed clusters into one node saves k - 1 nodes; merge the smallest
+            smallest = sorted(collapsed, key=lambda c: len(clusters[c]))
+            merged = set(smallest[:min(len(smallest), excess + 1)])
+        if focus_cluster in clusters:
+            # Split an oversized focused cluster into contiguous groups, one summary node each
+            focused_subnets = clusters[focus_cluster]
+            budget = max(1, max_nodes - node_count(include_focus=False))
+            if len(focused_subnets) > budget:
+                group_size = -(-len(focused_subnets) // budget)
+                for i, subnet in enumerate(focused_subnets):
+                    subnet_groups[subnet.node_id] = f"{focus_cluster}_group_{i // group_size}"
+
+    def resolve(endpoint):
+        endpoint_id = endpoint.replace('-', '_')
+        if 'internet' in endpoint_id.lower():
+            return 'internet'
+        cluster_id = subnet_clusters.get(endpoint_id)
+        if cluster_id is None:
+            return 'external_summary' if merge_external else endpoint_id
+        if cluster_id in merged:
+            return 'clusters_summary'
+        if cluster_id in collapsed:
+            return cluster_id + '_summary'
+        return subnet_groups.get(endpoint_id, endpoint_id)
+
+    graph.add_node('network', shape='none', image=network_icon, labelloc='b', label=_or_default(model.name, 'Network'), fixedsize='true', width='1.5', height='1.5')
+
+    for cluster_id, cluster_subnets in clusters.items():
+        label = f"{cluster_labels[cluster_id]} ({len(cluster_subnets)} subnets)"
+        if cluster_id in merged:
+            if 'clusters_summary' not in graph.nodes:
+                merged_subnets = sum(len(clusters[c]) for c in merged)
+                graph.add_node('clusters_summary', shape='box3d', label=f"{len(merged)} clusters ({merged_subnets} subnets)")
+                graph.add_edge('network', 'clusters_summary', style='dashed')
+            continue
+        if cluster_id in collapsed:
+            summary_id = cluster_id + '_summary'
+            graph.add_node(summary_id, shape='box3d', label=label)
+            graph.add_edge('network', summary_id, style='dashed')
+            continue
+        graph.add_cluster(cluster_id, label=label, style='rounded')
+        if cluster_id == focus_cluster and subnet_groups:
+            for group_id, group in itertools.groupby(cluster_subnets, key=lambda subnet: subnet_groups[subnet.node_id]):
+                group = list(group)
+                group_label = f"{_or_default(group[0].name, 'Subnet')} .. {_or_default(group[-1].name, 'Subnet')} ({len(group)} subnets)"
+                graph.add_cluster_node(cluster_id, group_id, shape='box3d', label=group_label)
+                graph.add_edge('network', group_id, style='dashed')
+            continue
+        for subnet in cluster_subnets:
+            subnet_name = _or_default(subnet.name, 'Subnet')
+            subnet_id = subnet.node_id
+            graph.add_cluster_node(cluster_id, subnet_id, shape='none', image=subnet_icon, labelloc='b', label=subnet_name, fixedsize='true', width='1.0', height='1.0')
+            graph.add_edge('network', subnet_id, style='dashed')
+
+    if load_balancer.enabled:
+        lb_id = 'load_balancer'
+        graph.add_node(lb_id, shape='none', image=load_balancer_icon, labelloc='b', label=f"{_or_default(load_balancer.type, 'LB')} LB", fixedsize='true', width='1.5', height='1.5')
+        graph.add_edge('network', lb_id)
+        frontend_targets = list(dict.fromkeys(resolve(_or_default(s.name, '')) for s in model.subnets if s.is_frontend))
+        listener_labels = [f"{_or_default(listener.protocol, 'Unknown')}:{_or_default(listener.port, '?')}" for listener in listeners]
+        if merge_listeners:
+            listener_nodes = [('listeners', f"{len(listener_labels)} Listeners\n{', '.join(listener_labels)}")]
+        else:
+            listener_nodes = [(f'listener_{i}', f"Listener\n{listener_label}") for i, listener_label in enumerate(listener_labels)]
+        for listener_id, listener_label in listener_nodes:
+            graph.add_node(listener_id, label=listener_label, shape='box', style='rounded')
+            graph.add_edge(lb_id, listener_id)
+            for target in frontend_targets:
+                graph.add_edge(listener_id, target)
+
+    # Collapse parallel firewall edges between the same pair of nodes
+    aggregated = {}
+    for rule in firewall_rules:
+        source = _or_default(rule.source, 'Internet')
+        destination = _or_default(rule.destination, 'Target')
+        if not in_focus(source, destination):
+            continue
+        source_node = resolve(source)
+        dest_node = resolve(destination)
+        for node_id, endpoint in ((source_node, source), (dest_node, destination)):
+            if node_id not in graph.nodes:
+                is_internet = node_id == 'internet'
+                if is_internet:
+                    node_label = 'Internet'
+                elif node_id == 'external_summary':
+                    node_label = f"{other_externals} External Endpoints"
+                else:
+                    node_label = endpoint.replace('-', ' ').replace('_', ' ').title()
+                graph.add_node(node_id, shape='none', image=internet_icon if is_internet else firewall_icon, labelloc='b',
+                               label=node_label, fixedsize='true', width='1.0', height='1.0')
+
+        edge = aggregated.setdefault((source_node, dest_node), {'protocols': {}, 'rules': 0})
+        edge['rules'] += 1
+        ports = _or_default(rule.ports, 'Any')
+        protocol_ports = edge['protocols'].setdefault(_or_default(rule.protocol, 'Any'), set())
+        if isinstance(ports, list):
+            protocol_ports.update(p for p in ports if isinstance(p, int))
+        else:
+            protocol_ports.add(ports)
+
+    for (source_node, dest_node), edge in aggregated.items():
+        parts = []
+        for protocol, ports in edge['protocols'].items():
+            numeric = {p for p in ports if isinstance(p, int)}
+            other = sorted(str(p) for p in ports if not isinstance(p, int))
+            parts.append(f"{protocol}:{','.join(filter(None, [_format_ports(numeric)] + other)) or 'Any'}")
+        label = "Allow " + ' '.join(parts)
+        if edge['rules'] > 1:
+            label += f" ({edge['rules']} rules)"
+        graph.add_edge(source_node, dest_node, label=label, arrowhead='vee')
+
+    return graph
+
+def cluster_ids(yaml_data):
+    """Returns the IDs of the purpose clusters of the network, in order of first appearance."""
+    model = ensure_network_model(yaml_data)
+    return list(dict.fromkeys(_cluster_id(str(_or_default(s.purpose, '')) or 'Unassigned') for s in model.subnets))
+
+def render_dot_source(dot_source, output_path, open_viewer=False, formats=('png',), cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Renders DOT source with Graphviz and optionally opens it in the system viewer.
+
+    Every format is written next to output_path with its own extension (e.g.
+    network_flow.svg), rendered concurrently, and cached by DOT source hash
+    so unchanged diagrams are not rendered again (see diagram_render.render_diagram).
+
+    Returns:
+        dict: {format: path} of the written files, or None if rendering failed.
+    """
     try:
-        dot.render(output_path, view=False, cleanup=True)
-        print(f"Graphical network flow with icons saved to: {output_path}")
-
-        # Open the generated PNG file
-        if platform.system() == "Windows":
-            subprocess.run(["start", output_path], check=True)
-        elif platform.system() == "Darwin":  # macOS
-            subprocess.run(["open", output_path], check=True)
-        else:  # Linux and other Unix-like
-            subprocess.run(["xdg-open", output_path], check=True)
-        print(f"Opened the graphical network flow with icons: {output_path}")
+        from modules.diagram_render import open_in_viewer, render_diagram  # Only needed for rendering, not for building the DOT source
+        paths, rendered = render_diagram(dot_source, output_path, formats=formats, cache_dir=cache_dir)
+        print(f"Graphical network flow with icons saved to: {', '.join(paths.values())}{'' if rendered else ' (unchanged, from cache)'}")
+
+        if open_viewer:
+            # The viewer is started in the background, so this never blocks (or fails on a headless machine's missing viewer)
+            first_path = next(iter(paths.values()))
+            try:
+                open_in_viewer(first_path)
+                print(f"Opened the graphical network flow with icons: {first_path}")
+            except OSError as e:
+                print(f"Could not open a viewer for {first_path}: {e}")
+        return paths
 
     except Exception as e:
         print(f"Error generating or opening graphical flow with icons: {e}")
         print("Make sure Graphviz is installed and in your system's PATH, and icons are in the 'icons' directory.")
+        return None
+
+def generate_graphical_flow_diagram(yaml_data, output_path="network_flow.png", clustered=False, max_nodes=None, drilldown=False,
+                                    formats=('png',), open_viewer=False, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Generates a graphical representation of the network flow using Graphviz with icons.
+
+    Args:
+        yaml_data (dict or NetworkModel): The parsed network requirements.
+        output_path (str): Path of the rendered diagram; the extension follows each format.
+        clustered (bool): Draw the level-of-detail diagram (see build_clustered_flow_graph).
+        max_nodes (int): Node cap for the clustered diagram.
+        drilldown (bool): With clustered, also render one diagram per purpose
+            cluster next to output_path (e.g. network_flow_frontend.png).
+        formats (tuple): Formats to render: any of 'svg', 'png' and 'pdf'.
+        open_viewer (bool): Open the main diagram in the system viewer.
+        cache_dir (str): Cache directory of the renderings, or None to always render.
+    """
+    model = ensure_network_model(yaml_data)
+    if not clustered:
+        with profile_stage('dot_emission'):
+            dot_source = to_dot_source(build_flow_graph(model))
+        render_dot_source(dot_source, output_path, open_viewer, formats, cache_dir)
+        return
+
+    with profile_stage('dot_emission'):
+        dot_source = to_dot_source(build_clustered_flow_graph(model, max_nodes=max_nodes))
+    render_dot_source(dot_source, output_path, open_viewer, formats, cache_dir)
+    if drilldown:
+        base, ext = os.path.splitext(output_path)
+        for cluster_id in cluster_ids(model):
+            drilldown_path = f"{base}_{cluster_id[len('cluster_'):]}{ext}"
+            drilldown_graph = build_clustered_flow_graph(model, max_nodes=max_nodes, focus_cluster=cluster_id)
+            render_dot_source(to_dot_source(drilldown_graph), drilldown_path, False, formats, cache_dir)
 
 if __name__ == '__main__':
     # Example usage for testing
@@ -1,117 +1,183 @@
 import yaml
 
-def generate_gcp_config(yaml_data):
-    """
-    Generates a basic GCP network configuration based on the network
-    requirements in the provided YAML data.
+from modules.network_model import ensure_network_model
+from modules.rule_compactor import format_port_range
+from modules.template_stream import LazyArray, LazyObject
 
-    Args:
-        yaml_data (dict): The parsed network requirements YAML data.
+PROJECT_ID = "your-gcp-project-id"  # Replace with your actual GCP project ID
 
-    Returns:
-        dict: A dictionary representing the GCP network configuration.
-    """
-    config = {}
-    network_section = yaml_data.get('network', {})
-    project_id = "your-gcp-project-id"  # Replace with your actual GCP project ID
-    region = yaml_data.get('region', 'us-central1') # Default GCP region
+def _network_name(model):
+    return (model.name or 'default-network').replace('-', '')
+
+def _network_path(model):
+    return f"projects/{PROJECT_ID}/global/networks/{_network_name(model)}"
+
+def _region(model):
+    return model.region or 'us-central1' # Default GCP region
 
-    config['network'] = {
-        'name': network_section.get('name', 'default-network').replace('-', ''),
+def build_network_section(model):
+    """Builds the VPC network."""
+    return {'network': {
+        'name': _network_name(model),
         'autoCreateSubnetworks': False # We will define subnets explicitly
-    }
+    }}
+
+def iter_subnetworks(model):
+    """Yields one subnetwork per subnet."""
+    for subnet in model.subnets:
+        yield {
+            'name': subnet.logical_id,  # GCP resource names must be lowercase
+            'ipCidrRange': subnet.cidr,
+            'region': _region(model),
+            'network': _network_path(model)
+        }
 
-    config['subnetworks'] = []
-    subnets = network_section.get('subnets', [])
-    for subnet_config in subnets:
-        config['subnetworks'].append({
-            'name': subnet_config.get('name', 'default-subnet').replace('-', ''),
-            'ipCidrRange': subnet_config.get('cidr'),
-            'region': region,
-            'network': f"projects/{project_id}/global/networks/{config['network']['name']}"
-        })
-
-    config['firewall'] = {'rules': []}
-    firewall_rules = network_section.get('firewall', {}).get('rules', [])
+def build_subnetworks_section(model):
+    """Builds one subnetwork per subnet."""
+    return {'subnetworks': list(iter_subnetworks(model))}
+
+def iter_firewall_rules(model):
+    """Yields one firewall rule per compacted firewall rule."""
+    # Compact first so a rule with a long port list becomes one firewall rule
+    # with port ranges instead of one rule per port.
+    firewall_rules, _ = model.compacted_firewall_rules()
     for rule in firewall_rules:
         direction = 'INGRESS'
-        if rule.get('source') == 'Internet':
+        # Subnet endpoints map to the network tag of that subnet, resolved by name
+        source_subnet = model.subnets_by_name.get(rule['source'])
+        if rule['source'] == 'Internet':
             source_ranges = ['0.0.0.0/0']
             source_tags = None
-        elif rule.get('source') == 'frontend-subnet': # Basic mapping, needs refinement
-            source_ranges = None
-            source_tags = [f"{config['subnetworks'][0]['name']}-tag"] # Assuming first subnet is frontend
-        elif rule.get('source') == 'backend-subnet': # Basic mapping, needs refinement
+        elif source_subnet is not None:
             source_ranges = None
-            source_tags = [f"{config['subnetworks'][1]['name']}-tag"] # Assuming second subnet is backend
+            source_tags = [f"{source_subnet.logical_id}-tag"]
         else:
-            source_ranges = [rule.get('source')]
+            source_ranges = [rule['source']]
             source_tags = None
 
-        destination = rule.get('destination')
-        if destination == 'frontend-subnet':
-            destination_tags = [f"{config['subnetworks'][0]['name']}-tag"]
-            destination_ranges = None
-        elif destination == 'backend-subnet':
-            destination_tags = [f"{config['subnetworks'][1]['name']}-tag"]
+        destination_subnet = model.subnets_by_name.get(rule['destination'])
+        if destination_subnet is not None:
+            destination_tags = [f"{destination_subnet.logical_id}-tag"]
             destination_ranges = None
         else:
             destination_tags = None
             destination_ranges = None # Needs more sophisticated mapping
 
-        ports = rule.get('ports', [])
-        protocol = rule.get('protocol', 'TCP').lower()
-        action = rule.get('action', 'Allow').upper()
-
-        for port in ports:
-            config['firewall']['rules'].append({
-                'name': rule.get('name', 'default-rule').replace('-', '') + f"-{protocol}-{port}",
-                'direction': direction,
-                'priority': 1000, # Default priority
-                'match': {
-                    'config': {
-                        'ipProtocol': protocol,
-                        'ports': [str(port)]
-                    }
-                },
-                'sourceRanges': source_ranges,
-                'sourceTags': source_tags,
-                'destinationRanges': destination_ranges,
-                'destinationTags': destination_tags,
-                'action': action,
-                'network': f"projects/{project_id}/global/networks/{config['network']['name']}"
-            })
-
-    # Basic Load Balancer configuration (HTTP only for simplicity)
-    load_balancer_config = network_section.get('load_balancer', {})
-    if load_balancer_config.get('enabled'):
-        lb_name = f"{config['network']['name']}-lb".replace('-', '')
-        config['compute'] = {
-            'forwardingRules': [{
-                'name': f"{lb_name}-forwarding-rule",
-                'region': region,
-                'target': f"projects/{project_id}/global/backendServices/{lb_name}-backend-service",
-                'ports': [listener.get('port', 80) for listener in load_balancer_config.get('listeners', []) if listener.get('protocol', 'HTTP').upper() == 'HTTP'],
-                'ipProtocol': 'TCP',
-                'loadBalancingScheme': 'EXTERNAL'
-            }],
-            'backendServices': [{
-                'name': f"{lb_name}-backend-service",
-                'protocol': 'HTTP',
-                'healthChecks': [f"projects/{project_id}/global/healthChecks/{lb_name}-health-check"],
-                'backends': [] # Instances will be added later
-            }],
-            'healthChecks': [{
-                'name': f"{lb_name}-health-check",
-                'httpHealthCheck': {
-                    'port': 80, # Default health check port
-                    'requestPath': load_balancer_config.get('health_check_path', '/')
+        port_ranges = [format_port_range(r) for r in rule['port_ranges']]
+        if not port_ranges:
+            continue
+        protocol = rule['protocol'].lower()
+        action = rule['action'].upper()
+
+        yield {
+            'name': rule['name'].replace('-', '') + f"-{protocol}-{port_ranges[0]}",
+            'direction': direction,
+            'priority': 1000, # Default priority
+            'match': {
+                'config': {
+                    'ipProtocol': protocol,
+                    'ports': port_ranges
                 }
-            }]
+            },
+            'sourceRanges': source_ranges,
+            'sourceTags': source_tags,
+            'destinationRanges': destination_ranges,
+            'destinationTags': destination_tags,
+            'action': action,
+            'network': _network_path(model)
         }
 
+def build_firewall_section(model):
+    """Builds one firewall rule per compacted firewall rule."""
+    return {'firewall': {'rules': list(iter_firewall_rules(model))}}
+
+def build_compute_section(model):
+    """Builds the basic load balancer configuration (HTTP only for simplicity; nothing if it is disabled)."""
+    load_balancer = model.load_balancer
+    if not load_balancer.enabled:
+        return {}
+    lb_name = f"{_network_name(model)}-lb".replace('-', '')
+    return {'compute': {
+        'forwardingRules': [{
+            'name': f"{lb_name}-forwarding-rule",
+            'region': _region(model),
+            'target': f"projects/{PROJECT_ID}/global/backendServices/{lb_name}-backend-service",
+            'ports': [listener.port or 80 for listener in load_balancer.listeners if (listener.protocol or 'HTTP').upper() == 'HTTP'],
+            'ipProtocol': 'TCP',
+            'loadBalancingScheme': 'EXTERNAL'
+        }],
+        'backendServices': [{
+            'name': f"{lb_name}-backend-service",
+            'protocol': 'HTTP',
+            'healthChecks': [f"projects/{PROJECT_ID}/global/healthChecks/{lb_name}-health-check"],
+            'backends': [] # Instances will be added later
+        }],
+        'healthChecks': [{
+            'name': f"{lb_name}-health-check",
+            'httpHealthCheck': {
+                'port': 80, # Default health check port
+                'requestPath': load_balancer.health_check_path or '/'
+            }
+        }]
+    }}
+
+# (section name, builder, requirement sections it reads) in config order.
+# The watch mode only rebuilds the sections whose inputs changed.
+TEMPLATE_SECTIONS = (
+    ('network', build_network_section, ('name',)),
+    ('subnetworks', build_subnetworks_section, ('subnets', 'name', 'region')),
+    ('firewall', build_firewall_section, ('firewall', 'subnets', 'name')),
+    ('compute', build_compute_section, ('load_balancer', 'name', 'region')),
+)
+
+def assemble_template(model, fragments):
+    """Assembles the GCP configuration from the builder outputs, in TEMPLATE_SECTIONS order."""
+    config = {}
+    for fragment in fragments:
+        config.update(fragment)
     return config
 
+def iter_gcp_resources(yaml_data):
+    """
+    Yields the (resource kind, resources) pairs of the GCP configuration one at a time.
+
+    The configuration is keyed by resource kind (compute, firewall, network,
+    subnetworks), and the pairs come in key order, as yaml.dump writes them.
+    The subnetworks and firewall rules are LazyArray values built while they
+    are written; use template_stream.materialize() to get plain lists.
+    """
+    model = ensure_network_model(yaml_data)
+    compute = build_compute_section(model)
+    if compute:
+        yield 'compute', compute['compute']
+    yield 'firewall', LazyObject([('rules', LazyArray(iter_firewall_rules(model)))])
+    yield 'network', build_network_section(model)['network']
+    yield 'subnetworks', LazyArray(iter_subnetworks(model))
+
+def stream_gcp_config(yaml_data):
+    """
+    Returns the GCP configuration as a LazyObject.
+
+    Written with template_stream.write_template_stream in YAML, the output is
+    identical to yaml.dump(generate_gcp_config(yaml_data), indent=2).
+    """
+    return LazyObject(iter_gcp_resources(yaml_data))
+
+def generate_gcp_config(yaml_data):
+    """
+    Generates a basic GCP network configuration based on the network
+    requirements in the provided YAML data.
+
+    Args:
+        yaml_data (dict or NetworkModel): The parsed network requirements YAML
+            data, or a prebuilt NetworkModel shared with the other generators.
+
+    Returns:
+        dict: A dictionary representing the GCP network configuration.
+    """
+    model = ensure_network_model(yaml_data)
+    return assemble_template(model, [builder(model) for _section, builder, _inputs in TEMPLATE_SECTIONS])
+
 if __name__ == '__main__':
     # Example usage for testing
     example_requirements = {
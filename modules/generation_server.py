@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import yaml
+
+from modules.flow_diagram_generator import build_clustered_flow_graph, build_flow_graph, generate_textual_flow_diagram, to_dot_source
+from modules.network_model import build_network_model
+from modules.providers import PROVIDERS, get_generator
+from modules.yaml_parser import SafeLoader, structure_errors
+
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8787
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                411: 'Length Required', 413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+                500: 'Internal Server Error'}
+
+class RequestError(Exception):
+    """A client error, answered with its HTTP status and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_requirements_payload(body, content_type=''):
+    """
+    Parses and validates a requirements payload (JSON or YAML).
+
+    Raises:
+        RequestError: If the payload cannot be parsed or is not a valid requirements document.
+    """
+    try:
+        if 'json' in content_type:
+            requirements = json.loads(body)
+        else:
+            requirements = yaml.load(body, Loader=SafeLoader)
+    except (ValueError, yaml.YAMLError) as e:
+        raise RequestError(400, f"Could not parse the requirements: {e}")
+    if not isinstance(requirements, dict):
+        raise RequestError(400, "The requirements must be a mapping.")
+    errors = structure_errors(requirements)
+    if errors:
+        raise RequestError(400, "\n".join(f"Error: {error}" for error in errors))
+    return requirements
+
+
+def _int_param(params, name, default=None):
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise RequestError(400, f"Query parameter '{name}' must be an integer.")
+
+
+def _flag_param(params, name):
+    return (params.get(name) or [''])[0].lower() in ('1', 'true', 'yes')
+
+
+def render_response(path, params, body, content_type=''):
+    """
+    Produces the response for one request; runs in a worker thread.
+
+    Routes:
+        /generate/<aws|azure|gcp>: The provider template as JSON.
+        /diagram/text: The textual flow (limit, offset and group query parameters).
+        /diagram/dot: The DOT source of the flow diagram (clustered and max_nodes
+            query parameters).
+
+    Returns:
+        tuple: (content type, response body bytes).
+    """
+    parts = path.strip('/').split('/')
+    if len(parts) != 2 or parts[0] not in ('generate', 'diagram'):
+        raise RequestError(404, f"Unknown path '{path}'.")
+    kind, target = parts
+    if kind == 'generate' and target not in PROVIDERS:
+        raise RequestError(404, f"Unknown provider '{target}'. Expected one of: {', '.join(PROVIDERS)}.")
+    if kind == 'diagram' and target not in ('text', 'dot'):
+        raise RequestError(404, f"Unknown diagram format '{target}'. Expected 'text' or 'dot'.")
+
+    model = build_network_model(parse_requirements_payload(body, content_type))
+    if kind == 'generate':
+        try:
+            template = get_generator(target)(model)
+        except ValueError as e:
+            raise RequestError(400, str(e))  # e.g. more NSG rules than Azure allows
+        return 'application/json', json.dumps(template, separators=(',', ':'), default=str).encode()
+    if target == 'text':
+        text = generate_textual_flow_diagram(model, limit=_int_param(params, 'limit'), offset=_int_param(params, 'offset', 0),
+                                             group_by_pair=_flag_param(params, 'group'))
+        return 'text/plain; charset=utf-8', text.encode()
+    if _flag_param(params, 'clustered'):
+        graph = build_clustered_flow_graph(model, max_nodes=_int_param(params, 'max_nodes'))
+    else:
+        graph = build_flow_graph(model)
+    return 'text/vnd.graphviz; charset=utf-8', to_dot_source(graph).encode()
+
+
+class GenerationServer:
+    """
+    An asyncio HTTP/1.1 server that generates templates and diagrams on request.
+
+    The generator modules are imported once at startup and stay warm, so a
+    request only pays for parsing and generation. Generation runs in the default
+    thread pool so the event loop keeps accepting connections. Identical
+    requests (same path, query and body) that arrive while one of them is being
+    generated share that single generation instead of starting their own.
+    """
+
+    def __init__(self, log=True):
+        self.log = log
+        self._in_flight = {}
+        self.stats = {'requests': 0, 'generations': 0, 'coalesced': 0, 'errors': 0}
+        for provider in PROVIDERS:
+            get_generator(provider)  # Import every generator module up front
+
+    async def respond(self, method, target, body, content_type=''):
+        """Returns (status, content type, body bytes) for one request."""
+        url = urlsplit(target)
+        if method == 'GET' and url.path == '/health':
+            return 200, 'application/json', json.dumps({'status': 'ok', **self.stats}).encode()
+        if method != 'POST':
+            return 405, 'text/plain; charset=utf-8', b"Use POST with a requirements payload.\n"
+
+        key = hashlib.sha256(f"{url.path}?{url.query}\n{content_type}\n".encode() + body).hexdigest()
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, render_response, url.path, parse_qs(url.query), body, content_type)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _future: self._in_flight.pop(key, None))
+            self.stats['generations'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        try:
+            response_type, response_body = await asyncio.shield(future)
+        except RequestError as e:
+            return e.status, 'text/plain; charset=utf-8', f"{e}\n".encode()
+        return 200, response_type, response_body
+
+    async def handle_connection(self, reader, writer):
+        """Serves the requests of one (keep-alive) connection."""
+        try:
+            while True:
+                # StreamReader.readline raises ValueError for lines over its limit (64 KiB)
+                try:
+                    request_line = await reader.readline()
+                except ValueError:
+                    await self._write_response(writer, 400, 'text/plain', b"Request line too long.\n", keep_alive=False)
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._write_response(writer, 400, 'text/plain', b"Malformed request line.\n", keep_alive=False)
+                    break
+                headers = {}
+                try:
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                except ValueError:
+                    await self._write_response(writer, 431, 'text/plain', b"Header line too long.\n", keep_alive=False)
+                    break
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                if 'chunked' in headers.get('transfer-encoding', ''):
+                    await self._write_response(writer, 411, 'text/plain', b"Send a Content-Length.\n", keep_alive=False)
+                    break
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._write_response(writer, 400, 'text/plain', b"Invalid Content-Length.\n", keep_alive=False)
+                    break
+                if length > MAX_REQUEST_BYTES:
+                    await self._write_response(writer, 413, 'text/plain', b"Payload too large.\n", keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                start = time.perf_counter()
+                self.stats['requests'] += 1
+                try:
+                    status, response_type, response_body = await self.respond(method, target, body, headers.get('content-type', ''))
+                except Exception as e:
+                    status, response_type, response_body = 500, 'text/plain; charset=utf-8', f"{type(e).__name__}: {e}\n".encode()
+                if status >= 400:
+                    self.stats['errors'] += 1
+                await self._write_response(writer, status, response_type, response_body, keep_alive)
+                if self.log:
+                    print(f"{method} {target} {status} {len(response_body)}B {(time.perf_counter() - start) * 1000:.1f}ms", file=sys.stderr)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_response(self, writer, status, content_type, body, keep_alive=True):
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, socket_path=None, log=True):
+    """
+    Runs the generation server until it is cancelled.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The TCP port to listen on.
+        socket_path (str): Listen on this Unix socket instead of host/port.
+        log (bool): Log one line per request to stderr.
+    """
+    server = GenerationServer(log=log)
+    if socket_path:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=socket_path)
+        print(f"Generation server listening on unix:{socket_path}", file=sys.stderr)
+    else:
+        listener = await asyncio.start_server(server.handle_connection, host, port)
+        print(f"Generation server listening on http://{host}:{port}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def run_server(host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, socket_path=None, log=True):
+    """Runs the generation server in the foreground until interrupted (Ctrl+C)."""
+    try:
+        asyncio.run(serve(host, port, socket_path, log))
+    except KeyboardInterrupt:
+        print("Generation server stopped.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    # Example usage for testing:
+    #   curl --data-binary @example_requirements.yaml http://127.0.0.1:8787/generate/aws
+    run_server()
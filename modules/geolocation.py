@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from modules.output_settings import DEFAULT_CACHE_DIR
+
+GEOLOCATION_URL = "https://ipinfo.io/json"
+GEOLOCATION_TIMEOUT = 5
+GEOLOCATION_CACHE_FILE = "geolocation.json"
+GEOLOCATION_CACHE_TTL = 24 * 60 * 60
+# Failed lookups are cached too, but briefly, so air-gapped runners do not wait
+# for the request on every run while a transient failure is retried soon.
+GEOLOCATION_FAILURE_TTL = 60 * 60
+# Set to 1/true/yes to never contact the geolocation service.
+OFFLINE_ENV_VAR = "NETFLOW_OFFLINE"
+# Set to an ISO country code (e.g. RO) to skip the lookup and use that country.
+COUNTRY_ENV_VAR = "NETFLOW_COUNTRY"
+
+# ISO 3166 country code -> nearest AWS region. Only regions enabled by default
+# in every account are suggested: deploying to an opt-in region (eu-south-1,
+# me-central-1, af-south-1, ap-east-1, ...) fails unless the account owner has
+# enabled it, so those countries map to the nearest default region instead.
+COUNTRY_TO_AWS_REGION = {
+    # Europe
+    'RO': 'eu-central-1', 'DE': 'eu-central-1', 'AT': 'eu-central-1', 'CH': 'eu-central-1', 'PL': 'eu-central-1',
+    'CZ': 'eu-central-1', 'SK': 'eu-central-1', 'HU': 'eu-central-1', 'BG': 'eu-central-1', 'RS': 'eu-central-1',
+    'HR': 'eu-central-1', 'SI': 'eu-central-1', 'UA': 'eu-central-1', 'MD': 'eu-central-1', 'GR': 'eu-central-1',
+    'IT': 'eu-central-1', 'MT': 'eu-central-1', 'ES': 'eu-west-3', 'PT': 'eu-west-3', 'FR': 'eu-west-3',
+    'BE': 'eu-west-3', 'LU': 'eu-west-3', 'NL': 'eu-west-1', 'IE': 'eu-west-1', 'GB': 'eu-west-2',
+    'SE': 'eu-north-1', 'NO': 'eu-north-1', 'FI': 'eu-north-1', 'DK': 'eu-north-1', 'EE': 'eu-north-1',
+    'LV': 'eu-north-1', 'LT': 'eu-north-1', 'IS': 'eu-west-1', 'TR': 'eu-central-1',
+    # Middle East and Africa
+    'IL': 'eu-central-1', 'AE': 'ap-south-1', 'SA': 'ap-south-1', 'QA': 'ap-south-1', 'BH': 'ap-south-1',
+    'KW': 'ap-south-1', 'OM': 'ap-south-1', 'EG': 'eu-central-1', 'ZA': 'eu-west-1', 'NG': 'eu-west-1',
+    'KE': 'eu-west-1', 'MA': 'eu-west-3',
+    # Asia Pacific
+    'IN': 'ap-south-1', 'PK': 'ap-south-1', 'BD': 'ap-south-1', 'LK': 'ap-south-1', 'SG': 'ap-southeast-1',
+    'MY': 'ap-southeast-1', 'ID': 'ap-southeast-1', 'TH': 'ap-southeast-1', 'VN': 'ap-southeast-1',
+    'PH': 'ap-southeast-1', 'HK': 'ap-southeast-1', 'TW': 'ap-northeast-1', 'CN': 'ap-southeast-1', 'JP': 'ap-northeast-1',
+    'KR': 'ap-northeast-2', 'AU': 'ap-southeast-2', 'NZ': 'ap-southeast-2',
+    # Americas
+    'US': 'us-east-1', 'CA': 'ca-central-1', 'MX': 'us-east-1', 'BR': 'sa-east-1', 'AR': 'sa-east-1',
+    'CL': 'sa-east-1', 'CO': 'us-east-1', 'PE': 'sa-east-1', 'UY': 'sa-east-1',
+}
+
+
+def is_offline():
+    """Returns True if geolocation lookups are disabled through OFFLINE_ENV_VAR."""
+    return os.environ.get(OFFLINE_ENV_VAR, '').strip().lower() in ('1', 'true', 'yes')
+
+
+def _read_cached_country(cache_path):
+    try:
+        with open(cache_path, 'r') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return False, None
+    ttl = GEOLOCATION_CACHE_TTL if entry.get('country') else GEOLOCATION_FAILURE_TTL
+    if time.time() - entry.get('timestamp', 0) > ttl:
+        return False, None
+    return True, entry.get('country')
+
+
+def _write_cached_country(cache_path, country):
+    try:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or '.', prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'country': country, 'timestamp': time.time()}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # The cache is an optimization only
+
+
+def lookup_country(cache_dir=DEFAULT_CACHE_DIR, offline=False, timeout=GEOLOCATION_TIMEOUT):
+    """
+    Returns the ISO country code of the current public IP address.
+
+    COUNTRY_ENV_VAR overrides the lookup. Otherwise a cached result younger
+    than its TTL is used, and only then is the geolocation service contacted.
+    Both successful and failed lookups are cached on disk.
+
+    Args:
+        cache_dir (str): Directory of the geolocation cache file.
+        offline (bool): Never contact the service (also enabled by OFFLINE_ENV_VAR).
+        timeout (float): Request timeout in seconds.
+
+    Returns:
+        str: The country code, or None if it is unknown.
+    """
+    country = os.environ.get(COUNTRY_ENV_VAR, '').strip().upper()
+    if country:
+        return country
+
+    cache_path = os.path.join(cache_dir, GEOLOCATION_CACHE_FILE)
+    cached, country = _read_cached_country(cache_path)
+    if cached:
+        return country
+    if offline or is_offline():
+        return None
+
+    try:
+        import requests
+    except ImportError:
+        return None  # Only the region suggestion depends on requests
+
+    try:
+        response = requests.get(GEOLOCATION_URL, timeout=timeout)
+        response.raise_for_status()
+        country = response.json().get("country")
+    except (requests.exceptions.RequestException, ValueError):
+        country = None
+    _write_cached_country(cache_path, country)
+    return country
+
+
+class LocationLookup:
+    """
+    Runs lookup_country() in a background thread.
+
+    Start it early so the lookup overlaps with template generation, and call
+    result() when the country is needed.
+    """
+
+    def __init__(self, **kwargs):
+        self._country = None
+        self._thread = threading.Thread(target=self._run, kwargs=kwargs, daemon=True)
+        self._thread.start()
+
+    def _run(self, **kwargs):
+        self._country = lookup_country(**kwargs)
+
+    def result(self, timeout=GEOLOCATION_TIMEOUT):
+        """Returns the country code, or None if it is unknown or not available within 'timeout' seconds."""
+        self._thread.join(timeout)
+        return self._country
+
+
+def suggest_aws_region(country):
+    """Returns the AWS region nearest to a country code, or None if there is no suggestion."""
+    return COUNTRY_TO_AWS_REGION.get((country or '').upper())
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    lookup = LocationLookup()
+    example_country = lookup.result()
+    print(f"Country: {example_country}, suggested AWS region: {suggest_aws_region(example_country)}")
@@ -0,0 +1,180 @@
+from modules.rule_compactor import compact_firewall_rules
+
+# Resource name of subnets without a name
+DEFAULT_SUBNET_NAME = 'defaultSubnet'
+
+
+class Subnet:
+    """A subnet with the identifiers every provider and diagram derives from its name."""
+
+    __slots__ = ('name', 'cidr', 'purpose', 'compact_name', 'logical_id', 'node_id')
+
+    def __init__(self, name, cidr, purpose):
+        self.name = name
+        self.cidr = cidr
+        self.purpose = purpose
+        # Precomputed once instead of by every consumer with .replace('-', ...).
+        # Nameless subnets get DEFAULT_SUBNET_NAME, so every provider agrees on their name.
+        text = str(name) if name is not None else ''
+        self.compact_name = text.replace('-', '') or DEFAULT_SUBNET_NAME
+        self.logical_id = self.compact_name.lower()
+        self.node_id = text.replace('-', '_') or DEFAULT_SUBNET_NAME
+
+    @property
+    def is_frontend(self):
+        return str(self.purpose or '').lower() == 'frontend'
+
+
+class Listener:
+    __slots__ = ('port', 'protocol')
+
+    def __init__(self, port, protocol):
+        self.port = port
+        self.protocol = protocol
+
+
+class LoadBalancer:
+    __slots__ = ('enabled', 'type', 'listeners', 'health_check_path')
+
+    def __init__(self, enabled, lb_type, listeners, health_check_path):
+        self.enabled = enabled
+        self.type = lb_type
+        self.listeners = listeners
+        self.health_check_path = health_check_path
+
+
+class FirewallRule:
+    """A firewall rule as written in the requirements; missing fields are None."""
+
+    __slots__ = ('name', 'ports', 'protocol', 'source', 'destination', 'action')
+
+    def __init__(self, name, ports, protocol, source, destination, action):
+        self.name = name
+        self.ports = ports
+        self.protocol = protocol
+        self.source = source
+        self.destination = destination
+        self.action = action
+
+
+class NetworkModel:
+    """
+    The normalized intermediate representation of one requirements file.
+
+    Built once by build_network_model() and shared by the AWS, Azure and GCP
+    generators and the diagram generators, so generating for every provider
+    costs a single normalization pass. Values missing from the requirements are
+    None, leaving each consumer free to apply its own defaults.
+    """
+
+    __slots__ = ('requirements', 'application', 'region', 'app_type', 'name', 'ip_address_space',
+                 'subnets', 'subnets_by_name', 'cidrs_by_name', 'load_balancer', 'firewall_rules',
+                 'security', '_raw_rules', '_compacted_rules')
+
+    def __init__(self, requirements):
+        network = requirements.get('network', {})
+        if not isinstance(network, dict):
+            network = {}
+        self.requirements = requirements
+        self.application = requirements.get('application')
+        self.region = requirements.get('region')
+        self.app_type = requirements.get('type')
+        self.name = network.get('name')
+        self.ip_address_space = network.get('ip_address_space')
+        self.security = network.get('security', {})
+
+        self.subnets = [Subnet(s.get('name'), s.get('cidr'), s.get('purpose')) for s in network.get('subnets', []) or []]
+        self.subnets_by_name = {}
+        self.cidrs_by_name = {}
+        for subnet in self.subnets:
+            if subnet.name is not None and subnet.name not in self.subnets_by_name:
+                self.subnets_by_name[subnet.name] = subnet
+                self.cidrs_by_name[subnet.name] = subnet.cidr
+
+        lb_config = network.get('load_balancer', {}) or {}
+        self.load_balancer = LoadBalancer(
+            bool(lb_config.get('enabled', False)),
+            lb_config.get('type'),
+            [Listener(l.get('port'), l.get('protocol')) for l in lb_config.get('listeners', []) or []],
+            lb_config.get('health_check_path'),
+        )
+
+        self._raw_rules = (network.get('firewall', {}) or {}).get('rules', []) or []
+        self.firewall_rules = [
+            FirewallRule(r.get('name'), r.get('ports'), r.get('protocol'), r.get('source'), r.get('destination'), r.get('action'))
+            for r in self._raw_rules
+        ]
+        self._compacted_rules = None
+
+    def resolve_cidr(self, endpoint):
+        """Returns the CIDR of a subnet name, or the endpoint unchanged if it is not a subnet."""
+        return self.cidrs_by_name.get(endpoint, endpoint)
+
+    def compacted_firewall_rules(self):
+        """Returns (compacted rules, stats) from compact_firewall_rules, computed once per model."""
+        if self._compacted_rules is None:
+            self._compacted_rules = compact_firewall_rules(self._raw_rules)
+        return self._compacted_rules
+
+
+def build_network_model(requirements):
+    """
+    Builds the shared NetworkModel for a parsed requirements dict.
+
+    Args:
+        requirements (dict): The parsed network requirements.
+
+    Returns:
+        NetworkModel: The normalized model.
+    """
+    return NetworkModel(requirements)
+
+
+def ensure_network_model(requirements):
+    """Returns 'requirements' unchanged if it already is a NetworkModel, otherwise builds one."""
+    if isinstance(requirements, NetworkModel):
+        return requirements
+    return build_network_model(requirements)
+
+
+
+def validate_subnet_names(network):
+    """
+    Checks that no two subnets get the same resource name once sanitized.
+
+    The generators drop '-' from subnet names (see Subnet.compact_name), AWS
+    logical IDs are lowercased and nameless subnets all become 'defaultSubnet',
+    so 'front-end' and 'FrontEnd' would otherwise be registered as the same
+    resource. The names are sanitized exactly like Subnet does it.
+
+    Args:
+        network (dict): The 'network' section of the parsed requirements.
+
+    Returns:
+        list: Human-readable violation messages; empty if every name is unique.
+    """
+    subnets = network.get('subnets')
+    seen = {}
+    violations = []
+    for index, subnet in enumerate(subnets if isinstance(subnets, list) else []):
+        if not isinstance(subnet, dict):
+            continue
+        name = subnet.get('name')
+        label = name if name not in (None, '') else f'subnet #{index}'
+        resource_name = Subnet(name, None, None).compact_name
+        key = resource_name.lower()
+        if key in seen:
+            violations.append(f"Subnet '{label}' and subnet '{seen[key]}' both get the resource name "
+                              f"'{resource_name}' (names are compared without '-' and ignoring case).")
+        else:
+            seen[key] = label
+    return violations
+
+if __name__ == '__main__':
+    # Example usage for testing
+    from modules.yaml_generator import generate_generic_yaml
+
+    model = build_network_model(generate_generic_yaml())
+    for example_subnet in model.subnets:
+        print(example_subnet.name, example_subnet.cidr, example_subnet.logical_id, example_subnet.node_id)
+    print(model.resolve_cidr('backend-subnet'), model.compacted_firewall_rules()[1])
@@ -0,0 +1,9 @@
+# Output and cache defaults shared by the generators, the caches and the CLI.
+# They live apart from batch_compiler, template_cache and template_stream so the
+# CLI can build its argument parser without importing yaml writers, orjson or
+# the cache machinery on the default text-only path.
+DEFAULT_BATCH_OUTPUT_DIR = "output"
+DEFAULT_CACHE_DIR = ".netflow_cache"
+JSON_BACKENDS = ('json', 'orjson', 'auto')
+# The CloudFormation template written by the interactive --apply and fan-out paths
+OUTPUT_CLOUDFORMATION_FILE = "output.json"
@@ -0,0 +1,244 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+PROMETHEUS_METRIC_PREFIX = "netflow_stage"
+
+# The profiler of the current run, or None. profile_stage() only checks this,
+# so instrumented code costs one global lookup per stage while profiling is off.
+_active_profiler = None
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class StageProfiler:
+    """
+    Records wall time, CPU time and peak traced memory per pipeline stage.
+
+    Stages nest (a stage opened inside another is recorded under
+    'outer/inner') and may run on several threads, e.g. one 'deploy' stage
+    per fan-out target. CPU time is that of the thread running the stage.
+    Peak memory is the highest tracemalloc reading during the stage minus the
+    traced memory at its start. tracemalloc's peak is process-wide, so a stage
+    that overlaps a stage of another thread records None instead of a peak
+    that other threads may have reset or inflated.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracing = False
+        # Open stages per thread, and a counter bumped whenever stages of two threads overlap
+        self._open_stages = {}
+        self._overlaps = 0
+
+    def start(self):
+        if self.trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        self.start_time = time.time()
+        self._perf_start = time.perf_counter()
+
+    def stop(self):
+        if self._started_tracing:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Context manager recording one execution of the stage 'name'."""
+        stack = self._local.__dict__.setdefault('stack', [])
+        path = '/'.join([frame['path'] for frame in stack[-1:]] + [name])
+        frame = {'path': path, 'child_peak': 0}
+        thread_id = threading.get_ident()
+        with self._lock:
+            if any(count for other, count in self._open_stages.items() if other != thread_id):
+                self._overlaps += 1
+            self._open_stages[thread_id] = self._open_stages.get(thread_id, 0) + 1
+            overlaps_at_start = self._overlaps
+            concurrent = any(count for other, count in self._open_stages.items() if other != thread_id)
+        memory_start = 0
+        if self.trace_memory:
+            import tracemalloc
+
+            memory_start, peak_so_far = tracemalloc.get_traced_memory()
+            if stack:
+                # Keep the parent's peak so far before the reset below discards it
+                stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak_so_far)
+            tracemalloc.reset_peak()
+        stack.append(frame)
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stack.pop()
+            with self._lock:
+                self._open_stages[thread_id] -= 1
+                concurrent = concurrent or self._overlaps != overlaps_at_start
+            peak = 0
+            if self.trace_memory:
+                # A nested stage reset the peak, so also take the highest peak of the children
+                peak_bytes = max(tracemalloc.get_traced_memory()[1], frame['child_peak'])
+                peak = max(0, peak_bytes - memory_start)
+                if stack:
+                    stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak_bytes)
+                if concurrent:
+                    peak = None
+            with self._lock:
+                self.records.append({'stage': path, 'start_seconds': wall_start - self._perf_start, 'wall_seconds': wall,
+                                     'cpu_seconds': cpu, 'peak_memory_bytes': peak})
+
+    def summary(self):
+        """
+        Aggregates the recorded stage executions per stage, in order of first start
+        (so nested stages follow their parent).
+
+        Returns:
+            list: One dict per stage with calls, total wall and CPU seconds and the highest peak memory
+                (None if every execution overlapped another thread's stages).
+        """
+        stages = {}
+        with self._lock:
+            records = sorted(self.records, key=lambda record: record['start_seconds'])
+        for record in records:
+            entry = stages.setdefault(record['stage'], {'stage': record['stage'], 'calls': 0, 'wall_seconds': 0.0,
+                                                        'cpu_seconds': 0.0, 'peak_memory_bytes': None})
+            entry['calls'] += 1
+            entry['wall_seconds'] += record['wall_seconds']
+            entry['cpu_seconds'] += record['cpu_seconds']
+            if record['peak_memory_bytes'] is not None:
+                entry['peak_memory_bytes'] = max(entry['peak_memory_bytes'] or 0, record['peak_memory_bytes'])
+        return list(stages.values())
+
+
+def enable_profiling(trace_memory=True):
+    """
+    Starts profiling the stages of this run.
+
+    Args:
+        trace_memory (bool): Also measure peak memory with tracemalloc (slows allocations down).
+
+    Returns:
+        StageProfiler: The active profiler.
+    """
+    global _active_profiler
+    _active_profiler = StageProfiler(trace_memory=trace_memory)
+    _active_profiler.start()
+    return _active_profiler
+
+
+def disable_profiling():
+    """Stops profiling and returns the profiler that was active (or None)."""
+    global _active_profiler
+    profiler, _active_profiler = _active_profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def profile_stage(name):
+    """
+    Returns a context manager that records the enclosed code as stage 'name'.
+
+    With profiling disabled this is a shared no-op context manager.
+    """
+    if _active_profiler is None:
+        return _NULL_STAGE
+    return _active_profiler.stage(name)
+
+
+def print_profile_report(profiler):
+    """Prints the per-stage summary table of a profiler."""
+    summary = profiler.summary()
+    if not summary:
+        print("\nNo stages were profiled.")
+        return
+    print("\nStage profile:")
+    print(f"  {'stage':<36} {'calls':>5} {'wall ms':>10} {'cpu ms':>10} {'peak KiB':>10}")
+    for entry in summary:
+        depth = entry['stage'].count('/')
+        label = '  ' * depth + entry['stage'].rsplit('/', 1)[-1]
+        peak_bytes = entry['peak_memory_bytes'] if profiler.trace_memory else None
+        peak = f"{peak_bytes / 1024:10.0f}" if peak_bytes is not None else f"{'-':>10}"
+        print(f"  {label:<36} {entry['calls']:>5} {entry['wall_seconds'] * 1000:10.1f} {entry['cpu_seconds'] * 1000:10.1f} {peak}")
+
+
+def _write_atomically(path, content):
+    # The node exporter textfile collector may read the file at any time, so never expose a partial write
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_json_report(profiler, path):
+    """Writes the per-stage summary and the individual stage executions as JSON."""
+    report = {
+        'started_at': profiler.start_time,
+        'trace_memory': profiler.trace_memory,
+        'stages': profiler.summary(),
+        'records': list(profiler.records),
+    }
+    _write_atomically(path, json.dumps(report, indent=2))
+
+
+def _prometheus_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_prometheus_textfile(profiler, path):
+    """
+    Writes the per-stage summary in the Prometheus text format for the node exporter textfile collector.
+
+    Args:
+        profiler (StageProfiler): The profiler of the run.
+        path (str): Output path; it should end in '.prom' and lie in the collector's directory.
+    """
+    metrics = [
+        ('wall_seconds', 'Wall-clock seconds spent in the stage during the last run.', 'wall_seconds'),
+        ('cpu_seconds', 'CPU seconds spent in the stage during the last run.', 'cpu_seconds'),
+        ('calls', 'Number of times the stage ran during the last run.', 'calls'),
+    ]
+    if profiler.trace_memory:
+        metrics.append(('peak_memory_bytes', 'Peak traced memory of the stage during the last run.', 'peak_memory_bytes'))
+    summary = profiler.summary()
+    lines = []
+    for suffix, description, key in metrics:
+        name = f"{PROMETHEUS_METRIC_PREFIX}_{suffix}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for entry in summary:
+            if entry[key] is not None:
+                lines.append(f'{name}{{stage="{_prometheus_label(entry["stage"])}"}} {entry[key]}')
+    lines.append(f"# HELP {PROMETHEUS_METRIC_PREFIX}_last_run_timestamp_seconds Start time of the last profiled run.")
+    lines.append(f"# TYPE {PROMETHEUS_METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+    lines.append(f"{PROMETHEUS_METRIC_PREFIX}_last_run_timestamp_seconds {profiler.start_time}")
+    _write_atomically(path, '\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    profiler = enable_profiling()
+    with profile_stage('build'):
+        data = [str(i) for i in range(100000)]
+        with profile_stage('serialize'):
+            json.dumps(data)
+    disable_profiling()
+    print_profile_report(profiler)
@@ -0,0 +1,88 @@
+import importlib
+
+# Provider name -> (module, generator function). Modules are imported on first
+# use, so a run that only needs one provider (or none) never loads the others.
+PROVIDER_GENERATORS = {
+    'aws': ('modules.aws_config_generator', 'generate_aws_cloudformation'),
+    'azure': ('modules.azure_config_generator', 'generate_azure_arm_template'),
+    'gcp': ('modules.gcp_config_generator', 'generate_gcp_config'),
+}
+PROVIDERS = tuple(sorted(PROVIDER_GENERATORS))
+# Provider name -> function in the same module returning the template with lazy
+# containers, for writing it incrementally (see template_stream).
+PROVIDER_STREAMERS = {
+    'aws': 'stream_aws_cloudformation',
+    'azure': 'stream_azure_arm_template',
+    'gcp': 'stream_gcp_config',
+}
+
+
+def get_generator(provider):
+    """
+    Returns the template generator of a provider, importing its module on first use.
+
+    Args:
+        provider (str): One of PROVIDERS.
+
+    Returns:
+        callable: The generator, taking a requirements dict or NetworkModel.
+
+    Raises:
+        ValueError: If the provider is unknown.
+    """
+    if provider not in PROVIDER_GENERATORS:
+        raise ValueError(f"Unknown provider '{provider}'. Expected one of: {', '.join(PROVIDERS)}.")
+    module_name, function_name = PROVIDER_GENERATORS[provider]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def get_stream_generator(provider):
+    """
+    Returns the streaming template generator of a provider (see PROVIDER_STREAMERS).
+
+    Raises:
+        ValueError: If the provider is unknown.
+    """
+    get_generator(provider)  # Validates the provider name
+    return getattr(importlib.import_module(PROVIDER_GENERATORS[provider][0]), PROVIDER_STREAMERS[provider])
+
+
+def parse_provider_list(value):
+    """
+    Parses a provider selection such as 'all', 'gcp' or 'aws,azure'.
+
+    Returns:
+        tuple: The selected providers, without duplicates, in PROVIDERS order.
+
+    Raises:
+        ValueError: If a provider is unknown or none is given.
+    """
+    names = {name.strip().lower() for name in value.split(',') if name.strip()}
+    if 'all' in names:
+        return PROVIDERS
+    unknown = names.difference(PROVIDER_GENERATORS)
+    if unknown or not names:
+        raise ValueError(f"Unknown provider '{', '.join(sorted(unknown)) or value}'. Expected 'all' or one or more of: {', '.join(PROVIDERS)}.")
+    return tuple(provider for provider in PROVIDERS if provider in names)
+
+
+def get_generator_module(provider):
+    """
+    Returns the generator module of a provider, importing it on first use.
+
+    Every generator module exposes TEMPLATE_SECTIONS, a tuple of (section name,
+    builder, requirement sections it reads), and assemble_template(model,
+    fragments), which the watch mode uses to rebuild single sections.
+    """
+    get_generator(provider)  # Validates the provider name
+    return importlib.import_module(PROVIDER_GENERATORS[provider][0])
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    import sys
+
+    print([name for name in sys.modules if name.endswith('_config_generator')])
+    print(get_generator('gcp'))
+    print(parse_provider_list('gcp,aws'), parse_provider_list('all'))
+    print([name for name in sys.modules if name.endswith('_config_generator')])
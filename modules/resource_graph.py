@@ -0,0 +1,201 @@
+import re
+
+# [resourceId('<type>', '<name>')] expressions inside ARM resource properties
+RESOURCE_ID_PATTERN = re.compile(r"resourceId\('([^']+)',\s*'([^']+)'\)")
+
+
+def resource_key(resource_type, name):
+    """Returns the '<type>/<name>' key ARM uses in dependsOn for a resource."""
+    return f"{resource_type}/{name}"
+
+
+def parent_key(resource_type, name):
+    """
+    Returns the key of the parent of a child resource, or None.
+
+    A child resource such as type 'Microsoft.Network/virtualNetworks/subnets'
+    named 'vnet/frontend' lives under 'Microsoft.Network/virtualNetworks/vnet'.
+    """
+    type_parts = resource_type.split('/')
+    name_parts = name.split('/')
+    if len(name_parts) < 2 or len(type_parts) != len(name_parts) + 1:
+        return None
+    return resource_key('/'.join(type_parts[:-1]), '/'.join(name_parts[:-1]))
+
+
+def _referenced_keys(value):
+    """Yields the keys of every resource referenced with resourceId() inside a plain value."""
+    if isinstance(value, str):
+        for resource_type, name in RESOURCE_ID_PATTERN.findall(value):
+            yield resource_key(resource_type, name)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _referenced_keys(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _referenced_keys(item)
+
+
+class ResourceRegistry:
+    """
+    Builds the dependency DAG of an ARM template, keyed by resource name.
+
+    Resources are added in deployment-template order. The dependencies of each
+    resource are inferred, never written by hand: its parent (for child
+    resources like subnets) plus every resource of the template it references
+    with resourceId() in its properties, and any explicit extra dependencies.
+    Only references to resources added earlier count, so the graph is acyclic
+    by construction. The emitted dependsOn is the transitive reduction: an edge
+    is dropped when another dependency already implies it. For example, a
+    resource depending on a subnet does not also need to depend on the
+    subnet's virtual network. ARM can then start every resource as soon as its
+    direct prerequisites are done.
+
+    Only the dependency closure of each resource is kept, so resources can be
+    added (and written out) one at a time.
+    """
+
+    def __init__(self):
+        self._order = {}
+        self._closure = {}
+        self._depth = {}
+        self._critical_parent = {}
+        self.inferred_edges = 0
+        self.emitted_edges = 0
+
+    def __contains__(self, key):
+        return key in self._order
+
+    def __len__(self):
+        return len(self._order)
+
+    def add_key(self, key, depends_on=()):
+        """
+        Registers a resource by key with the given direct dependencies.
+
+        Returns:
+            list: The transitively reduced dependencies, in registration order.
+
+        Raises:
+            ValueError: If the key is already registered or a dependency is not.
+        """
+        if key in self._order:
+            raise ValueError(f"Resource '{key}' is registered twice.")
+        dependencies = set(depends_on)
+        unknown = [dependency for dependency in dependencies if dependency not in self._order]
+        if unknown:
+            raise ValueError(f"Resource '{key}' depends on '{unknown[0]}', which is not defined before it.")
+        # A dependency is redundant if another dependency already (transitively) depends on it
+        implied = set()
+        for dependency in dependencies:
+            implied |= self._closure[dependency]
+        reduced = sorted(dependencies - implied, key=self._order.__getitem__)
+
+        closure = set(implied)
+        closure.update(dependencies)
+        self._order[key] = len(self._order)
+        self._closure[key] = frozenset(closure)
+        deepest = max(reduced, key=self._depth.__getitem__, default=None)
+        self._depth[key] = 1 + (self._depth[deepest] if deepest is not None else 0)
+        self._critical_parent[key] = deepest
+        self.inferred_edges += len(dependencies)
+        self.emitted_edges += len(reduced)
+        return reduced
+
+    def add(self, resource, depends_on=(), references=None):
+        """
+        Registers an ARM resource and returns it with its minimal dependsOn.
+
+        The resource is copied, not modified. Any hand-written dependsOn is
+        replaced, and dependsOn is placed after 'location' (or dropped when
+        the resource has no dependencies).
+
+        Args:
+            resource (dict): The resource, with 'type', 'name' and its properties.
+            depends_on (iterable): Extra dependency keys that cannot be inferred.
+            references (iterable): Keys the resource references, if known;
+                by default they are found by walking its properties, which
+                is slow for resources with thousands of entries.
+
+        Returns:
+            dict: The resource with the reduced dependsOn.
+        """
+        resource_type, name = resource['type'], resource['name']
+        dependencies = set(depends_on)
+        parent = parent_key(resource_type, name)
+        if parent in self._order:
+            dependencies.add(parent)
+        key = resource_key(resource_type, name)
+        if references is None:
+            references = _referenced_keys(resource.get('properties'))
+        dependencies.update(k for k in references if k in self._order and k != key)
+        reduced = self.add_key(key, dependencies)
+
+        result = {}
+        for field, value in resource.items():
+            if field == 'dependsOn':
+                continue
+            result[field] = value
+            if field == 'location' and reduced:
+                result['dependsOn'] = list(reduced)
+        if reduced and 'dependsOn' not in result:
+            result['dependsOn'] = list(reduced)
+        return result
+
+    def depth(self, key):
+        """Returns the deployment wave of a resource: 1 without dependencies, else 1 + its deepest dependency."""
+        return self._depth[key]
+
+    def critical_path(self):
+        """Returns the longest dependency chain, from the first resource to deploy to the last."""
+        if not self._depth:
+            return []
+        key = max(self._depth, key=lambda k: (self._depth[k], -self._order[k]))
+        path = []
+        while key is not None:
+            path.append(key)
+            key = self._critical_parent[key]
+        return path[::-1]
+
+    def stats(self):
+        """
+        Summarizes the dependency graph.
+
+        Returns:
+            dict: resources, inferred and emitted dependsOn edges, the edges
+                removed by the transitive reduction, the critical-path depth
+                (sequential deployment waves) and the critical path itself.
+        """
+        path = self.critical_path()
+        return {
+            'resources': len(self._order),
+            'inferred_edges': self.inferred_edges,
+            'emitted_edges': self.emitted_edges,
+            'removed_edges': self.inferred_edges - self.emitted_edges,
+            'critical_path_depth': len(path),
+            'critical_path': path,
+        }
+
+
+def print_dependency_report(stats):
+    """Prints the summary of a ResourceRegistry."""
+    print("\nDeployment Dependency Report:")
+    print(f"  Resources: {stats['resources']}")
+    print(f"  dependsOn edges: {stats['emitted_edges']} emitted "
+          f"({stats['inferred_edges']} inferred, {stats['removed_edges']} removed as transitively implied)")
+    print(f"  Critical path depth: {stats['critical_path_depth']} sequential deployment waves")
+    if stats['critical_path']:
+        print(f"  Critical path: {' -> '.join(stats['critical_path'])}")
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    registry = ResourceRegistry()
+    vnet = registry.add({"type": "Microsoft.Network/virtualNetworks", "name": "vnet", "location": "westeurope"})
+    subnet = registry.add({"type": "Microsoft.Network/virtualNetworks/subnets", "name": "vnet/frontend",
+                           "location": "westeurope", "properties": {}})
+    nic = registry.add({"type": "Microsoft.Network/networkInterfaces", "name": "nic", "location": "westeurope",
+                        "properties": {"subnet": {"id": "[resourceId('Microsoft.Network/virtualNetworks/subnets', 'vnet/frontend')]"}}},
+                       depends_on=["Microsoft.Network/virtualNetworks/vnet"])
+    print(nic['dependsOn'])
+    print_dependency_report(registry.stats())
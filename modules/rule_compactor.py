@@ -0,0 +1,170 @@
+ANY_PORT_RANGE = (0, 65535)
+ANY_PORT_VALUES = ('*', 'any', 'all')
+
+
+def parse_port(port):
+    """
+    Parses a single port specification into an inclusive (start, end) interval.
+
+    Accepts integers, numeric strings, 'start-end' ranges and '*' / 'Any' / 'All'.
+
+    Args:
+        port (int or str): The port specification.
+
+    Returns:
+        tuple: The (start, end) interval.
+
+    Raises:
+        ValueError: If the specification is not a valid port or port range.
+    """
+    if isinstance(port, int) and not isinstance(port, bool):
+        start = end = port
+    else:
+        text = str(port).strip()
+        if text.lower() in ANY_PORT_VALUES:
+            return ANY_PORT_RANGE
+        try:
+            if '-' in text:
+                start_text, end_text = text.split('-', 1)
+                start, end = int(start_text), int(end_text)
+            else:
+                start = end = int(text)
+        except ValueError:
+            raise ValueError(f"Invalid port: {port!r} (expected a port number, a 'start-end' range or '*')") from None
+    if not (ANY_PORT_RANGE[0] <= start <= end <= ANY_PORT_RANGE[1]):
+        raise ValueError(f"Invalid port range: {port}")
+    return (start, end)
+
+
+def _rule_ports(rule):
+    ports = rule.get('ports')
+    if ports is None:
+        return []
+    return ports if isinstance(ports, list) else [ports]
+
+
+def validate_firewall_ports(network):
+    """
+    Checks that every firewall rule port can be parsed (see parse_port).
+
+    Args:
+        network (dict): The 'network' section of the parsed requirements.
+
+    Returns:
+        list: Human-readable violation messages; empty if every port is valid.
+    """
+    firewall = network.get('firewall')
+    rules = firewall.get('rules') if isinstance(firewall, dict) else None
+    violations = []
+    for index, rule in enumerate(rules if isinstance(rules, list) else []):
+        if not isinstance(rule, dict):
+            continue
+        for port in _rule_ports(rule):
+            try:
+                parse_port(port)
+            except ValueError as e:
+                violations.append(f"Firewall rule '{rule.get('name', index)}': {e}")
+    return violations
+
+
+def merge_port_intervals(intervals):
+    """
+    Merges overlapping and adjacent port intervals.
+
+    Args:
+        intervals (iterable): (start, end) tuples in any order.
+
+    Returns:
+        list: Sorted, non-overlapping, non-adjacent (start, end) tuples.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def format_port_range(interval):
+    """Formats a (start, end) interval as '80' or '8000-8080'."""
+    start, end = interval
+    return str(start) if start == end else f"{start}-{end}"
+
+
+def compact_firewall_rules(rules):
+    """
+    Compacts firewall rules before the provider emitters turn them into resources.
+
+    Rules are normalized (protocol and action case, port specifications parsed
+    into intervals), rules that share source, destination, protocol and action
+    are merged into one, and their ports are merged into the smallest set of
+    ranges. Exact duplicates disappear in the process. The first rule of each
+    merged group gives the result its name, and groups keep the order in which
+    they first appear.
+
+    Args:
+        rules (list): Firewall rules as found under network.firewall.rules.
+
+    Returns:
+        tuple: (compacted rules, stats). Each compacted rule is a dict with
+            'name', 'source', 'destination', 'protocol', 'action' and
+            'port_ranges' (a list of (start, end) tuples). stats holds the rule
+            and per-port resource counts before and after compaction.
+    """
+    groups = {}
+    input_port_rules = 0
+    for rule in rules:
+        ports = _rule_ports(rule)
+        input_port_rules += len(ports)
+        key = (
+            str(rule.get('source', '*')).strip(),
+            str(rule.get('destination', '*')).strip(),
+            str(rule.get('protocol', 'TCP')).strip().upper(),
+            str(rule.get('action', 'Allow')).strip().capitalize(),
+        )
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'name': rule.get('name', 'default-rule'), 'intervals': []}
+        group['intervals'].extend(parse_port(port) for port in ports)
+
+    compacted = []
+    for (source, destination, protocol, action), group in groups.items():
+        compacted.append({
+            'name': group['name'],
+            'source': source,
+            'destination': destination,
+            'protocol': protocol,
+            'action': action,
+            'port_ranges': merge_port_intervals(group['intervals']),
+        })
+
+    stats = {
+        'input_rules': len(rules),
+        'input_port_rules': input_port_rules,
+        'output_rules': len(compacted),
+        'output_port_ranges': sum(len(rule['port_ranges']) for rule in compacted),
+    }
+    return compacted, stats
+
+
+def print_compaction_report(stats):
+    """Prints the before/after counts returned by compact_firewall_rules."""
+    print("Firewall rule compaction:")
+    print(f"  Before: {stats['input_rules']} rules ({stats['input_port_rules']} per-port rules)")
+    print(f"  After:  {stats['output_rules']} rules ({stats['output_port_ranges']} port ranges)")
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    example_rules = [
+        {'name': 'allow-web', 'ports': [80, 443, 81, 82], 'protocol': 'TCP', 'source': 'Internet', 'destination': 'frontend-subnet'},
+        {'name': 'allow-web-alt', 'ports': ['8000-8080', 8081], 'protocol': 'tcp', 'source': 'Internet', 'destination': 'frontend-subnet'},
+        {'name': 'allow-web', 'ports': [80, 443, 81, 82], 'protocol': 'TCP', 'source': 'Internet', 'destination': 'frontend-subnet'},
+        {'name': 'allow-backend', 'ports': [8080], 'protocol': 'TCP', 'source': 'frontend-subnet', 'destination': 'backend-subnet'},
+    ]
+    compacted_rules, compaction_stats = compact_firewall_rules(example_rules)
+    for compacted_rule in compacted_rules:
+        print(compacted_rule['name'], [format_port_range(r) for r in compacted_rule['port_ranges']])
+    print_compaction_report(compaction_stats)
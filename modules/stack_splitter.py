@@ -0,0 +1,315 @@
+import json
+import re
+
+# CloudFormation limits
+MAX_TEMPLATE_BODY_BYTES = 51200
+MAX_TEMPLATE_URL_BYTES = 1024 * 1024
+MAX_RESOURCES_PER_TEMPLATE = 500
+# Child stacks are kept smaller than the hard limits so that large networks are
+# spread over several stacks, which CloudFormation creates in parallel.
+DEFAULT_MAX_CHILD_RESOURCES = 200
+DEFAULT_MAX_CHILD_BYTES = 512 * 1024
+NESTED_STACK_PREFIX = "NestedStack"
+# Resources the rest of the network refers to; they stay in the parent stack.
+PARENT_RESOURCE_TYPES = {
+    'AWS::EC2::VPC',
+    'AWS::EC2::InternetGateway',
+    'AWS::EC2::VPCGatewayAttachment',
+    'AWS::EC2::SecurityGroup',
+}
+# Resources that refer to subnets all over the network (a load balancer spans
+# every frontend subnet). They stay in the parent, together with everything
+# that refers to them (listeners), and read the subnet IDs from the child
+# stacks' Outputs, so the subnets can still be spread over many child stacks.
+CONSUMER_RESOURCE_TYPES = {
+    'AWS::ElasticLoadBalancingV2::LoadBalancer',
+    'AWS::ElasticLoadBalancing::LoadBalancer',
+}
+
+
+def template_size(template):
+    """Returns the size in bytes of a template as it is sent to CloudFormation."""
+    return len(json.dumps(template).encode())
+
+
+def needs_splitting(template, max_bytes=MAX_TEMPLATE_URL_BYTES, max_resources=MAX_RESOURCES_PER_TEMPLATE):
+    """
+    Checks whether a template is too large to deploy as a single stack.
+
+    Templates over the inline body limit but within max_bytes do not need to be
+    split; they only need to be uploaded and passed as a TemplateURL.
+    """
+    return len(template.get('Resources', {})) > max_resources or template_size(template) > max_bytes
+
+
+def _split_getatt(value):
+    if isinstance(value, list) and len(value) == 2:
+        return value[0], value[1]
+    target, _, attribute = str(value).partition('.')
+    return target, attribute
+
+
+def _collect_references(value, references):
+    if isinstance(value, dict):
+        if isinstance(value.get('Ref'), str):
+            references.add(value['Ref'])
+        if 'Fn::GetAtt' in value:
+            references.add(_split_getatt(value['Fn::GetAtt'])[0])
+        for child in value.values():
+            _collect_references(child, references)
+    elif isinstance(value, list):
+        for child in value:
+            _collect_references(child, references)
+
+
+def _resource_references(resource):
+    """Returns the logical IDs a resource refers to through Ref, Fn::GetAtt and DependsOn."""
+    references = set()
+    _collect_references({k: v for k, v in resource.items() if k != 'DependsOn'}, references)
+    depends_on = resource.get('DependsOn', [])
+    references.update([depends_on] if isinstance(depends_on, str) else depends_on)
+    return references
+
+
+def _rewrite_references(value, replace):
+    """
+    Returns a copy of 'value' with its Ref and Fn::GetAtt expressions rewritten.
+
+    replace(logical_id, attribute) is called for every reference (attribute is
+    None for a Ref) and returns the replacement expression, or None to keep it.
+    """
+    if isinstance(value, dict):
+        if len(value) == 1 and isinstance(value.get('Ref'), str):
+            replacement = replace(value['Ref'], None)
+            if replacement is not None:
+                return replacement
+        if len(value) == 1 and 'Fn::GetAtt' in value:
+            replacement = replace(*_split_getatt(value['Fn::GetAtt']))
+            if replacement is not None:
+                return replacement
+        return {key: _rewrite_references(child, replace) for key, child in value.items()}
+    if isinstance(value, list):
+        return [_rewrite_references(child, replace) for child in value]
+    return value
+
+
+def _reference_name(logical_id, attribute):
+    """Names the parameter or output that carries a reference across stacks."""
+    return logical_id if attribute is None else re.sub(r'[^A-Za-z0-9]', '', f"{logical_id}{attribute}")
+
+
+def _partition_resources(resources, references, parent_ids, max_resources, max_bytes):
+    """
+    Groups the non-parent resources into child stacks.
+
+    Resources that refer to each other end up in the same group (union-find over
+    the reference graph), so child stacks never refer to each other. Groups are
+    then packed into child stacks in template order, so appending subnets to a
+    network only changes the last child stack.
+    """
+    leader = {}
+
+    def find(logical_id):
+        while leader[logical_id] != logical_id:
+            leader[logical_id] = leader[leader[logical_id]]
+            logical_id = leader[logical_id]
+        return logical_id
+
+    child_ids = [logical_id for logical_id in resources if logical_id not in parent_ids]
+    for logical_id in child_ids:
+        leader[logical_id] = logical_id
+    for logical_id in child_ids:
+        for reference in references[logical_id]:
+            if reference in leader:
+                leader[find(reference)] = find(logical_id)
+
+    components = {}
+    for logical_id in child_ids:
+        components.setdefault(find(logical_id), []).append(logical_id)
+
+    groups = []
+    current, current_bytes = [], 0
+    for members in components.values():
+        size = sum(template_size(resources[logical_id]) for logical_id in members)
+        if len(members) > max_resources or size > max_bytes:
+            raise ValueError(f"Resources {members[:3]}... refer to each other and cannot be split into stacks "
+                             f"of at most {max_resources} resources and {max_bytes} bytes.")
+        if current and (len(current) + len(members) > max_resources or current_bytes + size > max_bytes):
+            groups.append(current)
+            current, current_bytes = [], 0
+        current.extend(members)
+        current_bytes += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def split_template(template, max_child_resources=DEFAULT_MAX_CHILD_RESOURCES, max_child_bytes=DEFAULT_MAX_CHILD_BYTES):
+    """
+    Splits a CloudFormation template into a parent stack and nested child stacks.
+
+    The shared network resources (PARENT_RESOURCE_TYPES and everything they
+    refer to) stay in the parent, and so do the consumers of many subnets
+    (CONSUMER_RESOURCE_TYPES, e.g. the load balancer, and everything that refers
+    to them, e.g. its listeners). The remaining resources are grouped so that
+    resources referring to each other share a child stack. References from a
+    child to the parent become child Parameters, and DependsOn on parent
+    resources moves to the AWS::CloudFormation::Stack resource. Consumers and
+    parent Outputs refer to child resources through child Outputs (a DependsOn
+    on a child resource becomes one on its nested stack). As child stacks never
+    refer to each other, CloudFormation creates them all in parallel, and the
+    consumers once the subnets they need exist.
+
+    The nested stack resources have no TemplateURL yet; upload the child
+    templates and fill it in with set_child_template_urls().
+
+    Args:
+        template (dict): The template, e.g. from generate_aws_cloudformation().
+        max_child_resources (int): Maximum number of resources per child stack.
+        max_child_bytes (int): Maximum serialized size of a child stack's resources.
+
+    Returns:
+        tuple: (parent template, dict of nested stack logical ID -> child template).
+
+    Raises:
+        ValueError: If the resources cannot be split within the limits.
+    """
+    resources = template.get('Resources', {})
+    parameters = template.get('Parameters', {})
+    references = {logical_id: _resource_references(resource) for logical_id, resource in resources.items()}
+
+    # The parent must never refer to a child resource, so it keeps everything its resources refer to.
+    parent_ids = {logical_id for logical_id, resource in resources.items() if resource.get('Type') in PARENT_RESOURCE_TYPES}
+    pending = list(parent_ids)
+    while pending:
+        for reference in references[pending.pop()]:
+            if reference in resources and reference not in parent_ids:
+                parent_ids.add(reference)
+                pending.append(reference)
+
+    # Consumers, and everything that (transitively) refers to them, are created in the parent after the children
+    referenced_by = {}
+    for logical_id, targets in references.items():
+        for reference in targets:
+            referenced_by.setdefault(reference, []).append(logical_id)
+    consumer_ids = {logical_id for logical_id, resource in resources.items()
+                    if resource.get('Type') in CONSUMER_RESOURCE_TYPES and logical_id not in parent_ids}
+    pending = list(consumer_ids)
+    while pending:
+        for referrer in referenced_by.get(pending.pop(), []):
+            if referrer not in consumer_ids and referrer not in parent_ids:
+                consumer_ids.add(referrer)
+                pending.append(referrer)
+
+    groups = _partition_resources(resources, references, parent_ids | consumer_ids, max_child_resources, max_child_bytes)
+
+    parent = {key: value for key, value in template.items() if key not in ('Resources', 'Outputs')}
+    parent['Resources'] = {logical_id: resource for logical_id, resource in resources.items() if logical_id in parent_ids}
+    child_of = {}
+    children = {}
+    nested_stacks = {}
+    for index, members in enumerate(groups, 1):
+        stack_id = f"{NESTED_STACK_PREFIX}{index}"
+        while stack_id in resources:
+            stack_id += "X"
+        child_parameters = {}
+        parameter_values = {}
+        depends_on = set()
+
+        def to_parameter(logical_id, attribute, members=frozenset(members), child_parameters=child_parameters,
+                         parameter_values=parameter_values):
+            if logical_id in members or (logical_id not in parent_ids and logical_id not in parameters):
+                return None  # Local reference or pseudo parameter such as AWS::Region
+            name = _reference_name(logical_id, attribute)
+            if logical_id in parameters:
+                child_parameters[name] = parameters[logical_id]
+            else:
+                child_parameters[name] = {'Type': 'String'}
+            parameter_values[name] = {'Ref': logical_id} if attribute is None else {'Fn::GetAtt': [logical_id, attribute]}
+            return {'Ref': name}
+
+        child_resources = {}
+        for logical_id in members:
+            resource = _rewrite_references(resources[logical_id], to_parameter)
+            resource_depends_on = resource.get('DependsOn')
+            if resource_depends_on is not None:
+                resource_depends_on = [resource_depends_on] if isinstance(resource_depends_on, str) else resource_depends_on
+                depends_on.update(d for d in resource_depends_on if d in parent_ids)
+                local = [d for d in resource_depends_on if d not in parent_ids]
+                if local:
+                    resource['DependsOn'] = local
+                else:
+                    del resource['DependsOn']
+            child_resources[logical_id] = resource
+            child_of[logical_id] = stack_id
+
+        child = {
+            'AWSTemplateFormatVersion': template.get('AWSTemplateFormatVersion', '2010-09-09'),
+            'Description': f"{template.get('Description', 'Nested stack')} ({stack_id})",
+        }
+        if child_parameters:
+            child['Parameters'] = child_parameters
+        child['Resources'] = child_resources
+        children[stack_id] = child
+
+        nested_stack = {'Type': 'AWS::CloudFormation::Stack', 'Properties': {'TemplateURL': None}}
+        if parameter_values:
+            nested_stack['Properties']['Parameters'] = parameter_values
+        if depends_on:
+            nested_stack['DependsOn'] = sorted(depends_on)
+        nested_stacks[stack_id] = nested_stack
+    parent['Resources'].update(nested_stacks)
+
+    def to_child_output(logical_id, attribute):
+        stack_id = child_of.get(logical_id)
+        if stack_id is None:
+            return None
+        name = _reference_name(logical_id, attribute)
+        value = {'Ref': logical_id} if attribute is None else {'Fn::GetAtt': [logical_id, attribute]}
+        children[stack_id].setdefault('Outputs', {})[name] = {'Value': value}
+        return {'Fn::GetAtt': [stack_id, f"Outputs.{name}"]}
+
+    for logical_id, resource in resources.items():
+        if logical_id not in consumer_ids:
+            continue
+        resource = _rewrite_references(resource, to_child_output)
+        resource_depends_on = resource.get('DependsOn')
+        if resource_depends_on is not None:
+            resource_depends_on = [resource_depends_on] if isinstance(resource_depends_on, str) else resource_depends_on
+            resource['DependsOn'] = list(dict.fromkeys(child_of.get(d, d) for d in resource_depends_on))
+        parent['Resources'][logical_id] = resource
+
+    if 'Outputs' in template:
+        parent['Outputs'] = _rewrite_references(template['Outputs'], to_child_output)
+
+    if len(parent['Resources']) > MAX_RESOURCES_PER_TEMPLATE:
+        raise ValueError(f"The parent stack still has {len(parent['Resources'])} resources "
+                         f"(limit {MAX_RESOURCES_PER_TEMPLATE}).")
+    return parent, children
+
+
+def set_child_template_urls(parent, template_urls):
+    """Fills in the TemplateURL of every nested stack from a dict of nested stack logical ID -> URL."""
+    for stack_id, url in template_urls.items():
+        parent['Resources'][stack_id]['Properties']['TemplateURL'] = url
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    from modules.aws_config_generator import generate_aws_cloudformation
+    from modules.yaml_generator import generate_generic_yaml
+
+    requirements = generate_generic_yaml()
+    requirements['network']['ip_address_space'] = '10.0.0.0/8'
+    requirements['network']['subnets'] = [
+        {'name': f'subnet-{i}', 'cidr': f'10.{i // 256}.{i % 256}.0/24', 'purpose': 'Frontend' if i < 2 else 'Backend'}
+        for i in range(1200)
+    ]
+    example_template = generate_aws_cloudformation(requirements)
+    print(f"Template: {len(example_template['Resources'])} resources, {template_size(example_template)} bytes, "
+          f"needs splitting: {needs_splitting(example_template)}")
+    example_parent, example_children = split_template(example_template)
+    print(f"Parent: {sorted(example_parent['Resources'])}")
+    for child_id, child_template in example_children.items():
+        print(f"{child_id}: {len(child_template['Resources'])} resources, {template_size(child_template)} bytes, "
+              f"parameters {sorted(child_template.get('Parameters', {}))}")
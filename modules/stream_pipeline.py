@@ -0,0 +1,112 @@
+import json
+import sys
+
+import yaml
+
+from modules.yaml_parser import SafeLoader, structure_errors
+from modules.providers import get_generator
+
+
+def iter_requirements_documents(stream):
+    """
+    Lazily yields the documents of a '---'-separated multi-document YAML stream.
+
+    The parser reads the stream incrementally, so only the current document is
+    held in memory. Empty documents are skipped.
+
+    Args:
+        stream: A readable text or binary file-like object (e.g. sys.stdin).
+
+    Yields:
+        tuple: (document index, parsed document)
+    """
+    for index, document in enumerate(yaml.load_all(stream, Loader=SafeLoader)):
+        if document is not None:
+            yield index, document
+
+
+def _application_name(document):
+    return document.get('application') if isinstance(document, dict) else None
+
+
+def iter_generated_templates(documents, provider='aws'):
+    """
+    Generates one record per requirements document.
+
+    Every record carries the document's index in the stream and its
+    application name, so consumers can match outputs to inputs. A valid
+    document gives {'index', 'application', 'template'}. An invalid document,
+    or one whose generation raises, gives {'index', 'application', 'error'}
+    instead and is also reported on stderr, so one bad entry does not stop
+    the rest of the stream.
+
+    Args:
+        documents: An iterable of (index, document) pairs.
+        provider (str): One of 'aws', 'azure' or 'gcp'.
+
+    Yields:
+        dict: One record per document.
+    """
+    generator = get_generator(provider)
+    for index, document in documents:
+        record = {'index': index, 'application': _application_name(document)}
+        try:
+            errors = structure_errors(document)
+            if errors:
+                record['error'] = "invalid requirements structure: " + "; ".join(errors)
+            else:
+                record['template'] = generator(document)
+        except Exception as e:
+            # A document the generator cannot handle is skipped like an invalid one
+            record['error'] = f"{type(e).__name__}: {e}"
+        if 'error' in record:
+            # Also report on stderr: stdout carries the NDJSON output here
+            print(f"Skipping document {index}: {record['error']}", file=sys.stderr)
+        yield record
+
+
+def ndjson_line(record):
+    """Serializes a record as one compact JSON line."""
+    return json.dumps(record, separators=(',', ':'), default=str) + "\n"
+
+
+def iter_ndjson_lines(records):
+    """Serializes each record as one compact JSON line."""
+    for record in records:
+        yield ndjson_line(record)
+
+
+def run_stream(input_stream, output_stream, provider='aws'):
+    """
+    Pipes a multi-document requirements stream through the generator pipeline.
+
+    Every stage is a generator, so memory stays bounded by the size of a single
+    document no matter how many documents flow through. Each line is flushed as
+    soon as it is written so downstream consumers see templates immediately.
+    Every non-empty document gives one line (see iter_generated_templates),
+    with either its template or the error that stopped it.
+
+    Args:
+        input_stream: A readable file-like object with '---'-separated YAML documents.
+        output_stream: A writable text file-like object that receives the NDJSON lines.
+        provider (str): One of 'aws', 'azure' or 'gcp'.
+
+    Returns:
+        int: The number of templates written.
+    """
+    written = 0
+    documents = iter_requirements_documents(input_stream)
+    try:
+        for record in iter_generated_templates(documents, provider):
+            output_stream.write(ndjson_line(record))
+            output_stream.flush()
+            if 'template' in record:
+                written += 1
+    except yaml.YAMLError as e:
+        print(f"Error parsing YAML stream after {written} templates: {e}", file=sys.stderr)
+    return written
+
+
+if __name__ == '__main__':
+    # Example usage for testing: cat apps.yaml | python -m modules.stream_pipeline aws
+    run_stream(sys.stdin, sys.stdout, provider=sys.argv[1] if len(sys.argv) > 1 else 'aws')
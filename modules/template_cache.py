@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from modules.output_settings import DEFAULT_CACHE_DIR
+
+# Bump when the shape of the generated templates changes in a way the
+# generator source fingerprint below would not catch (e.g. a dependency upgrade).
+GENERATOR_VERSION = "1"
+# The cache directory is shared with the parse cache, the diagram renderings and
+# the geolocation cache; templates live in their own subdirectory so the size
+# budget and LRU eviction only ever see template entries.
+TEMPLATE_CACHE_SUBDIR = "templates"
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# After eviction the cache is trimmed to this fraction of max_bytes so that
+# a full cache does not rescan the directory on every single write.
+EVICTION_LOW_WATER_MARK = 0.9
+
+_fingerprints = {}
+
+
+def generator_fingerprint(generator):
+    """
+    Returns a version string for a generator function.
+
+    The string combines GENERATOR_VERSION with a hash of every Python source
+    file in the directory of the module that defines the generator (the
+    modules/ package). Generators reach helpers indirectly and import some
+    lazily, so hashing the whole package is the only way to be sure that
+    editing any helper, however deep (e.g. the rule compactor behind the
+    network model), invalidates the cached templates.
+
+    Args:
+        generator (callable): A template generator such as generate_aws_cloudformation.
+
+    Returns:
+        str: The fingerprint of the generator.
+    """
+    module_name = generator.__module__
+    if module_name not in _fingerprints:
+        source_file = getattr(sys.modules.get(module_name), '__file__', None)
+        digest = hashlib.sha256()
+        if source_file:
+            package_dir = os.path.dirname(os.path.abspath(source_file))
+            for name in sorted(os.listdir(package_dir)):
+                if name.endswith('.py'):
+                    digest.update(f"\0{name}\0".encode())
+                    with open(os.path.join(package_dir, name), 'rb') as f:
+                        digest.update(f.read())
+        _fingerprints[module_name] = f"{GENERATOR_VERSION}-{digest.hexdigest()[:16]}"
+    return _fingerprints[module_name]
+
+
+def requirements_hash(requirements, generator):
+    """
+    Computes the cache key for a parsed requirements dict and a generator.
+
+    The requirements are serialized canonically (sorted keys, no whitespace), so
+    two files that differ only in key order or formatting share a cache entry.
+
+    Args:
+        requirements (dict): The parsed network requirements.
+        generator (callable): The generator that will produce the template.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    canonical = json.dumps(requirements, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256()
+    digest.update(f"{generator.__module__}.{generator.__name__}:{generator_fingerprint(generator)}\n".encode())
+    digest.update(canonical.encode())
+    return digest.hexdigest()
+
+
+class TemplateCache:
+    """
+    A size-bounded, content-addressed on-disk cache of serialized templates.
+
+    Entries are stored as '<cache_dir>/templates/<key[:2]>/<key>'. Every hit refreshes the
+    entry's modification time, and when the cache grows beyond max_bytes the
+    least recently used entries are deleted first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.template_dir = os.path.join(cache_dir, TEMPLATE_CACHE_SUBDIR)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # Computed lazily on the first write
+
+    def _entry_path(self, key):
+        return os.path.join(self.template_dir, key[:2], key)
+
+    def get(self, key):
+        """Returns the cached content for 'key', or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r') as f:
+                content = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for LRU eviction
+        except OSError:
+            pass
+        self.hits += 1
+        return content
+
+    def put(self, key, content):
+        """Stores 'content' under 'key', evicting old entries if the cache is full."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += len(content.encode())
+        if self._size > self.max_bytes:
+            self.prune()
+
+    def get_or_generate(self, requirements, generator, serializer, model=None):
+        """
+        Returns the serialized template for 'requirements', generating it on a miss.
+
+        On a hit neither the generator nor the serializer is called.
+
+        Args:
+            requirements (dict): The parsed network requirements (used for the key).
+            generator (callable): Builds the template dict from the requirements.
+            serializer (callable): Turns the template dict into a string.
+            model (NetworkModel): Optional prebuilt model of 'requirements' to
+                pass to the generator instead of the raw dict.
+
+        Returns:
+            str: The serialized template.
+        """
+        key = requirements_hash(requirements, generator)
+        content = self.get(key)
+        if content is None:
+            content = serializer(generator(model if model is not None else requirements))
+            self.put(key, content)
+        return content
+
+    def _entries(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.template_dir):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _mtime, size, _path in self._entries())
+
+    def prune(self):
+        """Deletes the least recently used entries until the cache fits its budget."""
+        entries = sorted(self._entries())
+        total = sum(size for _mtime, size, _path in entries)
+        target = self.max_bytes * EVICTION_LOW_WATER_MARK
+        for _mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._size = total
+
+    def stats(self):
+        """Returns the hit and miss counters of this cache instance."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    from modules.aws_config_generator import generate_aws_cloudformation
+    from modules.yaml_generator import generate_generic_yaml
+
+    cache = TemplateCache()
+    requirements = generate_generic_yaml()
+    for _ in range(3):
+        cache.get_or_generate(requirements, generate_aws_cloudformation, lambda t: json.dumps(t, indent=2))
+    print(cache.stats())
@@ -0,0 +1,129 @@
+import hashlib
+import json
+
+
+def subtree_hash(value):
+    """
+    Computes a structural hash of a JSON-like value.
+
+    Dicts hash their sorted (key, child hash) pairs and lists their ordered
+    child hashes, so two values hash the same exactly when they are
+    structurally equal, regardless of dict key order.
+
+    Args:
+        value: A dict, list or JSON scalar.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    if isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=str):
+            digest.update(json.dumps(str(key)).encode())
+            digest.update(subtree_hash(value[key]).encode())
+        digest.update(b'}')
+    elif isinstance(value, list):
+        digest.update(b'[')
+        for item in value:
+            digest.update(subtree_hash(item).encode())
+        digest.update(b']')
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def changed_paths(old, new, path=''):
+    """
+    Lists the paths at which two JSON-like values differ.
+
+    Only subtrees whose hashes differ are descended into, so unchanged parts of
+    large resources are skipped after a single hash comparison.
+
+    Returns:
+        list: Paths such as 'Properties.CidrBlock' or 'Properties.Tags[0].Value'.
+    """
+    if subtree_hash(old) == subtree_hash(new):
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        paths = []
+        for key in sorted(set(old) | set(new), key=str):
+            child_path = f"{path}.{key}" if path else str(key)
+            if key not in old or key not in new:
+                paths.append(child_path)
+            else:
+                paths.extend(changed_paths(old[key], new[key], child_path))
+        return paths
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        paths = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            paths.extend(changed_paths(old_item, new_item, f"{path}[{index}]"))
+        return paths
+    return [path or '<root>']
+
+
+def diff_templates(old_template, new_template, resources_key='Resources'):
+    """
+    Structurally diffs two templates resource by resource.
+
+    Each resource is reduced to one subtree hash, so unchanged resources cost a
+    single comparison. The other top-level sections (Outputs, Parameters, ...)
+    are compared as a whole.
+
+    Args:
+        old_template (dict): The deployed template, or None if nothing is deployed.
+        new_template (dict): The template about to be deployed.
+        resources_key (str): The key holding the resources dict.
+
+    Returns:
+        dict: 'added', 'removed' and 'modified' (logical ID -> changed paths)
+            resources, 'other_sections' that changed, and 'changed', which is
+            False only if the templates are structurally identical.
+    """
+    old_template = old_template or {}
+    old_resources = old_template.get(resources_key, {}) or {}
+    new_resources = new_template.get(resources_key, {}) or {}
+
+    added = sorted(set(new_resources) - set(old_resources))
+    removed = sorted(set(old_resources) - set(new_resources))
+    modified = {}
+    for logical_id in sorted(set(old_resources) & set(new_resources)):
+        old_resource, new_resource = old_resources[logical_id], new_resources[logical_id]
+        if subtree_hash(old_resource) != subtree_hash(new_resource):
+            modified[logical_id] = changed_paths(old_resource, new_resource)
+
+    other_sections = sorted(
+        key for key in (set(old_template) | set(new_template)) - {resources_key}
+        if subtree_hash(old_template.get(key)) != subtree_hash(new_template.get(key))
+    )
+    return {
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+        'other_sections': other_sections,
+        'changed': bool(added or removed or modified or other_sections),
+    }
+
+
+def print_template_diff(diff):
+    """Prints the result of diff_templates."""
+    if not diff['changed']:
+        print("No changes.")
+        return
+    for logical_id in diff['added']:
+        print(f"  + {logical_id}")
+    for logical_id in diff['removed']:
+        print(f"  - {logical_id}")
+    for logical_id, paths in diff['modified'].items():
+        print(f"  ~ {logical_id}: {', '.join(paths)}")
+    for section in diff['other_sections']:
+        print(f"  ~ [{section}]")
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    old = {'Resources': {'VPC': {'Type': 'AWS::EC2::VPC', 'Properties': {'CidrBlock': '10.0.0.0/16'}},
+                         'Old': {'Type': 'AWS::EC2::Subnet'}}}
+    new = {'Resources': {'VPC': {'Properties': {'CidrBlock': '10.1.0.0/16'}, 'Type': 'AWS::EC2::VPC'},
+                         'New': {'Type': 'AWS::EC2::Subnet'}}}
+    print_template_diff(diff_templates(old, new))
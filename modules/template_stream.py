@@ -0,0 +1,216 @@
+import json
+import os
+import tempfile
+
+import yaml
+
+from modules.output_settings import JSON_BACKENDS
+
+try:
+    import orjson  # Optional fast JSON backend
+except ImportError:
+    orjson = None
+
+# The C emitter writes the same YAML as the pure-Python one for the plain
+# dicts, lists and scalars of our templates, only faster.
+_YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+class LazyObject:
+    """
+    A JSON object / YAML mapping whose (key, value) pairs are produced while it is written.
+
+    Values may themselves be LazyObject or LazyArray; plain dicts and lists are
+    written in one piece. A LazyObject can only be written once.
+    """
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+    def __iter__(self):
+        return iter(self.pairs)
+
+
+class LazyArray:
+    """A JSON array / YAML sequence whose items are produced while it is written (once)."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def materialize(value):
+    """Converts LazyObject / LazyArray values (recursively) into plain dicts and lists."""
+    if isinstance(value, LazyObject):
+        return {key: materialize(item) for key, item in value}
+    if isinstance(value, LazyArray):
+        return [materialize(item) for item in value]
+    return value
+
+
+def get_json_dumps(backend='json', compact=False):
+    """
+    Returns a function serializing one value to a JSON string.
+
+    Args:
+        backend (str): 'json' (standard library), 'orjson' or 'auto' (orjson if installed).
+        compact (bool): No indentation or spaces instead of the indent=2 layout.
+
+    Raises:
+        ValueError: If the backend is unknown, or 'orjson' is requested but not installed.
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend '{backend}'. Expected one of: {', '.join(JSON_BACKENDS)}.")
+    if backend == 'orjson' and orjson is None:
+        raise ValueError("The 'orjson' JSON backend is not installed (pip install orjson).")
+    if backend != 'json' and orjson is not None:
+        option = 0 if compact else orjson.OPT_INDENT_2
+        return lambda value: orjson.dumps(value, option=option).decode()
+    if compact:
+        return lambda value: json.dumps(value, separators=(',', ':'))
+    return lambda value: json.dumps(value, indent=2)
+
+
+def _json_key(key):
+    if isinstance(key, str):
+        return json.dumps(key)
+    # Non-string keys are converted (or rejected with TypeError) exactly like json.dumps does it
+    return json.dumps({key: None})[1:-len(': null}')]
+
+
+def iter_json_chunks(value, dumps, compact=False, level=0):
+    """
+    Yields the JSON text of a value piece by piece.
+
+    LazyObject and LazyArray values are written one entry at a time; every other
+    value is serialized with a single dumps() call and re-indented to its
+    depth. With the default 'json' backend the result is identical to
+    json.dumps(materialize(value), indent=2) (or the compact separators),
+    including the conversion of None, bool and number keys to strings.
+
+    Raises:
+        TypeError: If a LazyObject key is not a str, int, float, bool or None.
+    """
+    if not isinstance(value, (LazyObject, LazyArray)):
+        text = dumps(value)
+        yield text if compact or level == 0 else text.replace('\n', '\n' + '  ' * level)
+        return
+    is_object = isinstance(value, LazyObject)
+    opening, closing = ('{', '}') if is_object else ('[', ']')
+    separator = ':' if compact else ': '
+    newline = '' if compact else '\n' + '  ' * (level + 1)
+    first = True
+    for entry in value:
+        yield (opening if first else ',') + newline
+        first = False
+        if is_object:
+            key, entry = entry
+            yield _json_key(key) + separator
+        yield from iter_json_chunks(entry, dumps, compact, level + 1)
+    yield opening + closing if first else ('' if compact else '\n' + '  ' * level) + closing
+
+
+def _dump_yaml(value):
+    return yaml.dump(value, Dumper=_YAML_DUMPER, indent=2)
+
+
+def _yaml_key(key):
+    return _dump_yaml({key: None})[:-len(' null\n')]  # 'key:', quoted the way yaml.dump quotes it
+
+
+def _dump_yaml_flow(value):
+    # One line per entry; only used for non-empty collections (scalars would get a document end marker)
+    return yaml.dump(value, Dumper=_YAML_DUMPER, default_flow_style=True, width=1 << 30)
+
+
+def _dump_yaml_entry(key, value, compact):
+    if compact and isinstance(value, (dict, list)) and value:
+        return f"{_yaml_key(key)} {_dump_yaml_flow(value)}"
+    return _dump_yaml({key: value})
+
+
+def _dump_yaml_item(value, compact):
+    if compact and isinstance(value, (dict, list)) and value:
+        return f"- {_dump_yaml_flow(value)}"
+    return _dump_yaml([value])
+
+
+def _indent_lines(text, pad):
+    return ''.join(pad + line for line in text.splitlines(True)) if pad else text
+
+
+def iter_yaml_chunks(value, compact=False, pad=''):
+    """
+    Yields the YAML text of a LazyObject piece by piece.
+
+    Mapping entries are written one at a time, LazyArray values one item at a
+    time (as block sequence items at the key's indentation, like yaml.dump).
+    yaml.dump sorts mapping keys, so the output only matches
+    yaml.dump(materialize(value), indent=2) if the pairs come in key order.
+    """
+    for key, item in value:
+        if isinstance(item, (LazyObject, LazyArray)):
+            empty = True
+            if isinstance(item, LazyObject):
+                chunks = iter_yaml_chunks(item, compact, pad + '  ')
+            else:
+                chunks = (_indent_lines(_dump_yaml_item(materialize(element), compact), pad) for element in item)
+            for chunk in chunks:
+                if empty:
+                    yield f"{pad}{_yaml_key(key)}\n"
+                    empty = False
+                yield chunk
+            if empty:
+                yield _indent_lines(_dump_yaml({key: {} if isinstance(item, LazyObject) else []}), pad)
+        else:
+            yield _indent_lines(_dump_yaml_entry(key, item, compact), pad)
+
+
+def write_template_stream(template, path, output_format='json', compact=False, json_backend='json'):
+    """
+    Writes a (lazy) template to a file incrementally and atomically.
+
+    Only one resource entry is held in serialized form at a time, so memory
+    stays flat however many resources the template's lazy containers produce.
+    The file is written to a temporary file first and renamed into place.
+
+    Args:
+        template: The template, typically with LazyObject/LazyArray containers
+            from one of the stream_* generator functions.
+        path (str): The output file.
+        output_format (str): 'json' or 'yaml'; YAML templates must be a LazyObject.
+        compact (bool): Write compact JSON (no indentation) or flow-style YAML entries.
+        json_backend (str): See get_json_dumps.
+    """
+    if output_format == 'json':
+        chunks = iter_json_chunks(template, get_json_dumps(json_backend, compact), compact)
+    elif output_format == 'yaml':
+        # yaml.dump sorts the keys of plain dicts
+        chunks = iter_yaml_chunks(template if isinstance(template, LazyObject) else LazyObject(sorted(template.items())), compact)
+    else:
+        raise ValueError(f"Unknown output format '{output_format}'. Expected 'json' or 'yaml'.")
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', buffering=1024 * 1024) as outfile:
+            for chunk in chunks:
+                outfile.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    import sys
+
+    example = LazyObject([
+        ('name', 'example'),
+        ('resources', LazyArray({'id': i, 'ports': [80, 443]} for i in range(3))),
+        ('empty', LazyArray([])),
+    ])
+    sys.stdout.writelines(iter_json_chunks(example, get_json_dumps()))
+    print()
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import time
+
+from modules.batch_compiler import DEFAULT_BATCH_OUTPUT_DIR, PROVIDER_OUTPUTS, write_output_atomically
+from modules.flow_diagram_generator import build_clustered_flow_graph, build_flow_graph, render_dot_source, to_dot_source
+from modules.network_model import build_network_model
+from modules.providers import PROVIDERS, get_generator_module
+from modules.output_settings import DEFAULT_CACHE_DIR
+from modules.yaml_parser import read_yaml_file, validate_yaml_structure
+
+DEFAULT_POLL_INTERVAL = 0.25
+# Requirement sections the flow diagram is drawn from; other edits never re-render it.
+DIAGRAM_SECTIONS = ('name', 'subnets', 'load_balancer', 'firewall')
+
+
+def requirements_sections(requirements):
+    """
+    Splits parsed requirements into the sections the generators depend on.
+
+    The top-level 'application', 'region' and 'type' keys and every key of the
+    'network' section (name, ip_address_space, subnets, firewall, load_balancer,
+    security, ...) each become one section.
+
+    Returns:
+        dict: Section name -> section value.
+    """
+    sections = {key: requirements.get(key) for key in ('application', 'region', 'type')}
+    network = requirements.get('network', {})
+    if isinstance(network, dict):
+        sections.update(network)
+    return sections
+
+
+def section_hashes(requirements):
+    """Returns a hash of the canonical JSON form of every section of the requirements."""
+    return {
+        name: hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+        for name, value in requirements_sections(requirements).items()
+    }
+
+
+class IncrementalGenerator:
+    """
+    Regenerates provider templates section by section.
+
+    Every provider's TEMPLATE_SECTIONS lists its section builders and the
+    requirement sections each one reads. update() diffs the new requirements
+    against the previous ones by section hash, reruns only the builders whose
+    inputs changed and reassembles the templates from the new and the kept
+    fragments, so e.g. editing a firewall rule rebuilds only the Azure NSG and
+    the GCP firewall rules.
+    """
+
+    def __init__(self, providers=PROVIDERS):
+        self.providers = tuple(providers)
+        self._hashes = None
+        self._fragments = {provider: {} for provider in self.providers}
+
+    def update(self, requirements):
+        """
+        Brings the templates up to date with new requirements.
+
+        Args:
+            requirements (dict): The new parsed (and validated) requirements.
+
+        Returns:
+            tuple: (templates, rebuilt, changed): provider -> template, provider ->
+                names of the rebuilt template sections, and the set of changed
+                requirement sections (every section on the first call).
+        """
+        hashes = section_hashes(requirements)
+        previous = self._hashes or {}
+        changed = {name for name in set(hashes) | set(previous) if hashes.get(name) != previous.get(name)}
+        model = build_network_model(requirements)
+
+        templates = {}
+        rebuilt = {}
+        for provider in self.providers:
+            module = get_generator_module(provider)
+            fragments = self._fragments[provider]
+            for section, builder, inputs in module.TEMPLATE_SECTIONS:
+                if section not in fragments or changed.intersection(inputs):
+                    fragments[section] = builder(model)
+                    rebuilt.setdefault(provider, []).append(section)
+            templates[provider] = module.assemble_template(model, [fragments[section] for section, _b, _i in module.TEMPLATE_SECTIONS])
+        self._hashes = hashes
+        return templates, rebuilt, changed
+
+
+def _file_signature(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def watch_requirements_file(filepath, output_dir=DEFAULT_BATCH_OUTPUT_DIR, visualize=False, clustered=False, max_nodes=None,
+                            diagram_path="network_flow.png", poll_interval=DEFAULT_POLL_INTERVAL, diagram_formats=('png',),
+                            open_viewer=False, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Regenerates the templates (and optionally the diagram) whenever a requirements file changes.
+
+    The file is polled for modification time and size changes. Each change is
+    parsed and validated (errors are printed and the previous outputs kept),
+    then only the affected template sections are regenerated, and only
+    templates whose content changed are rewritten to
+    '<output_dir>/<file stem>/'. The diagram is only rebuilt when a
+    topology-relevant section (DIAGRAM_SECTIONS) changed, and only re-rendered
+    if its DOT source is actually different.
+
+    Args:
+        filepath (str): The requirements file to watch.
+        output_dir (str): Root directory for the generated templates.
+        visualize (bool): Also keep the graphical diagram up to date.
+        clustered (bool): Draw the clustered diagram.
+        max_nodes (int): Node cap for the clustered diagram.
+        diagram_path (str): Path of the rendered diagram.
+        poll_interval (float): Seconds between file checks.
+        diagram_formats (tuple): Diagram formats to render (svg, png, pdf).
+        open_viewer (bool): Open the diagram in the system viewer after its first render.
+        cache_dir (str): Cache directory of the diagram renderings.
+    """
+    app_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(filepath))[0])
+    generator = IncrementalGenerator([provider for _filename, provider, _serializer in PROVIDER_OUTPUTS])
+    written = {}
+    dot_hash = None
+    last_signature = None
+
+    print(f"Watching '{filepath}' for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            signature = _file_signature(filepath)
+            if signature is not None and signature != last_signature:
+                last_signature = signature
+                start = time.perf_counter()
+                requirements = read_yaml_file(filepath)
+                if requirements is not None and validate_yaml_structure(requirements):
+                    try:
+                        templates, rebuilt, changed = generator.update(requirements)
+                    except ValueError as e:
+                        # A network no template can be generated for (e.g. over the Azure NSG rule limit)
+                        print(f"Error: {e}")
+                        time.sleep(poll_interval)
+                        continue
+
+                    os.makedirs(app_dir, exist_ok=True)
+                    rewritten = []
+                    for filename, provider, serializer in PROVIDER_OUTPUTS:
+                        content = serializer(templates[provider])
+                        if written.get(filename) != content:
+                            write_output_atomically(os.path.join(app_dir, filename), content)
+                            written[filename] = content
+                            rewritten.append(filename)
+
+                    diagram_status = "unchanged"
+                    if visualize and (dot_hash is None or changed.intersection(DIAGRAM_SECTIONS)):
+                        model = build_network_model(requirements)
+                        graph = build_clustered_flow_graph(model, max_nodes=max_nodes) if clustered else build_flow_graph(model)
+                        dot_source = to_dot_source(graph)
+                        new_hash = hashlib.sha256(dot_source.encode()).hexdigest()
+                        if new_hash != dot_hash:
+                            render_dot_source(dot_source, diagram_path, open_viewer and dot_hash is None, diagram_formats, cache_dir)
+                            dot_hash = new_hash
+                            diagram_status = "re-rendered"
+
+                    rebuilt_summary = "; ".join(f"{provider}: {', '.join(sections)}" for provider, sections in rebuilt.items()) or "nothing"
+                    print(f"[{time.strftime('%H:%M:%S')}] Changed sections: {', '.join(sorted(changed)) or 'none'}")
+                    print(f"  Rebuilt {rebuilt_summary}. Wrote {', '.join(rewritten) or 'no files'}."
+                          f"{f' Diagram {diagram_status}.' if visualize else ''} ({(time.perf_counter() - start) * 1000:.0f}ms)")
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+if __name__ == '__main__':
+    # Example usage for testing
+    watch_requirements_file('network_requirements.yaml')
@@ -1,10 +1,30 @@
-def generate_generic_yaml():
+import random
+
+SYNTHETIC_PURPOSES = ('Frontend', 'Backend', 'Database', 'Management')
+SYNTHETIC_PROTOCOLS = ('TCP', 'TCP', 'TCP', 'UDP')
+MAX_SYNTHETIC_SUBNETS = 65536  # /24 subnets that fit in 10.0.0.0/8
+
+def generate_generic_yaml(num_subnets=None, num_rules=None, num_listeners=None, seed=0):
     """
     Generates a generic YAML configuration for network requirements.
 
+    Without arguments this is the two-subnet starter configuration. With any
+    of num_subnets, num_rules or num_listeners it becomes a synthetic topology
+    of that size for benchmarks and scale tests (see generate_synthetic_topology).
+
+    Args:
+        num_subnets (int): Number of subnets of the synthetic topology.
+        num_rules (int): Number of firewall rules of the synthetic topology.
+        num_listeners (int): Number of load balancer listeners (enables the load balancer).
+        seed (int): Seed of the synthetic topology; the same arguments always give the same topology.
+
     Returns:
         dict: A dictionary representing the generic YAML configuration.
     """
+    if num_subnets is not None or num_rules is not None or num_listeners is not None:
+        return generate_synthetic_topology(num_subnets=2 if num_subnets is None else num_subnets,
+                                           num_rules=3 if num_rules is None else num_rules,
+                                           num_listeners=num_listeners, seed=seed)
     generic_config = {
         'application': 'YourAppName',
         'region': 'YourPreferredRegiyon',
@@ -83,9 +103,75 @@ def generate_generic_yaml():
     }
     return generic_config
 
+def generate_synthetic_topology(num_subnets, num_rules, num_listeners=None, seed=0):
+    """
+    Generates a valid synthetic network topology of a given size.
+
+    Subnets are consecutive /24 blocks of 10.0.0.0/8 with rotating purposes.
+    Firewall rules connect random subnets (every tenth rule comes from the
+    Internet) with one to three ports, some of them port ranges. The output
+    only depends on the arguments, so benchmark runs on different versions
+    measure the same input.
+
+    Args:
+        num_subnets (int): Number of subnets (1 to 65536).
+        num_rules (int): Number of firewall rules.
+        num_listeners (int): Number of load balancer listeners; None or 0 disables the load balancer.
+        seed (int): Seed of the random rule endpoints and ports.
+
+    Returns:
+        dict: The requirements, in the same shape as generate_generic_yaml().
+    """
+    if not 1 <= num_subnets <= MAX_SYNTHETIC_SUBNETS:
+        raise ValueError(f"num_subnets must be between 1 and {MAX_SYNTHETIC_SUBNETS}, got {num_subnets}.")
+    rng = random.Random(seed)
+    config = generate_generic_yaml()
+    network = config['network']
+    config['application'] = 'SyntheticApp'
+    config['region'] = 'eu-central-1'
+    network['name'] = f'synthetic-{num_subnets}-{num_rules}'
+    network['ip_address_space'] = '10.0.0.0/8'
+
+    network['subnets'] = [
+        {
+            'name': f'subnet-{i}',
+            'cidr': f'10.{i // 256}.{i % 256}.0/24',
+            'purpose': SYNTHETIC_PURPOSES[i % len(SYNTHETIC_PURPOSES)]
+        }
+        for i in range(num_subnets)
+    ]
+
+    rules = []
+    for i in range(num_rules):
+        ports = []
+        for _ in range(rng.randint(1, 3)):
+            port = rng.randrange(1, 65000)
+            ports.append(f'{port}-{port + rng.randrange(1, 100)}' if rng.random() < 0.1 else port)
+        rules.append({
+            'name': f'rule-{i}',
+            'ports': ports,
+            'protocol': rng.choice(SYNTHETIC_PROTOCOLS),
+            'source': 'Internet' if i % 10 == 0 else f'subnet-{rng.randrange(num_subnets)}',
+            'destination': f'subnet-{rng.randrange(num_subnets)}',
+            'action': 'Allow'
+        })
+    network['firewall']['rules'] = rules
+
+    load_balancer = network['load_balancer']
+    load_balancer['enabled'] = bool(num_listeners)
+    if num_listeners:
+        load_balancer['listeners'] = [
+            {'port': 80 if i == 0 else 8000 + i, 'protocol': 'HTTP' if i % 2 == 0 else 'HTTPS'}
+            for i in range(num_listeners)
+        ]
+    return config
+
 if __name__ == '__main__':
     # Example usage for testing
     generic_yaml = generate_generic_yaml()
     import yaml as pyyaml
     print("Generated Generic YAML:")
-    print(pyyaml.dump(generic_yaml, default_flow_style=False))
\ No newline at end of file
+    print(pyyaml.dump(generic_yaml, default_flow_style=False))
+    synthetic_yaml = generate_generic_yaml(num_subnets=4, num_rules=5, num_listeners=2, seed=1)
+    print("Generated Synthetic YAML:")
+    print(pyyaml.dump(synthetic_yaml, default_flow_style=False))
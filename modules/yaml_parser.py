@@ -1,43 +1,167 @@
+import hashlib
+import json
+import marshal
+import os
+import tempfile
+
 import yaml
 
-def read_yaml_file(filepath):
+from modules.cidr_validator import validate_network_cidrs
+from modules.network_model import validate_subnet_names
+from modules.rule_compactor import validate_firewall_ports
+
+# Use the libyaml C loader when PyYAML was built against it; it parses the
+# same safe subset of YAML as yaml.SafeLoader, only much faster.
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+PARSE_CACHE_SUBDIR = "parsed"
+# Entries are marshal data, which, unlike pickle, cannot run code when loaded,
+# so a planted file in a shared or cloned cache directory is harmless.
+PARSE_CACHE_FORMAT = b"netflow-parse-1\n"
+
+
+def _parse_cache_path(filepath, cache_dir):
+    path_hash = hashlib.sha256(os.path.abspath(filepath).encode()).hexdigest()
+    return os.path.join(cache_dir, PARSE_CACHE_SUBDIR, path_hash)
+
+
+def _read_parse_cache(cache_path, signature):
+    try:
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(PARSE_CACHE_FORMAT):
+            return None
+        cached_signature, content = marshal.loads(data[len(PARSE_CACHE_FORMAT):])
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return content if cached_signature == signature else None
+
+
+def _write_parse_cache(cache_path, signature, content):
+    try:
+        data = marshal.dumps((signature, content))
+    except ValueError:
+        return  # Content marshal cannot store (e.g. YAML timestamps) is simply not cached
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(PARSE_CACHE_FORMAT + data)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # The parse cache is an optimization only
+
+
+def load_requirements(filepath, cache_dir=None):
     """
-    Reads a YAML file and returns its content as a Python dictionary.
+    Loads a requirements file, accepting both YAML and JSON.
+
+    Files ending in '.json' are read with the json module, everything else with
+    the (C-accelerated when available) safe YAML loader. When cache_dir is set,
+    the parsed content is stored with marshal in '<cache_dir>/parsed/', keyed by
+    the absolute path, modification time and size of the file, so unchanged
+    files skip parsing entirely on the next load. Loading an entry never runs
+    code, whoever wrote the cache directory.
+
+    Args:
+        filepath (str): The path to the requirements file.
+        cache_dir (str): Optional cache directory.
+
+    Returns:
+        dict: The content of the file.
+
+    Raises:
+        OSError: If the file cannot be read.
+        yaml.YAMLError, json.JSONDecodeError: If the file cannot be parsed.
+    """
+    signature = None
+    cache_path = None
+    if cache_dir:
+        stat = os.stat(filepath)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cache_path = _parse_cache_path(filepath, cache_dir)
+        content = _read_parse_cache(cache_path, signature)
+        if content is not None:
+            return content
+
+    with open(filepath, 'rb') as file:
+        if filepath.lower().endswith('.json'):
+            content = json.load(file)
+        else:
+            content = yaml.load(file, Loader=SafeLoader)
+
+    if cache_path is not None:
+        _write_parse_cache(cache_path, signature, content)
+    return content
+
+
+def read_yaml_file(filepath, cache_dir=None):
+    """
+    Reads a YAML (or JSON) file and returns its content as a Python dictionary.
 
     Args:
         filepath (str): The path to the YAML file.
+        cache_dir (str): Optional parse cache directory (see load_requirements).
 
     Returns:
         dict: The content of the YAML file, or None if an error occurs.
     """
     try:
-        with open(filepath, 'r') as file:
-            yaml_content = yaml.safe_load(file)
-        return yaml_content
+        return load_requirements(filepath, cache_dir=cache_dir)
     except FileNotFoundError:
         print(f"Error: File not found at {filepath}")
         return None
     except yaml.YAMLError as e:
         print(f"Error parsing YAML file {filepath}: {e}")
         return None
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON file {filepath}: {e}")
+        return None
+
+def structure_errors(yaml_data):
+    """
+    Returns every structural problem of the parsed YAML data, without printing.
+
+    Besides the top-level keys, the subnet CIDRs are checked for validity,
+    overlaps and containment in ip_address_space (see cidr_validator), subnet
+    names must stay unique once sanitized (see
+    network_model.validate_subnet_names), and the firewall rule ports must be
+    parseable (see rule_compactor.parse_port).
+
+    Args:
+        yaml_data (dict): The parsed YAML content.
+
+    Returns:
+        list: The error messages; empty if the structure is valid.
+    """
+    if not isinstance(yaml_data, dict):
+        return ["The YAML file should contain a top-level dictionary."]
+    if 'application' not in yaml_data or 'network' not in yaml_data:
+        return ["The YAML file should contain 'application' and 'network' sections."]
+    if isinstance(yaml_data['network'], dict):
+        network = yaml_data['network']
+        return validate_network_cidrs(network) + validate_subnet_names(network) + validate_firewall_ports(network)
+    return []
 
 def validate_yaml_structure(yaml_data):
     """
     Validates the basic structure of the parsed YAML data.
 
+    Every violation found by structure_errors() is printed.
+
     Args:
         yaml_data (dict): The parsed YAML content.
 
     Returns:
         bool: True if the basic structure is valid, False otherwise.
     """
-    if not isinstance(yaml_data, dict):
-        print("Error: The YAML file should contain a top-level dictionary.")
-        return False
-    if 'application' not in yaml_data or 'network' not in yaml_data:
-        print("Error: The YAML file should contain 'application' and 'network' sections.")
-        return False
-    return True
+    errors = structure_errors(yaml_data)
+    for error in errors:
+        print(f"Error: {error}")
+    return not errors
 
 if __name__ == '__main__':
     # Example usage for testing
@@ -1,62 +1,266 @@
 import argparse
-import yaml
 import json
 import os
-import requests
-from modules.flow_diagram_generator import generate_graphical_flow_diagram, generate_textual_flow_diagram
-from modules.aws_config_generator import generate_aws_cloudformation
-import cloud_deployer  # Import the new module
+import sys
+import time
+# Only lightweight modules are imported here. requests, boto3 (cloud_deployer),
+# graphviz and the provider generators are imported on the code paths that use
+# them, so the default text-only run starts fast (see benchmarks/bench_startup.py).
+from modules.flow_diagram_generator import write_textual_flow_diagram
+from modules.deploy_settings import DEFAULT_API_CALLS_PER_SECOND, DEFAULT_FANOUT_WORKERS, DEFAULT_STACK_NAME
+from modules.profiling import (disable_profiling, enable_profiling, print_profile_report, profile_stage, write_json_report,
+                               write_prometheus_textfile)
+from modules.providers import get_generator, parse_provider_list
+from modules.output_settings import DEFAULT_BATCH_OUTPUT_DIR, DEFAULT_CACHE_DIR, JSON_BACKENDS, OUTPUT_CLOUDFORMATION_FILE
+from modules.yaml_parser import read_yaml_file, validate_yaml_structure
+from modules.network_model import build_network_model
 
 DEFAULT_REQUIREMENTS_FILE = "network_requirements.yaml"
-OUTPUT_CLOUDFORMATION_FILE = "output.json"
-SUGGESTED_AWS_REGION_EUROPE = "eu-central-1"
 
-def get_approximate_location():
+def provider_list(value):
+    """argparse type of --provider: 'all' or a comma-separated list of providers."""
     try:
-        response = requests.get("https://ipinfo.io/json", timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        country = data.get("country")
-        return country
-    except requests.exceptions.RequestException:
-        return None
+        return parse_provider_list(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def format_list(value):
+    """argparse type of --formats: a comma-separated list of svg, png and pdf."""
+    from modules.diagram_render import parse_format_list  # Pulls in asyncio; only needed for rendering
+
+    try:
+        return parse_format_list(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def generate_all_providers(yaml_data, requirements_file, args):
+    """Generates and writes the templates of every provider selected with --provider."""
+    from modules.batch_compiler import generate_providers
+
+    app_dir = os.path.join(args.output_dir, os.path.splitext(os.path.basename(requirements_file))[0])
+    start = time.perf_counter()
+    with profile_stage('generate_providers'):
+        results = generate_providers(yaml_data, args.provider, app_dir, compact=args.compact, json_backend=args.json_backend)
+    for result in results:
+        if result['ok']:
+            print(f"Generated {result['provider']} template saved to '{result['output']}' ({result['seconds'] * 1000:.0f}ms).")
+        else:
+            print(f"Error generating the {result['provider']} template: {result['error']}")
+    print(f"Generated {sum(1 for r in results if r['ok'])}/{len(results)} templates in {(time.perf_counter() - start) * 1000:.0f}ms.")
+
+def load_deploy_targets(args):
+    """Builds the fan-out target list from --regions and/or the --targets file."""
+    targets = []
+    if args.targets:
+        targets_data = read_yaml_file(args.targets)
+        if isinstance(targets_data, dict):
+            targets_data = targets_data.get('targets', [])
+        targets.extend(t if isinstance(t, dict) else {'region': t} for t in targets_data or [])
+    if args.regions:
+        targets.extend({'region': region.strip()} for region in args.regions.split(',') if region.strip())
+    return targets
+
+def deploy_fanout(model, args):
+    """Generates the AWS template once and deploys it to every target concurrently."""
+    import cloud_deployer
+
+    targets = load_deploy_targets(args)
+    if not targets:
+        print("Error: No deployment targets specified.")
+        return
+    with profile_stage('generate_aws'):
+        cloudformation_template = get_generator('aws')(model)
+    with profile_stage('write_template'), open(OUTPUT_CLOUDFORMATION_FILE, 'w') as outfile:
+        json.dump(cloudformation_template, outfile, indent=2)
+    print(f"Generated AWS CloudFormation Template saved to '{OUTPUT_CLOUDFORMATION_FILE}'.")
+
+    print(f"\nDeploying stack '{args.stack_name}' to {len(targets)} targets (up to {args.max_parallel} at a time)...")
+    start = time.monotonic()
+    with profile_stage('deploy'):
+        results = cloud_deployer.deploy_to_targets(cloudformation_template, targets, stack_name=args.stack_name, wait=args.wait,
+                                                   max_workers=args.max_parallel, calls_per_second=args.api_rate, plan=args.plan,
+                                                   artifact_bucket=args.artifact_bucket)
+    cloud_deployer.print_fanout_report(results, elapsed=time.monotonic() - start)
 
 def main():
     parser = argparse.ArgumentParser(description="Generate network flow diagrams and configurations.")
     parser.add_argument("--visualize", action="store_true", help="Generate a graphical network flow diagram.")
+    parser.add_argument("--cluster", action="store_true", help="With --visualize, group subnets by purpose and collapse parallel firewall edges.")
+    parser.add_argument("--max-nodes", type=int, default=None, help="With --cluster, cap the number of rendered nodes by collapsing the largest clusters.")
+    parser.add_argument("--drilldown", action="store_true", help="With --cluster, also render one diagram per purpose cluster.")
+    parser.add_argument("--formats", type=format_list, default=('png',), help="With --visualize, the comma-separated diagram formats to render concurrently (svg, png, pdf).")
+    parser.add_argument("--open", action="store_true", help="With --visualize, open the diagram in the system viewer.")
+    parser.add_argument("--limit", type=int, default=None, help="Show at most this many firewall rules (or rule groups) in the textual flow.")
+    parser.add_argument("--offset", type=int, default=0, help="Skip this many firewall rules (or rule groups) in the textual flow.")
+    parser.add_argument("--group-rules", action="store_true", help="Group firewall rules by source/destination pair in the textual flow.")
+    parser.add_argument("--compaction-report", action="store_true", help="Print the firewall rule counts before and after compaction.")
+    parser.add_argument("--dependency-report", action="store_true", help="Print the dependsOn edges and critical-path depth of the Azure deployment.")
     parser.add_argument("--apply", action="store_true", help="Apply the generated configuration to a cloud provider.")
-    parser.add_argument("requirements", nargs='?', default=DEFAULT_REQUIREMENTS_FILE, help="Path to the YAML requirements file.")
+    parser.add_argument("--offline", action="store_true", help="With --apply, never contact the geolocation service for the region suggestion (or set NETFLOW_OFFLINE=1).")
+    parser.add_argument("--wait", action="store_true", help="With --apply, track the deployment to completion and report per-resource timings.")
+    parser.add_argument("--plan", action="store_true", help="With --apply or fan-out deployment, diff against the deployed stack and deploy through a change set, skipping unchanged stacks.")
+    parser.add_argument("--artifact-bucket", help="S3 bucket for templates too large to deploy inline; oversized templates are split into nested stacks uploaded there.")
+    parser.add_argument("--stack-name", default=DEFAULT_STACK_NAME, help="Name of the CloudFormation stack to create or update.")
+    parser.add_argument("--regions", help="Non-interactively deploy the AWS template to these comma-separated regions concurrently.")
+    parser.add_argument("--targets", help="YAML/JSON file listing deployment targets (region, optional profile and stack_name) to deploy to concurrently.")
+    parser.add_argument("--max-parallel", type=int, default=DEFAULT_FANOUT_WORKERS, help="Maximum number of targets deployed at the same time.")
+    parser.add_argument("--api-rate", type=float, default=DEFAULT_API_CALLS_PER_SECOND, help="CloudFormation API calls per second allowed per account and region.")
+    parser.add_argument("--batch", metavar="SOURCE", help="Non-interactively compile every requirements file in a directory or glob pattern.")
+    parser.add_argument("--output-dir", default=DEFAULT_BATCH_OUTPUT_DIR, help="Root directory for per-application outputs in batch mode.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes in batch mode (default: CPU count).")
+    parser.add_argument("--cache", action="store_true", help="Reuse parsed requirements and (in batch mode) templates for unchanged inputs.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the parse, template and diagram caches.")
+    parser.add_argument("--cache-max-mb", type=int, default=256, help="Size budget of the template cache in megabytes.")
+    parser.add_argument("--watch", action="store_true", help="Regenerate the templates in --output-dir (and the diagram with --visualize) whenever the requirements file changes.")
+    parser.add_argument("--compact", action="store_true", help="With --provider, write compact JSON and one-line YAML entries instead of indented output.")
+    parser.add_argument("--json-backend", choices=JSON_BACKENDS, default="json", help="With --provider, the JSON encoder: the standard library, orjson, or orjson when installed (auto).")
+    parser.add_argument("--stream", action="store_true", help="Read a multi-document YAML stream (stdin or '-' by default) and write one template per line as NDJSON to stdout.")
+    parser.add_argument("--provider", type=provider_list, default=None, help="Non-interactively write the templates of these providers ('all' or a comma-separated list of aws, azure, gcp) to --output-dir, generating them concurrently. In stream mode, the single provider to generate for (default: aws).")
+    parser.add_argument("--serve", action="store_true", help="Run a local HTTP server that generates templates and diagrams for posted requirements.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the server listens on.")
+    parser.add_argument("--port", type=int, default=8787, help="TCP port the server listens on.")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of --host/--port.")
+    parser.add_argument("--profile", action="store_true", help="Print wall time and CPU time per pipeline stage.")
+    parser.add_argument("--profile-memory", action="store_true", help="Also trace peak memory per stage with tracemalloc (implies --profile). Tracing slows allocation-heavy stages down, so the timings are less accurate.")
+    parser.add_argument("--profile-json", metavar="PATH", help="Write the stage profile as JSON to this file (implies --profile).")
+    parser.add_argument("--profile-prometheus", metavar="PATH", help="Write the stage profile as a Prometheus textfile (e.g. for the node exporter textfile collector; implies --profile).")
+    parser.add_argument("requirements", nargs='?', default=None, help=f"Path to the YAML (or JSON) requirements file (default: {DEFAULT_REQUIREMENTS_FILE}).")
     args = parser.parse_args()
 
-    requirements_file = args.requirements
+    profiler = None
+    if args.profile or args.profile_memory or args.profile_json or args.profile_prometheus:
+        profiler = enable_profiling(trace_memory=args.profile_memory)
+    try:
+        run(args)
+    finally:
+        if profiler is not None:
+            disable_profiling()
+            print_profile_report(profiler)
+            if args.profile_json:
+                write_json_report(profiler, args.profile_json)
+                print(f"Stage profile saved to '{args.profile_json}'.")
+            if args.profile_prometheus:
+                write_prometheus_textfile(profiler, args.profile_prometheus)
+                print(f"Stage metrics saved to '{args.profile_prometheus}'.")
+
+def run(args):
+    """Runs the mode selected by the parsed command line arguments."""
+    if args.serve:
+        from modules.generation_server import run_server
+
+        run_server(host=args.host, port=args.port, socket_path=args.socket)
+        return
+
+    if args.stream:
+        from modules.stream_pipeline import run_stream
+
+        if args.provider and len(args.provider) > 1:
+            print("Error: Stream mode generates templates for a single provider.")
+            return
+        provider = args.provider[0] if args.provider else 'aws'
+
+        with profile_stage('stream'):
+            if args.requirements in (None, '-'):
+                run_stream(sys.stdin, sys.stdout, provider=provider)
+            else:
+                with open(args.requirements, 'rb') as input_stream:
+                    run_stream(input_stream, sys.stdout, provider=provider)
+        return
+
+    if args.batch:
+        from modules.batch_compiler import run_batch
+
+        with profile_stage('batch'):
+            run_batch(args.batch, output_dir=args.output_dir, workers=args.workers,
+                      cache_dir=args.cache_dir if args.cache else None, cache_max_bytes=args.cache_max_mb * 1024 * 1024)
+        return
+
+    if args.watch:
+        from modules.watch_mode import watch_requirements_file
+
+        watch_requirements_file(args.requirements or DEFAULT_REQUIREMENTS_FILE, output_dir=args.output_dir,
+                                visualize=args.visualize, clustered=args.cluster, max_nodes=args.max_nodes,
+                                diagram_formats=args.formats, open_viewer=args.open, cache_dir=args.cache_dir)
+        return
+
+    location_lookup = None
+    if args.apply:
+        from modules.geolocation import LocationLookup
+
+        # Look the location up in the background while the templates are generated
+        location_lookup = LocationLookup(cache_dir=args.cache_dir, offline=args.offline)
+
+    requirements_file = args.requirements or DEFAULT_REQUIREMENTS_FILE
 
     if not os.path.exists(requirements_file):
         print(f"Error: Requirements file '{requirements_file}' not found.")
         return
 
-    with open(requirements_file, 'r') as f:
-        yaml_data = yaml.safe_load(f)
+    with profile_stage('read_requirements'):
+        yaml_data = read_yaml_file(requirements_file, cache_dir=args.cache_dir if args.cache else None)
+    if yaml_data is None:
+        return
+    with profile_stage('validate'):
+        valid = validate_yaml_structure(yaml_data)
+    if not valid:
+        return
+
+    # Normalize once; the diagrams and generators below all share this model
+    with profile_stage('build_model'):
+        model = build_network_model(yaml_data)
+
+    if args.compaction_report:
+        from modules.rule_compactor import print_compaction_report
+
+        with profile_stage('compaction_report'):
+            _, compaction_stats = model.compacted_firewall_rules()
+            print_compaction_report(compaction_stats)
+
+    if args.dependency_report:
+        from modules.azure_config_generator import azure_dependency_graph
+        from modules.resource_graph import print_dependency_report
+
+        try:
+            with profile_stage('dependency_report'):
+                print_dependency_report(azure_dependency_graph(model).stats())
+        except ValueError as e:
+            print(f"Error: Could not build the Azure dependency graph: {e}")
+            return
+
+    if args.regions or args.targets:
+        deploy_fanout(model, args)
+        return
 
     if args.visualize:
-        generate_graphical_flow_diagram(yaml_data)
+        from modules.flow_diagram_generator import generate_graphical_flow_diagram
 
-    if args.apply:
+        with profile_stage('graphical_diagram'):
+            generate_graphical_flow_diagram(model, clustered=args.cluster, max_nodes=args.max_nodes, drilldown=args.drilldown,
+                                            formats=args.formats, open_viewer=args.open, cache_dir=args.cache_dir)
+
+    if args.provider:
+        generate_all_providers(yaml_data, requirements_file, args)
+    elif args.apply:
         provider = input("Apply configuration for which provider (aws/azure/gcp)? ").lower()
         if provider == 'aws':
-            cloudformation_template = generate_aws_cloudformation(yaml_data)
+            import cloud_deployer
+
+            with profile_stage('generate_aws'):
+                cloudformation_template = get_generator('aws')(model)
 
             # Save the generated CloudFormation template to output.json
-            with open(OUTPUT_CLOUDFORMATION_FILE, 'w') as outfile:
+            with profile_stage('write_template'), open(OUTPUT_CLOUDFORMATION_FILE, 'w') as outfile:
                 json.dump(cloudformation_template, outfile, indent=2)
             print(f"\nGenerated AWS CloudFormation Template saved to '{OUTPUT_CLOUDFORMATION_FILE}'.")
 
             confirm_apply = input("Do you want to apply this AWS configuration? (yes/no): ").lower()
             if confirm_apply == 'yes':
-                suggested_region = None
-                location = get_approximate_location()
-                if location == "RO":
-                    suggested_region = SUGGESTED_AWS_REGION_EUROPE
-                    ask_region = input(f"Do you want to specify a specific AWS region? (yes/no, default: {suggested_region} based on your location): ").lower()
+                from modules.geolocation import suggest_aws_region
+
+                location = location_lookup.result()
+                suggested_region = suggest_aws_region(location)
+                if suggested_region:
+                    ask_region = input(f"Do you want to specify a specific AWS region? (yes/no, default: {suggested_region} based on your location ({location})): ").lower()
                     if ask_region == 'yes':
                         region = input("Enter the AWS region to deploy to (e.g., us-east-1): ")
                     else:
@@ -68,10 +272,12 @@ def main():
                         region = input("Enter the AWS region to deploy to (e.g., us-east-1): ")
 
                 print("\nAttempting to apply AWS configuration...")
-                if cloud_deployer.apply_aws_configuration(cloudformation_template, region=region):
-                    print("AWS configuration application process initiated successfully.")
+                confirm_change_set = lambda: input("Execute this change set? (yes/no): ").lower() == 'yes'
+                if cloud_deployer.apply_aws_configuration(cloudformation_template, region=region, wait=args.wait, stack_name=args.stack_name,
+                                                          plan=args.plan, confirm=confirm_change_set, artifact_bucket=args.artifact_bucket):
+                    print("AWS configuration applied successfully." if args.wait else "AWS configuration application process initiated successfully.")
                 else:
-                    print("Failed to initiate AWS configuration application.")
+                    print("AWS configuration application failed." if args.wait else "Failed to initiate AWS configuration application.")
             else:
                 print("AWS configuration application skipped.")
         elif provider == 'azure':
@@ -80,9 +286,10 @@ def main():
             print("GCP configuration application not yet implemented.")
         else:
             print("Invalid cloud provider specified.")
-    elif not args.visualize and not args.apply:
-        textual_flow = generate_textual_flow_diagram(yaml_data)
-        print("\nTextual Network Flow:\n", textual_flow)
+    elif not args.visualize:
+        print("\nTextual Network Flow:")
+        with profile_stage('textual_diagram'):
+            write_textual_flow_diagram(model, sys.stdout, limit=args.limit, offset=args.offset, group_by_pair=args.group_rules)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
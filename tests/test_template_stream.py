@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from modules.template_stream import LazyArray, LazyObject, get_json_dumps, iter_json_chunks, materialize
+
+NON_STRING_KEYS = [(None, 'a'), (True, 'b'), (False, 'c'), (3, 'd'), (1.5, 'e'), ('plain', 'f')]
+
+
+def _template():
+    return LazyObject([(key, LazyObject([(key, value)])) for key, value in NON_STRING_KEYS]
+                      + [('resources', LazyArray([{'id': 1}]))])
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_streamed_json_matches_json_dumps_for_non_string_keys(compact):
+    streamed = ''.join(iter_json_chunks(_template(), get_json_dumps('json', compact), compact))
+    if compact:
+        expected = json.dumps(materialize(_template()), separators=(',', ':'))
+    else:
+        expected = json.dumps(materialize(_template()), indent=2)
+    assert streamed == expected
+    assert json.loads(streamed)['null'] == {'null': 'a'}
+
+
+def test_unsupported_key_raises_type_error():
+    with pytest.raises(TypeError):
+        ''.join(iter_json_chunks(LazyObject([((1, 2), 'value')]), get_json_dumps()))